@@ -29,9 +29,9 @@ if not OPENAI_API_KEY:
     logging.error("OpenAI API key not found! Please set OPENAI_API_KEY in .env file")
     raise ValueError("OpenAI API key not found!")
 
-# Base URLs
-GORK_BASE_URL = "https://api.x.ai/v1"
-OPENAI_BASE_URL = "https://api.openai.com/v1"
+# Base URLs (override to point at local OpenAI-compatible mock servers)
+GORK_BASE_URL = os.getenv("GORK_BASE_URL", "https://api.x.ai/v1")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
 # File paths
 UPLOAD_DIR = Path("uploads")
@@ -39,4 +39,82 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 
 # Model configurations
 GROK_MODEL = "grok-1"
-OPENAI_MODEL = "gpt-4-vision-preview" 
\ No newline at end of file
+GROK_VISION_MODEL = os.getenv("GROK_VISION_MODEL", "grok-vision-beta")
+OPENAI_MODEL = "gpt-4-vision-preview"
+
+# Vehicle damage analysis concurrency
+VEHICLE_DAMAGE_MAX_CONCURRENCY_PER_ORDER = int(os.getenv("VEHICLE_DAMAGE_MAX_CONCURRENCY_PER_ORDER", "4"))
+VEHICLE_DAMAGE_MAX_CONCURRENCY_GLOBAL = int(os.getenv("VEHICLE_DAMAGE_MAX_CONCURRENCY_GLOBAL", "16"))
+
+# Shared HTTP connection pools
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "5"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+HTTP_HOST_CONNECTION_LIMITS = os.getenv("HTTP_HOST_CONNECTION_LIMITS", "")  # e.g. "recordings.exotel.com=4,api.x.ai=20"
+HTTP_ENABLE_HTTP2 = os.getenv("HTTP_ENABLE_HTTP2", "true").lower() == "true"
+HTTP_MAX_CLIENTS = int(os.getenv("HTTP_MAX_CLIENTS", "32"))  # Pooled clients (one per host) kept open at once
+
+# Background report jobs
+JOB_QUEUE_DB_PATH = Path(os.getenv("JOB_QUEUE_DB_PATH", "data/report_jobs.sqlite3"))
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "2"))
+JOB_WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("JOB_WEBHOOK_TIMEOUT_SECONDS", "10"))
+
+# PDF report rendering pool
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", "2"))
+REPORT_RENDER_MAX_QUEUE_DEPTH = int(os.getenv("REPORT_RENDER_MAX_QUEUE_DEPTH", "32"))
+
+# PDF report delivery
+REPORT_SPOOL_THRESHOLD_BYTES = int(os.getenv("REPORT_SPOOL_THRESHOLD_BYTES", str(5 * 1024 * 1024)))
+REPORT_PERSISTENCE = os.getenv("REPORT_PERSISTENCE", "local")  # "local", "s3" or "none"
+
+# Report artifact store
+REPORT_STORE_DB_PATH = Path(os.getenv("REPORT_STORE_DB_PATH", "data/report_store.sqlite3"))
+REPORT_STORE_LOCAL_DIR = Path(os.getenv("REPORT_STORE_LOCAL_DIR", "static/reports"))
+REPORT_STORE_TTL_SECONDS = int(os.getenv("REPORT_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+REPORT_STORE_MAX_BYTES = int(os.getenv("REPORT_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+REPORT_STORE_SWEEP_INTERVAL_SECONDS = int(os.getenv("REPORT_STORE_SWEEP_INTERVAL_SECONDS", "600"))
+REPORT_STORE_S3_BUCKET = os.getenv("REPORT_STORE_S3_BUCKET", "")
+REPORT_STORE_S3_PREFIX = os.getenv("REPORT_STORE_S3_PREFIX", "reports/")
+REPORT_STORE_S3_ENDPOINT_URL = os.getenv("REPORT_STORE_S3_ENDPOINT_URL") or None  # e.g. http://localhost:9000 for MinIO
+REPORT_STORE_S3_REGION = os.getenv("REPORT_STORE_S3_REGION") or None
+REPORT_STORE_URL_EXPIRY_SECONDS = int(os.getenv("REPORT_STORE_URL_EXPIRY_SECONDS", "3600"))
+
+# Image preprocessing before vision calls
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "2048"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", "4"))
+
+# PDF document analysis (/analyze/pdf)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "2"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PDF_CHUNK_MAX_TOKENS = int(os.getenv("PDF_CHUNK_MAX_TOKENS", "4000"))  # Document text per prompt
+PDF_CHUNK_NOTES_MAX_TOKENS = int(os.getenv("PDF_CHUNK_NOTES_MAX_TOKENS", "800"))  # Completion budget per chunk
+PDF_CHUNK_CONCURRENCY = int(os.getenv("PDF_CHUNK_CONCURRENCY", "4"))
+
+# Provider status page monitoring
+API_STATUS_REFRESH_SECONDS = float(os.getenv("API_STATUS_REFRESH_SECONDS", "60"))
+API_STATUS_TIMEOUT_SECONDS = float(os.getenv("API_STATUS_TIMEOUT_SECONDS", "10"))
+
+# AI provider routing
+# A request is hedged once it runs past this percentile of the primary's recent latency for its kind
+AI_ROUTER_HEDGE_PERCENTILE = float(os.getenv("AI_ROUTER_HEDGE_PERCENTILE", "0.95"))  # 0 disables hedging
+AI_ROUTER_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("AI_ROUTER_HEDGE_MIN_DELAY_SECONDS", "2"))
+AI_ROUTER_HEDGE_MIN_SAMPLES = int(os.getenv("AI_ROUTER_HEDGE_MIN_SAMPLES", "20"))  # Not hedged until then
+AI_ROUTER_WINDOW = int(os.getenv("AI_ROUTER_WINDOW", "100"))
+AI_ROUTER_ERROR_PENALTY_SECONDS = float(os.getenv("AI_ROUTER_ERROR_PENALTY_SECONDS", "10"))
+
+# Retries, circuit breaking and deadlines for AI calls
+AI_RETRY_MAX_ATTEMPTS = int(os.getenv("AI_RETRY_MAX_ATTEMPTS", "3"))
+AI_RETRY_BASE_DELAY_SECONDS = float(os.getenv("AI_RETRY_BASE_DELAY_SECONDS", "0.5"))
+AI_RETRY_MAX_DELAY_SECONDS = float(os.getenv("AI_RETRY_MAX_DELAY_SECONDS", "20"))
+AI_REQUEST_DEADLINE_SECONDS = float(os.getenv("AI_REQUEST_DEADLINE_SECONDS", "90"))
+AI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("AI_CIRCUIT_FAILURE_THRESHOLD", "5"))
+AI_CIRCUIT_RESET_SECONDS = float(os.getenv("AI_CIRCUIT_RESET_SECONDS", "30"))
+
+# Client-side provider quotas (0 disables a limit)
+GROK_RPM = int(os.getenv("GROK_RPM", "60"))
+GROK_TPM = int(os.getenv("GROK_TPM", "100000"))
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "200000"))
+AI_RATE_LIMIT_BURST_SECONDS = float(os.getenv("AI_RATE_LIMIT_BURST_SECONDS", "10"))  # Quota a bucket may spend at once
@@ -3,17 +3,80 @@ from app.config.settings import (
     GORK_API_KEY,
     OPENAI_API_KEY,
     GORK_BASE_URL,
-    OPENAI_BASE_URL
+    OPENAI_BASE_URL,
+    GROK_MODEL,
+    GROK_VISION_MODEL,
+    OPENAI_MODEL,
+    AI_ROUTER_HEDGE_PERCENTILE,
+    AI_ROUTER_HEDGE_MIN_DELAY_SECONDS,
+    AI_ROUTER_HEDGE_MIN_SAMPLES,
+    AI_ROUTER_WINDOW,
+    AI_ROUTER_ERROR_PENALTY_SECONDS,
+    AI_RETRY_MAX_ATTEMPTS,
+    AI_RETRY_BASE_DELAY_SECONDS,
+    AI_RETRY_MAX_DELAY_SECONDS,
+    AI_REQUEST_DEADLINE_SECONDS,
+    AI_CIRCUIT_FAILURE_THRESHOLD,
+    AI_CIRCUIT_RESET_SECONDS,
+    GROK_RPM,
+    GROK_TPM,
+    OPENAI_RPM,
+    OPENAI_TPM,
+    AI_RATE_LIMIT_BURST_SECONDS
 )
+from app.core.prompts import prompt_registry
+from app.core.provider_router import AIProvider, ProviderRouter
+from app.core.rate_limiter import RateLimiter
+from app.core.resilience import ResilienceLayer
 
 # Initialize OpenAI client for Grok
+# (SDK retries are off; ai_resilience retries with backoff and a deadline instead)
 grok_client = AsyncOpenAI(
     api_key=GORK_API_KEY,
-    base_url=GORK_BASE_URL
+    base_url=GORK_BASE_URL,
+    max_retries=0
 )
 
 # Initialize OpenAI client
 openai_client = AsyncOpenAI(
     api_key=OPENAI_API_KEY,
-    base_url=OPENAI_BASE_URL
-) 
\ No newline at end of file
+    base_url=OPENAI_BASE_URL,
+    max_retries=0
+)
+
+# Retries, per-provider circuit breakers and request deadlines
+ai_resilience = ResilienceLayer(
+    max_attempts=AI_RETRY_MAX_ATTEMPTS,
+    base_delay=AI_RETRY_BASE_DELAY_SECONDS,
+    max_delay=AI_RETRY_MAX_DELAY_SECONDS,
+    deadline=AI_REQUEST_DEADLINE_SECONDS,
+    failure_threshold=AI_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=AI_CIRCUIT_RESET_SECONDS
+)
+
+# Client-side RPM/TPM quotas, shared by every call through either client
+ai_rate_limiter = RateLimiter(
+    {"grok": (GROK_RPM, GROK_TPM), "openai": (OPENAI_RPM, OPENAI_TPM)},
+    burst_seconds=AI_RATE_LIMIT_BURST_SECONDS
+)
+
+# Latency-aware routing over both clients
+ai_router = ProviderRouter(
+    [
+        AIProvider("grok", grok_client, {"text": GROK_MODEL, "vision": GROK_VISION_MODEL}),
+        AIProvider("openai", openai_client, {"text": OPENAI_MODEL, "vision": OPENAI_MODEL})
+    ],
+    hedge_percentile=AI_ROUTER_HEDGE_PERCENTILE,
+    hedge_min_delay=AI_ROUTER_HEDGE_MIN_DELAY_SECONDS,
+    hedge_min_samples=AI_ROUTER_HEDGE_MIN_SAMPLES,
+    window=AI_ROUTER_WINDOW,
+    error_penalty=AI_ROUTER_ERROR_PENALTY_SECONDS,
+    resilience=ai_resilience,
+    rate_limiter=ai_rate_limiter,
+    prompt_registry=prompt_registry
+)
+
+
+def get_ai_router() -> ProviderRouter:
+    """Return the application-wide AI provider router"""
+    return ai_router
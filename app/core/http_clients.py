@@ -0,0 +1,201 @@
+import asyncio
+import importlib.util
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class HTTPClientRegistry:
+    """
+    Application-scoped registry of pooled HTTP clients.
+
+    One httpx.AsyncClient is kept per (scheme, host, verify) so connections,
+    TLS sessions and keep-alive sockets are reused across requests instead of
+    being rebuilt per call. Each host gets its own connection limit, and the
+    registry counts pool hits (client reused) and misses (client created).
+
+    Hosts can come from callers (webpage URLs, image URLs, webhooks), so at
+    most max_clients are kept. Creating one more evicts the least recently
+    used client, which is closed retire_after seconds later so requests
+    already running on it can finish.
+    """
+
+    def __init__(self,
+                 max_connections_per_host: int = 10,
+                 max_keepalive_per_host: int = 5,
+                 keepalive_expiry: float = 30.0,
+                 timeout: float = 30.0,
+                 host_limits: Optional[Dict[str, int]] = None,
+                 http2: bool = True,
+                 max_clients: int = 32,
+                 retire_after: float = 120.0):
+        self.max_connections_per_host = max_connections_per_host
+        self.max_keepalive_per_host = max_keepalive_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.host_limits = host_limits or {}
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_clients = max_clients
+        self.retire_after = retire_after
+
+        self._clients: "OrderedDict[Tuple[str, str, bool], httpx.AsyncClient]" = OrderedDict()
+        self._retiring: Dict[httpx.AsyncClient, Optional[asyncio.Task]] = {}
+        self._evictions = 0
+        self._sync_session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _host_of(url: str) -> Tuple[str, str]:
+        parts = urlsplit(url)
+        return parts.scheme or "https", parts.netloc
+
+    def _record(self, host: str, outcome: str):
+        host_metrics = self._metrics.setdefault(host, {"hits": 0, "misses": 0})
+        host_metrics[outcome] += 1
+
+    def _limits_for(self, host: str) -> httpx.Limits:
+        max_connections = self.host_limits.get(host.split(":")[0], self.max_connections_per_host)
+        return httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(self.max_keepalive_per_host, max_connections),
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def get_client(self, url: str, verify: bool = True) -> httpx.AsyncClient:
+        """Return the pooled async client for the host of the given URL"""
+        scheme, host = self._host_of(url)
+        key = (scheme, host, verify)
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None and not client.is_closed:
+                self._clients.move_to_end(key)
+                self._record(host, "hits")
+                return client
+
+            self._record(host, "misses")
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=self._limits_for(host),
+                http2=self.http2,
+                verify=verify,
+                follow_redirects=True
+            )
+            self._clients[key] = client
+            self._clients.move_to_end(key)
+            logging.info(f"Created pooled HTTP client for {scheme}://{host} (http2={self.http2})")
+            while len(self._clients) > self.max_clients:
+                (_, evicted_host, _), evicted = self._clients.popitem(last=False)
+                self._retire(evicted)
+                self._evictions += 1
+                logging.info(f"Evicted pooled HTTP client for {evicted_host}")
+            return client
+
+    def _retire(self, client: httpx.AsyncClient):
+        """Close an evicted client once requests already running on it have had time to finish"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._retiring[client] = None  # No event loop to close it on; aclose() will
+            return
+        task = loop.create_task(self._close_later(client))
+        self._retiring[client] = task
+
+    async def _close_later(self, client: httpx.AsyncClient):
+        try:
+            await asyncio.sleep(self.retire_after)
+            await client.aclose()
+        except Exception as e:
+            logging.error(f"Error closing evicted HTTP client: {str(e)}")
+        finally:
+            with self._lock:
+                self._retiring.pop(client, None)
+
+    def get_sync_session(self) -> requests.Session:
+        """Return a shared requests session for code paths that are still synchronous"""
+        with self._lock:
+            if self._sync_session is None:
+                self._record("sync", "misses")
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self.max_keepalive_per_host,
+                    pool_maxsize=self.max_connections_per_host
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sync_session = session
+            else:
+                self._record("sync", "hits")
+            return self._sync_session
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return per-host pool hit/miss counters"""
+        with self._lock:
+            return {
+                "http2": self.http2,
+                "open_clients": sum(1 for client in self._clients.values() if not client.is_closed),
+                "max_clients": self.max_clients,
+                "evictions": self._evictions,
+                "retiring_clients": len(self._retiring),
+                "hosts": {host: dict(counts) for host, counts in self._metrics.items()}
+            }
+
+    async def aclose(self):
+        """Close every pooled client, including evicted ones not yet closed"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            retiring, self._retiring = self._retiring, {}
+            sync_session, self._sync_session = self._sync_session, None
+
+        for client, task in retiring.items():
+            if task is not None:
+                task.cancel()
+            clients.append(client)
+
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logging.error(f"Error closing HTTP client: {str(e)}")
+        if sync_session is not None:
+            sync_session.close()
+
+
+def parse_host_limits(value: str) -> Dict[str, int]:
+    """Parse 'host=limit,host=limit' into a dict"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        host, _, limit = item.partition("=")
+        try:
+            limits[host.strip()] = int(limit)
+        except ValueError:
+            logging.warning(f"Ignoring invalid host connection limit: {item}")
+    return limits
+
+
+_registry: Optional[HTTPClientRegistry] = None
+
+
+def set_http_registry(registry: Optional[HTTPClientRegistry]):
+    """Install the application-wide registry (called from the FastAPI lifespan hook)"""
+    global _registry
+    _registry = registry
+
+
+def get_http_registry() -> HTTPClientRegistry:
+    """Return the application-wide registry, creating a default one outside the app lifespan"""
+    global _registry
+    if _registry is None:
+        _registry = HTTPClientRegistry()
+    return _registry
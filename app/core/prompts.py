@@ -0,0 +1,343 @@
+import hashlib
+import logging
+import math
+import textwrap
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.rate_limiter import CHARS_PER_TOKEN
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to the ~4 characters per token estimate
+    tiktoken = None
+
+_encoding = tiktoken.get_encoding("o200k_base") if tiktoken is not None else None
+
+# USD per million tokens: (input, cached input, output). Unlisted models are counted but not priced.
+MODEL_PRICING: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4-vision-preview": (10.00, 10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+    "grok-beta": (5.00, 5.00, 15.00),
+    "grok-vision-beta": (5.00, 5.00, 15.00)
+}
+
+# Providers that cache repeated prompt prefixes: the minimum prefix length they
+# cache, and the request option (if any) that keeps similar prompts on the same cache
+PREFIX_CACHING: Dict[str, Dict[str, Any]] = {
+    "openai": {"min_tokens": 1024, "cache_key_param": "prompt_cache_key"},
+    "grok": {"min_tokens": 1024, "cache_key_param": None}
+}
+
+
+def model_pricing(model: str) -> Optional[Tuple[float, float, float]]:
+    """Prices for model, matching dated snapshots (gpt-4o-mini-2024-07-18) to their family"""
+    matches = [name for name in MODEL_PRICING if model == name or model.startswith(name + "-")]
+    return MODEL_PRICING[max(matches, key=len)] if matches else None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in text: exact with tiktoken installed, otherwise ~4 characters per token"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class PromptTemplate:
+    """
+    A versioned system message and user instruction. Both are normalised
+    (dedented, stripped) once and their token counts computed up front.
+    Messages put the fixed text first and per-call content (images, variable
+    text) last, so providers with prefix caching can reuse the shared prefix.
+    """
+
+    def __init__(self, name: str, version: str, system: str, user: str, description: str = ""):
+        self.name = name
+        self.version = version
+        self.system = textwrap.dedent(system).strip()
+        self.user = textwrap.dedent(user).strip()
+        self.description = description
+        self.fingerprint = hashlib.sha256(f"{self.system}\0{self.user}".encode("utf-8")).hexdigest()
+        self.system_tokens = count_tokens(self.system)
+        self.user_tokens = count_tokens(self.user)
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    @property
+    def prefix_tokens(self) -> int:
+        """Tokens every call with this template starts with"""
+        return self.system_tokens + self.user_tokens
+
+    def messages(self, image_urls: Optional[List[str]] = None, **variables) -> List[Dict[str, Any]]:
+        """Chat messages for one call; variables fill {placeholders} in the user text"""
+        text = self.user.format(**variables) if variables else self.user
+        if image_urls:
+            content: Any = [{"type": "text", "text": text}]
+            content.extend({"type": "image_url", "image_url": {"url": url}} for url in image_urls)
+        else:
+            content = text
+        messages = [{"role": "system", "content": self.system}] if self.system else []
+        messages.append({"role": "user", "content": content})
+        return messages
+
+    def request_options(self, provider: str) -> Dict[str, Any]:
+        """Extra create() arguments that help provider cache this template's prefix"""
+        policy = PREFIX_CACHING.get(provider)
+        if policy is None or not policy["cache_key_param"] or self.prefix_tokens < policy["min_tokens"]:
+            return {}
+        return {"extra_body": {policy["cache_key_param"]: self.key}}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "description": self.description,
+            "fingerprint": self.fingerprint[:16],
+            "system_tokens": self.system_tokens,
+            "user_tokens": self.user_tokens,
+            "prefix_cacheable": {
+                provider: self.prefix_tokens >= policy["min_tokens"]
+                for provider, policy in PREFIX_CACHING.items()
+            }
+        }
+
+
+def _usage_value(usage: Any, *path: str) -> int:
+    """Read a (possibly nested) usage field from an SDK object or a plain dict"""
+    value = usage
+    for name in path:
+        if value is None:
+            return 0
+        value = value.get(name) if isinstance(value, dict) else getattr(value, name, None)
+    return int(value or 0)
+
+
+class PromptRegistry:
+    """
+    Versioned prompt templates plus per-template token and cost accounting.
+    get(name) returns the latest registered version; record_usage() adds a
+    finished call's token usage, as reported by the provider, to the totals.
+    """
+
+    def __init__(self):
+        self.templates: Dict[str, Dict[str, PromptTemplate]] = {}
+        self.usage: Dict[str, Dict[str, Any]] = {}
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        versions = self.templates.setdefault(template.name, {})
+        if template.version in versions and versions[template.version].fingerprint != template.fingerprint:
+            raise ValueError(f"Prompt {template.key} is already registered with different text")
+        versions[template.version] = template
+        return template
+
+    def get(self, name: str, version: Optional[str] = None) -> PromptTemplate:
+        versions = self.templates.get(name)
+        if not versions:
+            raise KeyError(f"Unknown prompt: {name}")
+        if version is None:
+            return versions[list(versions)[-1]]
+        if version not in versions:
+            raise KeyError(f"Unknown prompt version: {name}@{version}")
+        return versions[version]
+
+    def record_usage(self, template: PromptTemplate, provider: str, model: str, usage: Any) -> Dict[str, Any]:
+        """
+        Add one call's usage to the template's totals and return the call's
+        token counts and cost. Calls without usage (e.g. streamed) are counted
+        as unmetered.
+        """
+        totals = self.usage.setdefault(template.key, {
+            "calls": 0,
+            "unmetered_calls": 0,
+            "input_tokens": 0,
+            "cached_input_tokens": 0,
+            "output_tokens": 0,
+            "cost_usd": 0.0,
+            "by_model": {}
+        })
+        totals["calls"] += 1
+        if usage is None:
+            totals["unmetered_calls"] += 1
+            return {"prompt": template.key, "provider": provider, "model": model, "metered": False}
+
+        input_tokens = _usage_value(usage, "prompt_tokens")
+        cached_tokens = _usage_value(usage, "prompt_tokens_details", "cached_tokens")
+        output_tokens = _usage_value(usage, "completion_tokens")
+        pricing = model_pricing(model)
+        cost = None
+        if pricing is not None:
+            input_price, cached_price, output_price = pricing
+            cost = ((input_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+                    + output_tokens * output_price) / 1_000_000
+
+        totals["input_tokens"] += input_tokens
+        totals["cached_input_tokens"] += cached_tokens
+        totals["output_tokens"] += output_tokens
+        totals["cost_usd"] += cost or 0.0
+        model_totals = totals["by_model"].setdefault(f"{provider}/{model}", {"calls": 0, "cost_usd": 0.0})
+        model_totals["calls"] += 1
+        model_totals["cost_usd"] += cost or 0.0
+
+        call = {
+            "prompt": template.key,
+            "provider": provider,
+            "model": model,
+            "metered": True,
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached_tokens,
+            "output_tokens": output_tokens,
+            "cost_usd": round(cost, 6) if cost is not None else None
+        }
+        logging.info(f"{template.key} on {provider}/{model}: {input_tokens} input tokens "
+                     f"({cached_tokens} cached), {output_tokens} output tokens"
+                     + (f", ${cost:.5f}" if cost is not None else ""))
+        return call
+
+    def get_metrics(self) -> Dict[str, Any]:
+        usage = {}
+        for key, totals in self.usage.items():
+            metered = totals["calls"] - totals["unmetered_calls"]
+            usage[key] = {
+                **totals,
+                "cost_usd": round(totals["cost_usd"], 6),
+                "by_model": {model: {"calls": stats["calls"], "cost_usd": round(stats["cost_usd"], 6)}
+                             for model, stats in totals["by_model"].items()},
+                "avg_input_tokens": round(totals["input_tokens"] / metered) if metered else None,
+                "avg_output_tokens": round(totals["output_tokens"] / metered) if metered else None,
+                "cached_input_ratio": (round(totals["cached_input_tokens"] / totals["input_tokens"], 4)
+                                       if totals["input_tokens"] else None)
+            }
+        return {
+            "token_counter": "tiktoken" if _encoding is not None else "estimate",
+            "templates": {
+                template.key: template.to_dict()
+                for versions in self.templates.values() for template in versions.values()
+            },
+            "usage": usage
+        }
+
+
+VEHICLE_ASSESSMENT_SYSTEM = """
+    You are an expert vehicle damage assessor with deep knowledge of Indian vehicles, repair costs, and RTO regulations.
+    Analyze the image in detail and provide comprehensive information about the vehicle's condition, damage assessment, and repair estimates in INR.
+"""
+
+VEHICLE_ASSESSMENT_SECTIONS = """
+    Analyze the attached vehicle images and provide a detailed report in JSON format. Include the following sections:
+    Vehicle Details: Provide the make, model, year of manufacture, odometer reading, vehicle color, registration number, registered state, RTO name, and claims reported location.
+    Vehicle Dashboard and Condition: Report the speedometer reading, odometer reading, fuel level, warning lights, temperature, and gear position.
+    Stickers and Signs Observed: List any visible stickers, signs, or branding on the vehicle.
+    Damage Analysis: Identify all damaged components, provide observations, and suggest recommendations for each component.
+    Repair Cost Estimation (INR): Provide an estimated repair cost for each damaged component along with a total repair cost.
+    Market Valuation (INR): Provide the current market value of the vehicle pre-accident, post-accident value, salvage value, and estimated value after repairs. Include quotes from at least three different market sources.
+"""
+
+prompt_registry = PromptRegistry()
+
+# Single-image report (/analyze_files, /gen_report)
+prompt_registry.register(PromptTemplate(
+    "vehicle-assessment", "v1",
+    VEHICLE_ASSESSMENT_SYSTEM,
+    VEHICLE_ASSESSMENT_SECTIONS + """
+    Ensure the output is in a structured JSON format with human-readable keys.
+    """,
+    description="Damage report for one vehicle photo"
+))
+
+# Multi-image report (/analyze_images): also checks the photos show one vehicle
+prompt_registry.register(PromptTemplate(
+    "vehicle-assessment", "v2",
+    VEHICLE_ASSESSMENT_SYSTEM,
+    VEHICLE_ASSESSMENT_SECTIONS + """
+    Ensure the output is in a structured JSON format with human-readable keys. If multiple images uploaded, then verify if its the same vehicle, add this result in json including the reason of consistency. In vehicle details, the result should be an object of high confidence.
+    """,
+    description="Damage report across several photos of one vehicle, with a consistency check"
+))
+
+# Fixed instructions first and the document last, so the instructions form a cacheable prefix
+prompt_registry.register(PromptTemplate(
+    "insurance-extraction", "v1",
+    "You are a helpful assistant that extracts specific information from insurance documents and returns it in JSON format.",
+    """
+    Extract the following information from the insurance document text. Return the information in a JSON format with these exact keys:
+    customer_name
+    customer_contact_number
+    policy_number
+    insurance_company_name
+    type_of_policy
+    start_date_of_policy
+    expiry_date_of_policy
+    registration_number
+    engine_number
+    chassis_number
+    body_type
+    vehicle_make
+    model
+    manufacturing_year
+    total_premium_paid
+    address
+
+    Return ONLY the JSON object with the extracted information. If a field is not found, set its value to null.
+
+    Here's the document text:
+    {document_text}
+    """,
+    description="Policy fields from the text of an insurance document"
+))
+
+# Only the fields the local rules couldn't find (see app.services.insurance_extractor)
+prompt_registry.register(PromptTemplate(
+    "insurance-extraction", "v2",
+    "You are a helpful assistant that extracts specific information from insurance documents and returns it in JSON format.",
+    """
+    Extract the requested fields from the insurance document text. Return ONLY a JSON object with exactly the requested fields as keys. If a field is not found, set its value to null.
+
+    Requested fields:
+    {fields}
+
+    Here's the document text:
+    {document_text}
+    """,
+    description="Selected policy fields from the text of an insurance document"
+))
+
+prompt_registry.register(PromptTemplate(
+    "image-description", "v1",
+    "",
+    "Analyze this image and provide a detailed description.",
+    description="Free-form description of a single image"
+))
+
+# Map step of long-document analysis: notes on one run of pages
+prompt_registry.register(PromptTemplate(
+    "document-chunk", "v1",
+    "You are an analyst reading one part of a longer document. Your notes will be combined with notes on the other parts.",
+    """
+    Analyze this excerpt. Note its key facts, figures, names, dates, amounts, obligations and conditions, and anything that looks unfinished or continues from another part. Be concise and do not speculate about the parts you cannot see.
+
+    Excerpt (pages {first_page}-{last_page} of {page_count}):
+    {text}
+    """,
+    description="Notes on one token-bounded chunk of a long PDF"
+))
+
+# Reduce step: one analysis of the whole document from the notes on its parts
+prompt_registry.register(PromptTemplate(
+    "document-merge", "v1",
+    "You are an analyst combining notes on consecutive parts of one document into a single analysis.",
+    """
+    Combine these notes into one analysis of the whole document. Merge repeated points, keep every distinct fact, figure and date, and resolve contradictions where the notes allow it, saying so where they don't.
+
+    Notes on a {page_count}-page document, in page order:
+    {notes}
+    """,
+    description="Merges chunk notes into one analysis of a long PDF"
+))
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Return the application-wide prompt registry"""
+    return prompt_registry
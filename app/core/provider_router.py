@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from openai import AsyncOpenAI
+
+from app.core.prompts import PromptRegistry, PromptTemplate
+from app.core.rate_limiter import RateLimiter, estimate_tokens
+from app.core.resilience import CircuitOpenError, ResilienceLayer
+
+
+class ProviderStats:
+    """Rolling latency and error statistics over the last window calls of one provider"""
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.in_flight = 0
+
+    def record(self, latency: float, ok: bool):
+        if ok:
+            self.latencies.append(latency)
+        self.outcomes.append(ok)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "samples": len(self.outcomes),
+            "in_flight": self.in_flight
+        }
+
+
+class AIProvider:
+    """An OpenAI-compatible client plus the models it serves for each kind of call"""
+
+    def __init__(self, name: str, client: AsyncOpenAI, models: Dict[str, str]):
+        self.name = name
+        self.client = client
+        self.models = models  # call kind ("text", "vision") -> model name
+
+
+class ProviderRouter:
+    """
+    Routes chat completions to the healthiest of several OpenAI-compatible providers.
+
+    Providers are ranked per call by p95 latency plus a penalty per unit of
+    error rate; providers with no samples yet rank first so they get explored.
+    With a ResilienceLayer, each provider call is retried under a shared
+    per-request deadline, and providers whose circuit is open are skipped.
+    With a RateLimiter, every attempt first waits for the provider's quota.
+    With a PromptRegistry, calls made with a prompt template get the
+    provider's prefix-caching options and have their token usage recorded.
+    A request still running after the primary provider's hedge_percentile
+    latency for that kind of call (never less than hedge_min_delay) is
+    duplicated to the next-ranked provider and the first success wins, so
+    only the slowest few percent of requests are sent twice. Kinds whose
+    primary has fewer than hedge_min_samples recent successes aren't
+    hedged. A failed request fails over to the remaining providers in rank
+    order.
+    """
+
+    def __init__(self, providers: List[AIProvider], hedge_percentile: float = 0.0,
+                 hedge_min_delay: float = 2.0, hedge_min_samples: int = 20,
+                 window: int = 100, error_penalty: float = 10.0,
+                 resilience: Optional[ResilienceLayer] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 prompt_registry: Optional[PromptRegistry] = None):
+        self.providers = {provider.name: provider for provider in providers}
+        self.resilience = resilience
+        self.rate_limiter = rate_limiter
+        self.prompt_registry = prompt_registry
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.error_penalty = error_penalty
+        self.stats = {provider.name: ProviderStats(window) for provider in providers}
+        # Latency differs a lot between kinds (vision calls take far longer), so hedging uses per-kind stats
+        self.kind_stats = {(provider.name, kind): ProviderStats(window)
+                           for provider in providers for kind in provider.models}
+        self.decisions = {
+            "routed": {provider.name: 0 for provider in providers},
+            "hedged": 0,
+            "hedge_wins": 0,
+            "failovers": 0,
+            "exhausted": 0
+        }
+
+    def _score(self, name: str) -> float:
+        stats = self.stats[name]
+        p95 = stats.percentile(0.95)
+        if p95 is None:
+            return 0.0
+        return p95 + stats.error_rate * self.error_penalty
+
+    def rank(self, kind: str) -> List[AIProvider]:
+        """Providers that serve this kind of call, best first"""
+        candidates = [provider for provider in self.providers.values() if kind in provider.models]
+        if self.resilience is not None:
+            # Skip providers whose circuit is open, unless that leaves nothing to try
+            closed = [provider for provider in candidates
+                      if not self.resilience.breaker(provider.name).is_open()]
+            candidates = closed or candidates
+        return sorted(candidates, key=lambda provider: self._score(provider.name))
+
+    def hedge_delay(self, provider: AIProvider, kind: str) -> Optional[float]:
+        """Seconds to wait on provider before hedging a kind request, or None to not hedge"""
+        if self.hedge_percentile <= 0:
+            return None
+        stats = self.kind_stats[(provider.name, kind)]
+        if len(stats.latencies) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, stats.percentile(self.hedge_percentile))
+
+    async def _call(self, provider: AIProvider, kind: str, kwargs: Dict[str, Any],
+                    deadline_at: Optional[float], prompt: Optional[PromptTemplate] = None):
+        if prompt is not None:
+            kwargs = {**prompt.request_options(provider.name), **kwargs}
+
+        def create():
+            return provider.client.chat.completions.create(model=provider.models[kind], **kwargs)
+
+        if self.rate_limiter is not None:
+            tokens = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+            create = self.rate_limiter.limited(provider.name, create, tokens)
+
+        stats = self.stats[provider.name]
+        kind_stats = self.kind_stats[(provider.name, kind)]
+        stats.in_flight += 1
+        started = time.perf_counter()
+        try:
+            if self.resilience is not None:
+                response = await self.resilience.call(provider.name, create, deadline_at)
+            else:
+                response = await create()
+        except (asyncio.CancelledError, CircuitOpenError):
+            # Lost a hedge race or never called: says nothing about the provider's health
+            raise
+        except Exception:
+            elapsed = time.perf_counter() - started
+            stats.record(elapsed, False)
+            kind_stats.record(elapsed, False)
+            raise
+        finally:
+            stats.in_flight -= 1
+        elapsed = time.perf_counter() - started
+        stats.record(elapsed, True)
+        kind_stats.record(elapsed, True)
+        if prompt is not None and self.prompt_registry is not None:
+            self.prompt_registry.record_usage(prompt, provider.name,
+                                              getattr(response, "model", None) or provider.models[kind],
+                                              getattr(response, "usage", None))
+        return response
+
+    async def chat_completion(self, kind: str, prompt: Optional[PromptTemplate] = None, **kwargs):
+        """
+        Create a chat completion on the best provider for kind ("text" or "vision").
+        The model is chosen per provider; any other create() argument is passed through.
+        prompt is the registry template the messages were built from, if any.
+        """
+        ranked = self.rank(kind)
+        if not ranked:
+            raise ValueError(f"No AI provider serves {kind} requests")
+        self.decisions["routed"][ranked[0].name] += 1
+        hedge_delay = self.hedge_delay(ranked[0], kind)
+
+        pending: Dict[asyncio.Task, AIProvider] = {}
+        remaining = list(ranked)
+        last_error: Optional[Exception] = None
+        # One time budget for the whole request, shared by hedges and failovers
+        deadline_at = time.monotonic() + self.resilience.deadline if self.resilience is not None else None
+
+        def launch():
+            provider = remaining.pop(0)
+            pending[asyncio.create_task(self._call(provider, kind, kwargs, deadline_at, prompt))] = provider
+
+        launch()
+        try:
+            while pending:
+                can_hedge = hedge_delay is not None and remaining and len(pending) == 1
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay if can_hedge else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.decisions["hedged"] += 1
+                    logging.info(f"Hedging slow {kind} request from {next(iter(pending.values())).name} "
+                                 f"to {remaining[0].name}")
+                    launch()
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        if provider is not ranked[0]:
+                            self.decisions["hedge_wins" if pending else "failovers"] += 1
+                        return task.result()
+                    last_error = task.exception()
+                    logging.warning(f"{provider.name} {kind} request failed: {str(last_error)}")
+
+                if not pending and remaining:
+                    launch()
+        finally:
+            # Cancel the losing hedge (or every attempt, if we are being cancelled) and wait
+            # for them to unwind so their in-flight counts and connections are released
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        self.decisions["exhausted"] += 1
+        raise last_error
+
+    def _hedge_delay_ms(self, name: str, kind: str) -> Optional[float]:
+        delay = self.hedge_delay(self.providers[name], kind)
+        return round(delay * 1000, 2) if delay is not None else None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "hedging": {"percentile": self.hedge_percentile,
+                        "min_delay_ms": round(self.hedge_min_delay * 1000, 2),
+                        "min_samples": self.hedge_min_samples},
+            "resilience": self.resilience.get_metrics() if self.resilience is not None else None,
+            "rate_limits": self.rate_limiter.get_metrics() if self.rate_limiter is not None else None,
+            "prompts": self.prompt_registry.get_metrics() if self.prompt_registry is not None else None,
+            "providers": {
+                name: {**stats.to_dict(), "score": round(self._score(name), 4),
+                       "models": self.providers[name].models,
+                       "kinds": {kind: {**self.kind_stats[(name, kind)].to_dict(),
+                                        "hedge_delay_ms": self._hedge_delay_ms(name, kind)}
+                                 for kind in self.providers[name].models}}
+                for name, stats in self.stats.items()
+            },
+            "decisions": self.decisions
+        }
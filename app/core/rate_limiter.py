@@ -0,0 +1,250 @@
+import asyncio
+import contextvars
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.resilience import retry_after_seconds
+
+# Who a rate-limited call is queued for. Set per HTTP request (tenant header)
+# or per order; tasks started afterwards inherit it.
+rate_limit_tenant: contextvars.ContextVar[str] = contextvars.ContextVar("rate_limit_tenant", default="default")
+
+CHARS_PER_TOKEN = 4
+# Prompt cost of one image: OpenAI bills a high-detail 1024px image at 765 tokens
+IMAGE_TOKEN_ESTIMATE = 765
+# Completion budget assumed when a call sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 1024
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: Optional[int] = None) -> int:
+    """
+    Estimate the tokens a chat completion counts against a TPM quota: prompt
+    text at ~4 characters per token, a flat cost per image, and the completion
+    budget (providers reserve max_tokens up front).
+    """
+    chars = 0
+    images = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    chars += len(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    images += 1
+    return math.ceil(chars / CHARS_PER_TOKEN) + images * IMAGE_TOKEN_ESTIMATE + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """Refills at rate units per second up to capacity; may go negative after a correction"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.available = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount units are available"""
+        self._refill()
+        amount = min(amount, self.capacity)  # A call larger than the bucket waits for a full one
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Give back (positive) or take (negative) units after the real cost is known"""
+        self._refill()
+        self.available = min(self.capacity, self.available + delta)
+
+
+class ProviderRateLimiter:
+    """
+    Request (RPM) and token (TPM) buckets for one provider, with a fair queue.
+
+    Waiting calls are queued per tenant and granted round-robin across
+    tenants, so one large order can't starve the others. A 429 pauses the
+    whole queue for the Retry-After the provider asked for. Limits of 0
+    disable the corresponding bucket.
+    """
+
+    def __init__(self, name: str, rpm: int, tpm: int, burst_seconds: float = 10.0):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm / 60, max(1.0, rpm * burst_seconds / 60)) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm / 60, max(1.0, tpm * burst_seconds / 60)) if tpm > 0 else None
+        self.queues: "OrderedDict[str, deque]" = OrderedDict()
+        self.paused_until = 0.0
+        self._pump_task: Optional[asyncio.Task] = None
+        self.waits = deque(maxlen=1000)
+        self.tenants: Dict[str, Dict[str, float]] = {}
+        self.counters = {
+            "granted": 0,
+            "delayed": 0,
+            "cancelled": 0,
+            "pauses": 0,
+            "tokens_estimated": 0,
+            "tokens_used": 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = self.paused_until - time.monotonic()
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return max(0.0, wait)
+
+    def _ensure_pump(self):
+        loop = asyncio.get_running_loop()
+        if self._pump_task is None or self._pump_task.done() or self._pump_task.get_loop() is not loop:
+            self._pump_task = loop.create_task(self._pump())
+
+    async def _pump(self):
+        while self.queues:
+            tenant, queue = next(iter(self.queues.items()))
+            tokens, future = queue[0]
+            if not future.done():
+                wait = self._wait_time(tokens)
+                if wait > 0:
+                    # Bounded so cancelled waiters and pauses are noticed promptly
+                    await asyncio.sleep(min(wait, 1.0))
+                    continue
+                if self.requests is not None:
+                    self.requests.consume(1)
+                if self.tokens is not None:
+                    self.tokens.consume(tokens)
+                future.set_result(None)
+
+            queue.popleft()
+            if queue:
+                self.queues.move_to_end(tenant)  # Round-robin to the next tenant
+            else:
+                del self.queues[tenant]
+
+    async def acquire(self, tokens: int, tenant: str = "default") -> float:
+        """Wait for room for one request of tokens tokens; returns the seconds waited"""
+        if not self.enabled:
+            return 0.0
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(tenant, deque()).append((tokens, future))
+        self._ensure_pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand the budget back
+                if self.requests is not None:
+                    self.requests.adjust(1)
+                if self.tokens is not None:
+                    self.tokens.adjust(tokens)
+            self.counters["cancelled"] += 1
+            raise
+
+        waited = time.monotonic() - started
+        self.waits.append(waited)
+        self.counters["granted"] += 1
+        self.counters["tokens_estimated"] += tokens
+        if waited > 0.01:
+            self.counters["delayed"] += 1
+        tenant_stats = self.tenants.setdefault(tenant, {"granted": 0, "wait_seconds": 0.0})
+        tenant_stats["granted"] += 1
+        tenant_stats["wait_seconds"] += waited
+        if waited > 1:
+            logging.info(f"{self.name} rate limit delayed a {tokens}-token call for {tenant} by {waited:.2f}s")
+        return waited
+
+    def pause(self, seconds: float):
+        """Hold every queued call for seconds, e.g. after a 429"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.counters["pauses"] += 1
+
+    def record_usage(self, estimated: int, actual: int):
+        """Correct the token bucket once the provider reports what a call really used"""
+        self.counters["tokens_used"] += actual
+        if self.tokens is not None:
+            self.tokens.adjust(estimated - actual)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        ordered = sorted(self.waits)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "queued": sum(len(queue) for queue in self.queues.values()),
+            "tenants_waiting": len(self.queues),
+            "paused_for_ms": round(max(0.0, self.paused_until - time.monotonic()) * 1000, 2),
+            "available_requests": round(self.requests.available, 2) if self.requests is not None else None,
+            "available_tokens": round(self.tokens.available) if self.tokens is not None else None,
+            "wait_p50_ms": percentile(0.5),
+            "wait_p95_ms": percentile(0.95),
+            "wait_max_ms": round(ordered[-1] * 1000, 2) if ordered else None,
+            **self.counters,
+            "tenants": {
+                tenant: {"granted": int(stats["granted"]), "wait_ms": round(stats["wait_seconds"] * 1000, 2)}
+                for tenant, stats in self.tenants.items()
+            }
+        }
+
+
+class RateLimiter:
+    """Client-side RPM/TPM limits for every AI provider, keyed by provider name"""
+
+    def __init__(self, limits: Dict[str, Tuple[int, int]], burst_seconds: float = 10.0):
+        self.providers = {
+            name: ProviderRateLimiter(name, rpm, tpm, burst_seconds)
+            for name, (rpm, tpm) in limits.items()
+        }
+
+    def limited(self, provider: str, func: Callable[[], Awaitable[Any]], tokens: int) -> Callable[[], Awaitable[Any]]:
+        """
+        Wrap func (a zero-argument coroutine factory) so every invocation first
+        waits for the provider's quota, queued under the current tenant.
+        Providers without limits get func back unchanged.
+        """
+        limiter = self.providers.get(provider)
+        if limiter is None or not limiter.enabled:
+            return func
+
+        async def call():
+            await limiter.acquire(tokens, rate_limit_tenant.get())
+            try:
+                response = await func()
+            except Exception as e:
+                if getattr(getattr(e, "response", None), "status_code", None) == 429:
+                    limiter.pause(retry_after_seconds(e) or 1.0)
+                raise
+            usage = getattr(response, "usage", None)
+            if getattr(usage, "total_tokens", None):
+                limiter.record_usage(tokens, usage.total_tokens)
+            return response
+
+        return call
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {name: limiter.get_metrics() for name, limiter in self.providers.items()}
@@ -0,0 +1,210 @@
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+import openai
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while its circuit breaker is open"""
+
+
+class DeadlineExceededError(asyncio.TimeoutError):
+    """Raised when a request's total time budget runs out"""
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail fast for reset_timeout seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected"""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at < self.reset_timeout
+        return self.state == self.HALF_OPEN and self._trial_in_flight
+
+    def before_call(self):
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("Circuit breaker is open")
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                raise CircuitOpenError("Circuit breaker is half-open and a trial call is in flight")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logging.warning(f"Circuit breaker opened after {self.consecutive_failures} consecutive failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Forget a trial call that ended without a verdict (e.g. cancelled)"""
+        self._trial_in_flight = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        state = self.state
+        if state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            state = self.HALF_OPEN  # Next call will be the trial
+        return {"state": state, "consecutive_failures": self.consecutive_failures}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Connection problems, timeouts, 429s and 5xx responses are worth retrying"""
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError,
+                          httpx.TransportError, asyncio.TimeoutError)):
+        return not isinstance(error, DeadlineExceededError)
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the server through retry-after-ms / Retry-After, if any"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ResilienceLayer:
+    """
+    Retries, circuit breaking and deadlines for calls to AI providers.
+
+    Retryable failures are retried up to max_attempts times with full-jitter
+    exponential backoff, or after the server's Retry-After on 429/503.
+    Every provider has its own circuit breaker, and every call has a total
+    time budget covering all attempts and waits; a retry that couldn't
+    finish within the budget isn't started.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 20.0,
+                 deadline: float = 60.0, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.counters = {"calls": 0, "retries": 0, "rejected_open": 0, "deadline_exceeded": 0}
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self.breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            self.breakers[provider] = breaker
+        return breaker
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (0-based) attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def call(self, provider: str, func: Callable[[], Awaitable[Any]],
+                   deadline_at: Optional[float] = None) -> Any:
+        """
+        Run func (a zero-argument coroutine factory) against provider with retries.
+        deadline_at is a time.monotonic() value; defaults to now + deadline.
+        """
+        if deadline_at is None:
+            deadline_at = time.monotonic() + self.deadline
+        breaker = self.breaker(provider)
+        self.counters["calls"] += 1
+
+        for attempt in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.counters["deadline_exceeded"] += 1
+                raise DeadlineExceededError(f"{provider} request exceeded its deadline")
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                self.counters["rejected_open"] += 1
+                raise CircuitOpenError(f"Circuit breaker for {provider} is open")
+
+            try:
+                result = await asyncio.wait_for(func(), timeout=remaining)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError) and deadline_at - time.monotonic() <= 0:
+                    breaker.record_failure()
+                    self.counters["deadline_exceeded"] += 1
+                    raise DeadlineExceededError(f"{provider} request exceeded its deadline") from e
+                if not is_retryable(e):
+                    # The provider answered; a bad request says nothing about its health
+                    breaker.release()
+                    raise
+                if getattr(getattr(e, "response", None), "status_code", None) == 429:
+                    # Throttled, not broken: wait as asked without tripping the breaker
+                    breaker.release()
+                else:
+                    breaker.record_failure()
+                    if breaker.state == CircuitBreaker.OPEN:
+                        raise
+
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                if attempt + 1 >= self.max_attempts or time.monotonic() + delay >= deadline_at:
+                    raise
+                self.counters["retries"] += 1
+                logging.warning(f"{provider} call failed ({type(e).__name__}: {str(e)}), retrying in "
+                                f"{delay:.2f}s (attempt {attempt + 1}/{self.max_attempts})")
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            return result
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "breakers": {provider: breaker.to_dict() for provider, breaker in self.breakers.items()}
+        }
@@ -1,12 +1,112 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from app.config.settings import (
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_MAX_KEEPALIVE_PER_HOST,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_TIMEOUT_SECONDS,
+    HTTP_HOST_CONNECTION_LIMITS,
+    HTTP_ENABLE_HTTP2,
+    HTTP_MAX_CLIENTS,
+    JOB_QUEUE_DB_PATH,
+    JOB_QUEUE_WORKERS,
+    JOB_WEBHOOK_TIMEOUT_SECONDS,
+    REPORT_RENDER_WORKERS,
+    REPORT_RENDER_MAX_QUEUE_DEPTH,
+    PDF_EXTRACT_WORKERS,
+    PDF_PAGES_PER_TASK,
+    API_STATUS_REFRESH_SECONDS,
+    API_STATUS_TIMEOUT_SECONDS
+)
+from app.core.http_clients import HTTPClientRegistry, parse_host_limits, set_http_registry
+from app.core.rate_limiter import rate_limit_tenant
+from app.services.job_queue import ReportJobQueue, set_job_queue
+from app.services.report_renderer import ReportRenderExecutor, set_render_executor
+from app.services.pdf_extractor import PdfTextExtractor, set_pdf_extractor
+from app.services.report_store import create_report_store, set_report_store
+from app.services.api_status.status_checker import APIStatusChecker
+from app.services.api_status.status_monitor import APIStatusMonitor, set_status_monitor
 from app.routes.analysis_routes import router as analysis_router
 from app.routes.api_status_routes import router as status_router
 from app.routes.audio_routes import router as audio_router
 from app.routes.vehicle_info_routes import router as vehicle_router
 
-app = FastAPI(title="AI Analysis API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One connection-pool registry for every outbound HTTP call
+    http_registry = HTTPClientRegistry(
+        max_connections_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_per_host=HTTP_MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        timeout=HTTP_TIMEOUT_SECONDS,
+        host_limits=parse_host_limits(HTTP_HOST_CONNECTION_LIMITS),
+        http2=HTTP_ENABLE_HTTP2,
+        max_clients=HTTP_MAX_CLIENTS
+    )
+    set_http_registry(http_registry)
+    app.state.http_registry = http_registry
+
+    # Warm process pool that renders PDFs off the event loop
+    render_executor = ReportRenderExecutor(
+        workers=REPORT_RENDER_WORKERS,
+        max_queue_depth=REPORT_RENDER_MAX_QUEUE_DEPTH
+    )
+    await asyncio.to_thread(render_executor.start)
+    set_render_executor(render_executor)
+    app.state.render_executor = render_executor
+
+    # Process pool that extracts PDF page text off the event loop
+    pdf_extractor = PdfTextExtractor(workers=PDF_EXTRACT_WORKERS, pages_per_task=PDF_PAGES_PER_TASK)
+    await asyncio.to_thread(pdf_extractor.start)
+    set_pdf_extractor(pdf_extractor)
+    app.state.pdf_extractor = pdf_extractor
+
+    # Durable worker pool for asynchronous damage reports
+    job_queue = ReportJobQueue(
+        str(JOB_QUEUE_DB_PATH),
+        workers=JOB_QUEUE_WORKERS,
+        webhook_timeout=JOB_WEBHOOK_TIMEOUT_SECONDS
+    )
+    await job_queue.start()
+    set_job_queue(job_queue)
+    app.state.job_queue = job_queue
+
+    # Report artifact store with its retention sweeper
+    report_store = create_report_store()
+    if report_store is not None:
+        await report_store.start()
+    set_report_store(report_store)
+    app.state.report_store = report_store
+
+    # Provider status pages, scraped in the background for /api/status
+    status_monitor = APIStatusMonitor(
+        APIStatusChecker(timeout=API_STATUS_TIMEOUT_SECONDS),
+        refresh_interval=API_STATUS_REFRESH_SECONDS
+    )
+    await status_monitor.start()
+    set_status_monitor(status_monitor)
+    app.state.status_monitor = status_monitor
+    try:
+        yield
+    finally:
+        await status_monitor.stop()
+        set_status_monitor(None)
+        if report_store is not None:
+            await report_store.stop()
+        set_report_store(None)
+        await job_queue.stop()
+        set_job_queue(None)
+        set_pdf_extractor(None)
+        await asyncio.to_thread(pdf_extractor.shutdown)
+        set_render_executor(None)
+        await asyncio.to_thread(render_executor.shutdown)
+        await http_registry.aclose()
+        set_http_registry(None)
+
+app = FastAPI(title="AI Analysis API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -17,6 +117,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def set_rate_limit_tenant(request: Request, call_next):
+    """Queue this request's AI calls under its tenant for fair rate limiting"""
+    tenant = request.headers.get("X-Tenant-ID") or (request.client.host if request.client else "default")
+    rate_limit_tenant.set(tenant)
+    return await call_next(request)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
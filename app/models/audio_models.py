@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl, validator
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 class AudioDownloadRequest(BaseModel):
     url: str
@@ -18,4 +18,5 @@ class AudioDownloadResponse(BaseModel):
     filename: str
     size_bytes: int
     duration_seconds: float
-    api_response: Dict[str, Any] 
\ No newline at end of file
+    api_response: Dict[str, Any]
+    transfer_metrics: Optional[Dict[str, Any]] = None 
\ No newline at end of file
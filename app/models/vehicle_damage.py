@@ -1,5 +1,7 @@
-from pydantic import BaseModel, HttpUrl, Field
-from typing import List
+import re
+from pydantic import BaseModel, BeforeValidator, ConfigDict, HttpUrl, Field
+from typing import Any, List, Optional, Literal
+from typing_extensions import Annotated
 from datetime import datetime
 
 class VehicleDamageRequest(BaseModel):
@@ -22,4 +24,138 @@ class VehicleDamageResponse(BaseModel):
     message: str
     order_id: str
     analysis: dict
-    pdf_report: dict 
\ No newline at end of file
+    pdf_report: dict 
+
+class VehicleDamageJobRequest(VehicleDamageRequest):
+    report_version: Literal["v1", "v2"] = Field("v1", description="PDF report format to generate")
+    webhook_url: Optional[str] = Field(None, description="URL that receives the finished job as a POST request")
+
+class VehicleDamageJobResponse(BaseModel):
+    job_id: str
+    order_id: str
+    report_version: str
+    status: str
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: float
+    updated_at: float
+
+# Typed damage report, as requested from the model in structured-output mode.
+# Aliases are the human-readable section and field names the free-form
+# prompt asks for, so dumps by alias look like the reports already in use.
+
+DAMAGE_REPORT_SCHEMA_NAME = "vehicle_damage_report"
+
+_AMOUNT = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+def _parse_amount(value: Any) -> Any:
+    """Accept amounts written as text ("Rs. 12,500", "₹12500 INR") as well as numbers; a range keeps its first amount"""
+    if isinstance(value, str):
+        match = _AMOUNT.search(value)
+        if not match:
+            return None
+        return round(float(match.group().replace(",", "")))
+    if isinstance(value, float):
+        return round(value)
+    return value
+
+Amount = Annotated[Optional[int], BeforeValidator(_parse_amount)]
+
+class ReportModel(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+class VehicleDetails(ReportModel):
+    make: Optional[str] = Field(None, alias="Make")
+    model: Optional[str] = Field(None, alias="Model")
+    year_of_manufacture: Optional[int] = Field(None, alias="Year of Manufacture")
+    odometer_reading: Optional[str] = Field(None, alias="Odometer Reading")
+    color: Optional[str] = Field(None, alias="Vehicle Color")
+    registration_number: Optional[str] = Field(None, alias="Registration Number")
+    registered_state: Optional[str] = Field(None, alias="Registered State")
+    rto_name: Optional[str] = Field(None, alias="RTO Name")
+    claims_reported_location: Optional[str] = Field(None, alias="Claims Reported Location")
+
+class DashboardCondition(ReportModel):
+    speedometer_reading: Optional[str] = Field(None, alias="Speedometer Reading")
+    odometer_reading: Optional[str] = Field(None, alias="Odometer Reading")
+    fuel_level: Optional[str] = Field(None, alias="Fuel Level")
+    warning_lights: List[str] = Field(default_factory=list, alias="Warning Lights")
+    temperature: Optional[str] = Field(None, alias="Temperature")
+    gear_position: Optional[str] = Field(None, alias="Gear Position")
+
+class DamagedComponent(ReportModel):
+    component: str = Field(..., alias="Component")
+    observation: str = Field(..., alias="Observation")
+    recommendation: str = Field(..., alias="Recommendation")
+
+class RepairCostItem(ReportModel):
+    component: str = Field(..., alias="Component")
+    cost: Amount = Field(None, alias="Cost")
+
+class RepairCostEstimate(ReportModel):
+    items: List[RepairCostItem] = Field(default_factory=list, alias="Components")
+    total_repair_cost: Amount = Field(None, alias="Total Repair Cost")
+
+    @property
+    def total(self) -> int:
+        """The stated total, or the sum of the components when the model left it out"""
+        if self.total_repair_cost is not None:
+            return self.total_repair_cost
+        return sum(item.cost or 0 for item in self.items)
+
+class MarketQuote(ReportModel):
+    dealer: str = Field(..., alias="Dealer")
+    value: Amount = Field(None, alias="Value")
+
+class MarketValuation(ReportModel):
+    pre_accident_value: Amount = Field(None, alias="Pre-Accident Value")
+    post_accident_value: Amount = Field(None, alias="Post-Accident Value")
+    salvage_value: Amount = Field(None, alias="Salvage Value")
+    estimated_value_after_repairs: Amount = Field(None, alias="Estimated Value After Repairs")
+    market_quotes: List[MarketQuote] = Field(default_factory=list, alias="Market Quotes")
+
+class VehicleConsistencyCheck(ReportModel):
+    same_vehicle_detected: bool = Field(..., alias="Same Vehicle Detected")
+    reason: str = Field(..., alias="Reason")
+
+class DamageReport(ReportModel):
+    vehicle_details: VehicleDetails = Field(default_factory=VehicleDetails, alias="Vehicle Details")
+    dashboard: DashboardCondition = Field(default_factory=DashboardCondition, alias="Vehicle Dashboard and Condition")
+    stickers_and_signs: List[str] = Field(default_factory=list, alias="Stickers and Signs Observed")
+    damage_analysis: List[DamagedComponent] = Field(default_factory=list, alias="Damage Analysis")
+    repair_costs: RepairCostEstimate = Field(default_factory=RepairCostEstimate, alias="Repair Cost Estimation (INR)")
+    market_valuation: MarketValuation = Field(default_factory=MarketValuation, alias="Market Valuation (INR)")
+    consistency_check: Optional[VehicleConsistencyCheck] = Field(None, alias="Vehicle Consistency Check")
+
+    @classmethod
+    def response_format(cls) -> dict:
+        """OpenAI response_format that makes the model answer with exactly this schema"""
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": DAMAGE_REPORT_SCHEMA_NAME,
+                "strict": True,
+                "schema": strict_json_schema(cls.model_json_schema(by_alias=True))
+            }
+        }
+
+    def to_report_dict(self) -> dict:
+        """JSON-ready dict keyed by the human-readable section names"""
+        return self.model_dump(mode="json", by_alias=True)
+
+def strict_json_schema(schema: Any) -> Any:
+    """
+    Adapt a Pydantic JSON schema to OpenAI's strict mode: every property is
+    required (optional ones are already nullable), no additional properties,
+    and no defaults.
+    """
+    if isinstance(schema, list):
+        return [strict_json_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    schema = {key: strict_json_schema(value) for key, value in schema.items() if key != "default"}
+    if schema.get("type") == "object" and "properties" in schema:
+        schema["required"] = list(schema["properties"])
+        schema["additionalProperties"] = False
+    return schema
@@ -1,21 +1,51 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import JSONResponse
-from app.services.api_status.status_checker import APIStatusChecker
+from app.services.api_status.status_monitor import APIStatusMonitor, get_status_monitor
+from app.core.http_clients import HTTPClientRegistry, get_http_registry
+from app.core.ai_clients import get_ai_router
+from app.core.provider_router import ProviderRouter
+from app.services.report_store import get_report_store
+import asyncio
 import logging
 
 router = APIRouter()
 
 @router.get("/api/status")
-async def get_api_status():
+async def get_api_status(status_monitor: APIStatusMonitor = Depends(get_status_monitor)):
     """
-    Get the operational status of all AI APIs
+    Get the operational status of all AI APIs from the background-refreshed snapshot
     Returns:
-        JSON with status of OpenAI, Claude, Gemini, and Llama APIs
+        JSON with status of OpenAI, Claude, Gemini, and Llama APIs, plus a
+        "snapshot" object with its age and per-provider errors and latency
     """
     try:
-        checker = APIStatusChecker()
-        statuses = checker.get_all_statuses()
+        statuses = await status_monitor.get_snapshot()
         return JSONResponse(content=statuses)
     except Exception as e:
         logging.error(f"Error in API status endpoint: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e)) 
+
+@router.get("/api/status/http-pools")
+async def get_http_pool_metrics(http_registry: HTTPClientRegistry = Depends(get_http_registry)):
+    """
+    Get hit/miss metrics for the shared outbound HTTP connection pools
+    """
+    return JSONResponse(content=http_registry.get_metrics())
+
+@router.get("/api/status/report-store")
+async def get_report_store_stats():
+    """
+    Get size, artifact count and last sweep result of the PDF report store
+    """
+    report_store = get_report_store()
+    if report_store is None:
+        return JSONResponse(content={"enabled": False})
+    stats = await asyncio.to_thread(report_store.get_stats)
+    return JSONResponse(content={"enabled": True, **stats})
+
+@router.get("/api/status/ai-router")
+async def get_ai_router_metrics(ai_router: ProviderRouter = Depends(get_ai_router)):
+    """
+    Get rolling latency/error statistics and routing decisions of the AI provider router
+    """
+    return JSONResponse(content=ai_router.get_metrics())
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Response, Depends
 from app.models.audio_models import AudioDownloadRequest, AudioDownloadResponse
 from app.services.audio_service.audio_processor import AudioProcessor
+from app.core.http_clients import HTTPClientRegistry, get_http_registry
 import logging
 import json
 
@@ -8,19 +9,21 @@ router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 
 @router.post("/audio/process")
-async def process_audio(request: AudioDownloadRequest, response: Response):
+async def process_audio(request: AudioDownloadRequest,
+                        response: Response,
+                        http_registry: HTTPClientRegistry = Depends(get_http_registry)):
     """
     Process audio file download and API call
     
     This endpoint:
-    1. Downloads an audio file from the provided URL using basic authentication
-    2. Saves the file locally
-    3. Returns file details and success response
+    1. Streams an audio file from the provided URL to disk using basic authentication
+    2. Reads the MP3 duration in a worker thread
+    3. Returns file details, transfer metrics and success response
     """
     try:
         logging.info(f"Processing audio request for SRN: {request.srn_number}, Order ID: {request.order_id}")
         
-        processor = AudioProcessor()
+        processor = AudioProcessor(http_registry=http_registry)
         result = await processor.process_audio(
             url=request.url,
             username=request.username,
@@ -36,7 +39,8 @@ async def process_audio(request: AudioDownloadRequest, response: Response):
             "filename": result.get("filename", ""),
             "size_bytes": result.get("size_bytes", 0),
             "duration_seconds": result.get("duration_seconds", 0.0),
-            "api_response": result.get("api_response", {})
+            "api_response": result.get("api_response", {}),
+            "transfer_metrics": result.get("transfer_metrics", {})
         }
         
         return response_data
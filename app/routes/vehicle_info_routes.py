@@ -1,96 +1,160 @@
-from fastapi import APIRouter, Request, Form, UploadFile, File, HTTPException
+from fastapi import APIRouter, Request, Form, UploadFile, File, HTTPException, Depends, Response, Query
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, FileResponse, RedirectResponse
+from starlette.background import BackgroundTask
 from app.services.analysis_service import AnalysisService
-from app.models.vehicle_damage import VehicleDamageRequest, VehicleDamageResponse
-from app.services.pdf_report_generator import VehicleDamageReportGenerator
-from app.services.pdf_report_generator_v2 import VehicleDamageReportGeneratorV2
-from pathlib import Path
+from app.models.vehicle_damage import (
+    VehicleDamageRequest,
+    VehicleDamageResponse,
+    VehicleDamageJobRequest,
+    VehicleDamageJobResponse
+)
+from app.services.report_service import persist_pdf_report, render_pdf_report
+from app.services.report_renderer import RenderedReport, RenderQueueFullError
+from app.services.job_queue import ReportJobQueue, get_job_queue
+from app.services.report_store import ReportArtifactStore, get_report_store
+from typing import Literal
+import asyncio
 import logging
 import os
 
 router = APIRouter(prefix="/vehicle", tags=["Vehicle Information"])
 
+DELIVERY_QUERY = Query("link", description="'link' stores the PDF and returns its URL; 'inline' streams the PDF back")
+
+def _pdf_response(report: RenderedReport, order_id: str) -> StreamingResponse:
+    """Stream a rendered report back as application/pdf, removing any spill file afterwards"""
+    return StreamingResponse(
+        report.iter_chunks(),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'inline; filename="{report.filename}"',
+            "Content-Length": str(report.size),
+            "X-Order-Id": order_id
+        },
+        background=BackgroundTask(report.cleanup)
+    )
+
 @router.post("/analyze/damage")
-async def analyze_vehicle_damage(request: VehicleDamageRequest):
+async def analyze_vehicle_damage(request: VehicleDamageRequest,
+                                 delivery: Literal["link", "inline"] = DELIVERY_QUERY):
     """
-    Analyze vehicle damage from provided images and generate a report
+    Analyze vehicle damage from provided images and generate a report.
+    With delivery=inline the PDF itself is returned instead of the JSON result.
     """
     try:
         # Get analysis result
         result = await AnalysisService.analyze_vehicle_damage(request)
-        
-        # Create output directory if it doesn't exist
-        output_dir = Path("static/reports")
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate PDF report
-        report_generator = VehicleDamageReportGenerator()
-        pdf_path = report_generator.generate_report(result, str(output_dir))
-        
-        # Get the relative path for the PDF
-        pdf_filename = os.path.basename(pdf_path)
-        
-        # Log the generated PDF path
-        logging.info(f"Generated PDF report at: {pdf_path}")
-        
-        # Verify the PDF exists
-        if not os.path.exists(pdf_path):
-            raise HTTPException(status_code=500, detail="Failed to generate PDF report")
-        
+
+        # Generate PDF report in the render pool
+        report = await render_pdf_report(result, "v1")
+        if delivery == "inline":
+            return _pdf_response(report, request.order_id)
+        pdf_report = await persist_pdf_report(report, request.order_id, "v1")
+
         return JSONResponse(content={
             "success": True,
             "message": "Analysis completed successfully",
             "order_id": request.order_id,
             "analysis": result,
-            "pdf_report": {
-                "filename": pdf_filename,
-                "url": f"/static/reports/{pdf_filename}"
-            }
+            "pdf_report": pdf_report
         })
-        
+
+    except RenderQueueFullError as e:
+        logging.warning(f"Rejected vehicle damage report: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logging.error(f"Error in vehicle damage analysis endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/analyze/damage/v2")
-async def analyze_vehicle_damage_v2(request: VehicleDamageRequest):
+async def analyze_vehicle_damage_v2(request: VehicleDamageRequest,
+                                    delivery: Literal["link", "inline"] = DELIVERY_QUERY):
     """
-    Analyze vehicle damage and generate a report using the alternate PDF format
+    Analyze vehicle damage and generate a report using the alternate PDF format.
+    With delivery=inline the PDF itself is returned instead of the JSON result.
     """
     try:
         # Get analysis result
         result = await AnalysisService.analyze_vehicle_damage(request)
-        
-        # Create output directory if it doesn't exist
-        output_dir = Path("static/reports")
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate PDF report using V2 generator
-        report_generator = VehicleDamageReportGeneratorV2()
-        pdf_path = report_generator.generate_report(result, str(output_dir))
-        
-        # Get the relative path for the PDF
-        pdf_filename = os.path.basename(pdf_path)
-        
-        # Log the generated PDF path
-        logging.info(f"Generated V2 PDF report at: {pdf_path}")
-        
-        # Verify the PDF exists
-        if not os.path.exists(pdf_path):
-            raise HTTPException(status_code=500, detail="Failed to generate PDF report")
-        
+
+        # Generate PDF report using V2 generator in the render pool
+        report = await render_pdf_report(result, "v2")
+        if delivery == "inline":
+            return _pdf_response(report, request.order_id)
+        pdf_report = await persist_pdf_report(report, request.order_id, "v2")
+
         return JSONResponse(content={
             "success": True,
             "message": "Analysis completed successfully",
             "order_id": request.order_id,
             "analysis": result,
-            "pdf_report": {
-                "filename": pdf_filename,
-                "url": f"/static/reports/{pdf_filename}"
-            }
+            "pdf_report": pdf_report
         })
-        
+
+    except RenderQueueFullError as e:
+        logging.warning(f"Rejected vehicle damage V2 report: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logging.error(f"Error in vehicle damage analysis V2 endpoint: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/analyze/damage/jobs", response_model=VehicleDamageJobResponse, status_code=202)
+async def submit_vehicle_damage_job(request: VehicleDamageJobRequest,
+                                    response: Response,
+                                    job_queue: ReportJobQueue = Depends(get_job_queue)):
+    """
+    Queue a vehicle damage analysis and report for background processing.
+    Returns immediately with a job id; poll GET /vehicle/analyze/damage/jobs/{job_id}
+    or pass webhook_url to be notified when the job finishes.
+    Resubmitting an order_id returns the existing job.
+    """
+    try:
+        job, created = await job_queue.submit(request)
+        if not created:
+            response.status_code = 200
+        return job
+    except Exception as e:
+        logging.error(f"Error submitting vehicle damage job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analyze/damage/jobs/{job_id}", response_model=VehicleDamageJobResponse)
+async def get_vehicle_damage_job(job_id: str, job_queue: ReportJobQueue = Depends(get_job_queue)):
+    """
+    Get the status, and once completed the result, of a vehicle damage job
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+def _require_report_store() -> ReportArtifactStore:
+    report_store = get_report_store()
+    if report_store is None:
+        raise HTTPException(status_code=404, detail="Report storage is disabled")
+    return report_store
+
+@router.get("/reports/orders/{order_id}")
+async def list_order_reports(order_id: str, report_store: ReportArtifactStore = Depends(_require_report_store)):
+    """
+    List the stored PDF reports of an order, newest first
+    """
+    reports = await asyncio.to_thread(report_store.list_reports, order_id)
+    return JSONResponse(content={"order_id": order_id, "reports": reports})
+
+@router.get("/reports/{key}")
+async def download_report(key: str, report_store: ReportArtifactStore = Depends(_require_report_store)):
+    """
+    Download a stored PDF report by the key returned in pdf_report.url
+    """
+    artifact = await asyncio.to_thread(report_store.open, key)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail=f"Report {key} not found")
+
+    kind, target, filename = artifact
+    if kind == "redirect":
+        return RedirectResponse(target)
+    if not os.path.exists(target):
+        raise HTTPException(status_code=404, detail=f"Report {key} not found")
+    return FileResponse(target, media_type="application/pdf",
+                        headers={"Content-Disposition": f'inline; filename="{filename}"'})
@@ -1,24 +1,44 @@
-from app.core.ai_clients import grok_client, openai_client
-from app.config.settings import GROK_MODEL, OPENAI_MODEL
+from app.core.ai_clients import ai_router
+from app.config.settings import (
+    VEHICLE_DAMAGE_MAX_CONCURRENCY_PER_ORDER,
+    VEHICLE_DAMAGE_MAX_CONCURRENCY_GLOBAL,
+    IMAGE_MAX_EDGE,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_PREPROCESS_WORKERS,
+    PDF_CHUNK_MAX_TOKENS,
+    PDF_CHUNK_NOTES_MAX_TOKENS,
+    PDF_CHUNK_CONCURRENCY
+)
 import logging
 from typing import Dict, Any, Optional, List
-import base64
-from pathlib import Path
-import PyPDF2
-import tempfile
 import shutil
 import uuid
-import httpx
 from app.models.vehicle_damage import VehicleDamageRequest
-import aiohttp
+from app.core.http_clients import get_http_registry
+from app.core.rate_limiter import rate_limit_tenant
+from app.core.prompts import count_tokens, prompt_registry
+from app.services.pdf_extractor import extract_pdf_pages
+from app.utils.image_preprocess import ImagePreprocessor
+from app.utils.text_chunks import chunk_pages
+import asyncio
 import os
+import time
+
+# Caps in-flight image downloads/analyses across all concurrent orders
+_global_image_semaphore = asyncio.Semaphore(VEHICLE_DAMAGE_MAX_CONCURRENCY_GLOBAL)
+
+image_preprocessor = ImagePreprocessor(
+    max_edge=IMAGE_MAX_EDGE,
+    jpeg_quality=IMAGE_JPEG_QUALITY,
+    workers=IMAGE_PREPROCESS_WORKERS
+)
 
 class AnalysisService:
     @staticmethod
     async def analyze_text(text: str) -> Dict[str, Any]:
         try:
-            response = await grok_client.chat.completions.create(
-                model=GROK_MODEL,
+            response = await ai_router.chat_completion(
+                "text",
                 messages=[{"role": "user", "content": text}]
             )
             return {"analysis": response.choices[0].message.content}
@@ -29,62 +49,115 @@ class AnalysisService:
     @staticmethod
     async def analyze_image(image_data: bytes) -> Dict[str, Any]:
         try:
-            base64_image = base64.b64encode(image_data).decode('utf-8')
-            response = await openai_client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": "Analyze this image and provide a detailed description."},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
-                        ]
-                    }
-                ],
+            # Downscale and strip metadata before encoding
+            prepared = await image_preprocessor.aprocess(image_data)
+            preprocessing = ImagePreprocessor.summarize([prepared])
+            logging.info(f"Image preprocessing saved {preprocessing['bytes_saved']} bytes")
+
+            prompt = prompt_registry.get("image-description")
+            response = await ai_router.chat_completion(
+                "vision",
+                prompt=prompt,
+                messages=prompt.messages([prepared.to_data_url()]),
                 max_tokens=500
             )
-            return {"analysis": response.choices[0].message.content}
+            return {"analysis": response.choices[0].message.content, "preprocessing": preprocessing}
         except Exception as e:
             logging.error(f"Error in image analysis: {str(e)}")
             raise
 
     @staticmethod
     async def analyze_pdf(pdf_file: bytes) -> Dict[str, Any]:
+        """
+        Analyze the text of a PDF, parsed straight from memory with its pages
+        extracted in the PDF worker pool.
+
+        A document that fits in one prompt is analyzed as a whole. A longer
+        one is split into chunks of at most PDF_CHUNK_MAX_TOKENS, whose notes
+        are taken concurrently (map) and then merged into one analysis
+        (reduce), so no prompt outgrows the model's context window.
+        """
         try:
-            # Create a temporary file to store the PDF
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(pdf_file)
-                temp_path = temp_file.name
-
-            # Extract text from PDF
-            text_content = []
-            with open(temp_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text_content.append(page.extract_text())
-
-            # Clean up temporary file
-            Path(temp_path).unlink()
-
-            # Analyze the extracted text
-            combined_text = "\n".join(text_content)
-            return await AnalysisService.analyze_text(combined_text)
+            started = time.perf_counter()
+            pages = await extract_pdf_pages(pdf_file)
+            chunks = chunk_pages(pages, PDF_CHUNK_MAX_TOKENS)
+            if len(chunks) <= 1:
+                return await AnalysisService.analyze_text("\n".join(pages))
+
+            logging.info(f"Analyzing {len(pages)}-page PDF in {len(chunks)} chunks")
+            semaphore = asyncio.Semaphore(PDF_CHUNK_CONCURRENCY)
+            chunk_prompt = prompt_registry.get("document-chunk")
+
+            async def analyze_chunk(chunk) -> str:
+                async with semaphore:
+                    response = await ai_router.chat_completion(
+                        "text",
+                        prompt=chunk_prompt,
+                        messages=chunk_prompt.messages(first_page=chunk.first_page, last_page=chunk.last_page,
+                                                       page_count=len(pages), text=chunk.text),
+                        max_tokens=PDF_CHUNK_NOTES_MAX_TOKENS
+                    )
+                notes = response.choices[0].message.content or ""
+                return f"Pages {chunk.first_page}-{chunk.last_page}:\n{notes.strip()}"
+
+            notes = await asyncio.gather(*(analyze_chunk(chunk) for chunk in chunks))
+            analysis = await AnalysisService._merge_pdf_notes(list(notes), len(pages), semaphore)
+            return {
+                "analysis": analysis,
+                "pages": len(pages),
+                "chunks": [chunk.to_dict() for chunk in chunks],
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+            }
         except Exception as e:
             logging.error(f"Error in PDF analysis: {str(e)}")
             raise
 
+    @staticmethod
+    async def _merge_pdf_notes(notes: List[str], page_count: int, semaphore: asyncio.Semaphore) -> str:
+        """
+        Reduce chunk notes to one analysis. Notes that don't fit one prompt
+        are merged in groups, concurrently, and the merged notes merged
+        again until a single prompt holds them all.
+        """
+        merge_prompt = prompt_registry.get("document-merge")
+
+        async def merge(group: List[str], final: bool) -> str:
+            # Intermediate merges are notes again, so they keep the notes' budget
+            options = {} if final else {"max_tokens": PDF_CHUNK_NOTES_MAX_TOKENS}
+            async with semaphore:
+                response = await ai_router.chat_completion(
+                    "text",
+                    prompt=merge_prompt,
+                    messages=merge_prompt.messages(page_count=page_count, notes="\n\n".join(group)),
+                    **options
+                )
+            return response.choices[0].message.content or ""
+
+        while True:
+            groups: List[List[str]] = []
+            tokens = 0
+            for note in notes:
+                note_tokens = count_tokens(note) + 2
+                # Every group takes at least two notes, so each round shrinks the list
+                if groups and len(groups[-1]) >= 2 and tokens + note_tokens > PDF_CHUNK_MAX_TOKENS:
+                    groups.append([])
+                    tokens = 0
+                if not groups:
+                    groups.append([])
+                groups[-1].append(note)
+                tokens += note_tokens
+            if len(groups) == 1:
+                return await merge(groups[0], final=True)
+            logging.info(f"Merging {len(notes)} PDF chunk notes in {len(groups)} groups")
+            notes = list(await asyncio.gather(*(merge(group, final=False) for group in groups)))
+
     @staticmethod
     async def analyze_webpage(url: str) -> Dict[str, Any]:
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url)
-                response.raise_for_status()
-                content = response.text
+            client = get_http_registry().get_client(url)
+            response = await client.get(url)
+            response.raise_for_status()
+            content = response.text
 
             # Analyze the webpage content
             return await AnalysisService.analyze_text(content)
@@ -96,46 +169,81 @@ class AnalysisService:
     async def analyze_vehicle_damage(request: VehicleDamageRequest) -> Dict[str, Any]:
         """
         Analyze vehicle damage from provided image URLs
+
+        Images are downloaded and analyzed concurrently, bounded by a per-order
+        limit and a process-wide limit shared by all orders. Results keep the
+        order of request.image_urls.
         """
+        # AI calls are queued under the caller's tenant; only a caller without
+        # one (e.g. a job worker) gets a fair-queue slot per order instead
+        tenant_token = None
+        if rate_limit_tenant.get() == "default":
+            tenant_token = rate_limit_tenant.set(f"order:{request.order_id}")
         try:
-            # Initialize results
-            analysis_results = []
-            
-            # Process each image URL
-            async with aiohttp.ClientSession() as session:
-                for image_url in request.image_urls:
-                    try:
-                        # Download image
-                        async with session.get(image_url) as response:
-                            if response.status != 200:
-                                logging.error(f"Failed to download image from {image_url}")
-                                continue
-                                
-                            image_data = await response.read()
-                            
-                            # Analyze image using OpenAI Vision
-                            analysis = await AnalysisService._analyze_image_with_openai(image_data)
-                            
-                            analysis_results.append({
-                                "image_url": image_url,
-                                "analysis": analysis
-                            })
-                            
-                    except Exception as e:
-                        logging.error(f"Error processing image {image_url}: {str(e)}")
-                        continue
-            
+            started = time.perf_counter()
+            order_semaphore = asyncio.Semaphore(VEHICLE_DAMAGE_MAX_CONCURRENCY_PER_ORDER)
+
+            image_results = await asyncio.gather(*[
+                AnalysisService._process_damage_image(image_url, order_semaphore)
+                for image_url in request.image_urls
+            ])
+
+            # Drop failed images, keeping the original order of the rest
+            analysis_results = [result for result in image_results if result is not None]
+
             # Compile final result
             return {
                 "order_id": request.order_id,
                 "total_images": len(request.image_urls),
                 "processed_images": len(analysis_results),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
                 "results": analysis_results
             }
             
         except Exception as e:
             logging.error(f"Error in vehicle damage analysis: {str(e)}")
             raise
+        finally:
+            if tenant_token is not None:
+                rate_limit_tenant.reset(tenant_token)
+
+    @staticmethod
+    async def _process_damage_image(image_url: str,
+                                    order_semaphore: asyncio.Semaphore) -> Optional[Dict[str, Any]]:
+        """
+        Download and analyze a single image, returning None if it fails
+        """
+        async with order_semaphore, _global_image_semaphore:
+            try:
+                started = time.perf_counter()
+
+                # Download image over the shared connection pool
+                client = get_http_registry().get_client(image_url)
+                response = await client.get(image_url)
+                if response.status_code != 200:
+                    logging.error(f"Failed to download image from {image_url}")
+                    return None
+
+                image_data = response.content
+                downloaded = time.perf_counter()
+
+                # Analyze image using OpenAI Vision
+                analysis = await AnalysisService._analyze_image_with_openai(image_data)
+                finished = time.perf_counter()
+
+                return {
+                    "image_url": image_url,
+                    "analysis": analysis,
+                    "timing": {
+                        "download_ms": round((downloaded - started) * 1000, 2),
+                        "analysis_ms": round((finished - downloaded) * 1000, 2),
+                        "total_ms": round((finished - started) * 1000, 2)
+                    }
+                }
+
+            except Exception as e:
+                logging.error(f"Error processing image {image_url}: {str(e)}")
+                return None
 
     @staticmethod
     async def _analyze_image_with_openai(image_data: bytes) -> Dict[str, Any]:
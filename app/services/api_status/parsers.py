@@ -0,0 +1,212 @@
+import json
+import re
+from collections import deque
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+
+class StatusParseError(ValueError):
+    """Raised when a status page doesn't contain what its parser looks for"""
+
+
+class StatuspageSummaryParser:
+    """
+    Parses a statuspage.io summary.json (https://<page>/api/v2/summary.json).
+
+    With component set, the first component whose name contains it (case
+    insensitive) decides the status; otherwise the page-wide indicator does.
+    """
+
+    def __init__(self, component: Optional[str] = None):
+        self.component = component
+
+    def parse(self, text: str) -> int:
+        try:
+            summary = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise StatusParseError(f"Invalid summary.json: {str(e)}")
+
+        if self.component:
+            for component in summary.get("components", []):
+                if self.component.lower() in component.get("name", "").lower():
+                    return 1 if component.get("status") == "operational" else 0
+
+        indicator = summary.get("status", {}).get("indicator")
+        if indicator is None:
+            raise StatusParseError("summary.json has no status indicator")
+        return 1 if indicator == "none" else 0
+
+
+class _StopParsing(Exception):
+    pass
+
+
+def _class_tokens(attrs: Dict[str, Optional[str]]) -> List[str]:
+    return (attrs.get("class") or "").split()
+
+
+class TargetedHTMLExtractor(HTMLParser):
+    """
+    Base for event-driven extractors that look for a single element of a
+    status page. No tree is built, and parsing stops as soon as the target
+    has been seen. Subclasses call stop() once they have their answer and
+    implement result().
+    """
+
+    @classmethod
+    def parse(cls, text: str) -> int:
+        extractor = cls()
+        try:
+            extractor.feed(text)
+            extractor.close()
+        except _StopParsing:
+            pass
+        return extractor.result()
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+
+    def stop(self):
+        raise _StopParsing()
+
+    def result(self) -> int:
+        raise NotImplementedError
+
+
+class OpenAIStatusExtractor(TargetedHTMLExtractor):
+    """Last uptime pill <rect> of the first <svg class="mb-1"> on status.openai.com"""
+
+    def __init__(self):
+        super().__init__()
+        self._svg_depth = 0
+        self._last_rect_class: Optional[str] = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self._svg_depth:
+            if tag == "svg":
+                self._svg_depth += 1
+            elif tag == "rect":
+                self._last_rect_class = attrs.get("class") or ""
+        elif tag == "svg" and "mb-1" in _class_tokens(attrs):
+            self._svg_depth = 1
+
+    def handle_endtag(self, tag):
+        if self._svg_depth and tag == "svg":
+            self._svg_depth -= 1
+            if not self._svg_depth:
+                self.stop()
+
+    def result(self) -> int:
+        if self._last_rect_class is None:
+            raise StatusParseError("OpenAI uptime chart not found")
+        return 1 if 'transition UptimeChart_pillOperational__sYJ07' in self._last_rect_class else 0
+
+
+class GeminiStatusExtractor(TargetedHTMLExtractor):
+    """
+    Status icon in the third cell of the 7th-from-last table row on
+    status.cloud.google.com. The target is counted from the end, so only the
+    icon class of the last seven rows is kept while scanning.
+    """
+
+    ROW_FROM_END = 7
+
+    def __init__(self):
+        super().__init__()
+        # One [cells seen, icon class] entry per recent row
+        self._rows = deque(maxlen=self.ROW_FROM_END)
+        self._open_rows: List[list] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            row = [0, None]
+            self._rows.append(row)
+            self._open_rows.append(row)
+        elif not self._open_rows:
+            return
+        elif tag == "td":
+            self._open_rows[-1][0] += 1
+        elif tag == "svg":
+            row = self._open_rows[-1]
+            if row[0] == 3 and row[1] is None:
+                row[1] = dict(attrs).get("class") or ""
+
+    def handle_endtag(self, tag):
+        if tag == "tr" and self._open_rows:
+            self._open_rows.pop()
+
+    def result(self) -> int:
+        if len(self._rows) < self.ROW_FROM_END or self._rows[0][1] is None:
+            raise StatusParseError("Gemini status row not found")
+        return 1 if 'psd__status-icon psd__available' in self._rows[0][1] else 0
+
+
+class _ComponentTextExtractor(TargetedHTMLExtractor):
+    """
+    Text of the span_index-th <span> (optionally with span_class) inside the
+    first <div> whose class attribute is exactly container_class
+    """
+
+    container_class = ""
+    span_class: Optional[str] = None
+    span_index = 0
+    expected_text = "Operational"
+
+    def __init__(self):
+        super().__init__()
+        self._div_depth = 0
+        self._spans_seen = 0
+        self._span_depth = 0
+        self._text: List[str] = []
+        self._found = False
+
+    def handle_starttag(self, tag, attrs):
+        if self._span_depth:
+            if tag == "span":
+                self._span_depth += 1
+            return
+        if not self._div_depth:
+            if tag == "div" and dict(attrs).get("class") == self.container_class:
+                self._div_depth = 1
+            return
+        if tag == "div":
+            self._div_depth += 1
+        elif tag == "span" and (self.span_class is None or self.span_class in _class_tokens(dict(attrs))):
+            if self._spans_seen == self.span_index:
+                self._span_depth = 1
+                self._found = True
+            self._spans_seen += 1
+
+    def handle_endtag(self, tag):
+        if self._span_depth and tag == "span":
+            self._span_depth -= 1
+            if not self._span_depth:
+                self.stop()
+        elif self._div_depth and tag == "div":
+            self._div_depth -= 1
+            if not self._div_depth:
+                self.stop()
+
+    def handle_data(self, data):
+        if self._span_depth:
+            self._text.append(data)
+
+    def result(self) -> int:
+        if not self._found:
+            raise StatusParseError(f"{type(self).__name__}: component status not found")
+        return 1 if re.sub(r'\s+', '', ''.join(self._text)) == self.expected_text else 0
+
+
+class LlamaStatusExtractor(_ComponentTextExtractor):
+    """Ninth span of the first component group on llamaindex.statuspage.io"""
+
+    container_class = "component-container border-color is-group"
+    span_index = 8
+
+
+class ClaudeStatusExtractor(_ComponentTextExtractor):
+    """First component-status span of the first component on status.anthropic.com"""
+
+    container_class = "component-container border-color"
+    span_class = "component-status"
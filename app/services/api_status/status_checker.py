@@ -1,82 +1,99 @@
-from bs4 import BeautifulSoup
-import requests
-import json
-import re
+import asyncio
+import time
 from typing import Dict, Any
 import logging
+from app.core.http_clients import get_http_registry
+from app.services.api_status.parsers import (
+    StatuspageSummaryParser,
+    OpenAIStatusExtractor,
+    GeminiStatusExtractor,
+    LlamaStatusExtractor,
+    ClaudeStatusExtractor
+)
 
 class APIStatusChecker:
-    def __init__(self):
+    def __init__(self, timeout: float = 10.0):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 6.3; Win 64 ; x64) Apple WeKit /537.36(KHTML , like Gecko) Chrome/80.0.3987.162 Safari/537.36'
         }
-        self.urls = {
-            'openai': 'https://status.openai.com/',
-            'gemini': 'https://status.cloud.google.com/',
-            'llama': 'https://llamaindex.statuspage.io/',
-            'claude': 'https://status.anthropic.com/'
+        # Provider name -> status sources tried in order. Each parser has a
+        # parse(text) -> int method (1 = operational) and raises on pages it
+        # can't read, which moves on to the next source.
+        self.sources = {
+            'openai': [
+                ('https://status.openai.com/api/v2/summary.json', StatuspageSummaryParser()),
+                ('https://status.openai.com/', OpenAIStatusExtractor)
+            ],
+            'gemini': [
+                ('https://status.cloud.google.com/', GeminiStatusExtractor)
+            ],
+            'llama': [
+                ('https://llamaindex.statuspage.io/api/v2/summary.json', StatuspageSummaryParser()),
+                ('https://llamaindex.statuspage.io/', LlamaStatusExtractor)
+            ],
+            'claude': [
+                ('https://status.anthropic.com/api/v2/summary.json', StatuspageSummaryParser()),
+                ('https://status.anthropic.com/', ClaudeStatusExtractor)
+            ]
         }
-        self.soups = {}
-        self._initialize_soups()
-
-    def _initialize_soups(self):
-        """Initialize BeautifulSoup objects for all APIs"""
-        try:
-            for name, url in self.urls.items():
-                response = requests.get(url, headers=self.headers)
-                response.raise_for_status()  # Raise an exception for bad status codes
-                self.soups[name] = BeautifulSoup(response.text, 'html.parser')
-        except Exception as e:
-            logging.error(f"Error initializing API status checker: {str(e)}")
-            raise
-
-    def check_openai_status(self) -> int:
-        """Check OpenAI API status"""
-        try:
-            soup = self.soups['openai']
-            text = soup.find_all('svg', {'class': 'mb-1'})[0].find_all('rect')[-1]
-            return 1 if 'transition UptimeChart_pillOperational__sYJ07' in str(text) else 0
-        except Exception as e:
-            logging.error(f"Error checking OpenAI status: {str(e)}")
-            return 0
+        # Provider name -> label used in the /api/status response
+        self.labels = {
+            'openai': 'OpenAI',
+            'claude': 'Claude',
+            'gemini': 'Gemini',
+            'llama': 'Llama'
+        }
+        self.timeout = timeout
 
-    def check_gemini_status(self) -> int:
-        """Check Google Cloud Gemini API status"""
-        try:
-            soup = self.soups['gemini']
-            status_element = soup.findAll('tr')[-7].find_all('td')[2].find_all('svg')[0]
-            return 1 if 'psd__status-icon psd__available' in str(status_element) else 0
-        except Exception as e:
-            logging.error(f"Error checking Gemini status: {str(e)}")
-            return 0
+    def add_source(self, name: str, url: str, parser, label: str = None, first: bool = False):
+        """Register a status source for a provider; first=True tries it before the existing ones"""
+        sources = self.sources.setdefault(name, [])
+        sources.insert(0 if first else len(sources), (url, parser))
+        self.labels.setdefault(name, label or name)
 
-    def check_llama_status(self) -> int:
-        """Check LlamaIndex API status"""
-        try:
-            soup = self.soups['llama']
-            text = soup.findAll('div', {'class': 'component-container border-color is-group'})[0].findAll('span')[8].get_text()
-            text = re.sub(r'\s+', '', text)
-            return 1 if text == 'Operational' else 0
-        except Exception as e:
-            logging.error(f"Error checking Llama status: {str(e)}")
-            return 0
+    async def fetch_page(self, url: str) -> str:
+        """Download a status page through the shared connection pool"""
+        client = get_http_registry().get_client(url)
+        response = await client.get(url, headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()  # Raise an exception for bad status codes
+        return response.text
 
-    def check_claude_status(self) -> int:
-        """Check Anthropic Claude API status"""
-        try:
-            soup = self.soups['claude']
-            text = soup.findAll('div', {"class": 'component-container border-color'})[0].findAll('span', {'class': 'component-status'})[0].get_text()
-            text = re.sub(r'\s+', '', text)
-            return 1 if text == "Operational" else 0
-        except Exception as e:
-            logging.error(f"Error checking Claude status: {str(e)}")
-            return 0
+    async def check_provider(self, name: str) -> Dict[str, Any]:
+        """
+        Fetch and parse one provider's status, trying its sources in order,
+        each bounded by the checker timeout. Errors are reported in the result
+        instead of raised, so one provider can't fail the others.
+        """
+        started = time.perf_counter()
+        errors = []
+        for url, parser in self.sources[name]:
+            try:
+                text = await asyncio.wait_for(self.fetch_page(url), timeout=self.timeout)
+                # Parsing is CPU work; keep it off the event loop
+                status = await asyncio.to_thread(parser.parse, text)
+                return {
+                    "status": status,
+                    "error": None,
+                    "source": url,
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "fetched_at": time.time()
+                }
+            except Exception as e:
+                error = f"{type(e).__name__}: {str(e)}" if str(e) else type(e).__name__
+                logging.warning(f"Status source {url} for {name} failed: {error}")
+                errors.append(f"{url}: {error}")
 
-    def get_all_statuses(self) -> Dict[str, Any]:
-        """Get status of all APIs"""
+        logging.error(f"Could not get {name} status from any source")
         return {
-            "OpenAI": self.check_openai_status(),
-            "Claude": self.check_claude_status(),
-            "Gemini": self.check_gemini_status(),
-            "Llama": self.check_llama_status()
-        } 
\ No newline at end of file
+            "status": None,
+            "error": "; ".join(errors),
+            "source": None,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            "fetched_at": time.time()
+        }
+
+    async def get_all_statuses(self) -> Dict[str, Dict[str, Any]]:
+        """Check every provider concurrently; keyed by response label"""
+        names = list(self.labels)
+        results = await asyncio.gather(*(self.check_provider(name) for name in names))
+        return {self.labels[name]: result for name, result in zip(names, results)}
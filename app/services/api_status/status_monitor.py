@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.config.settings import API_STATUS_REFRESH_SECONDS, API_STATUS_TIMEOUT_SECONDS
+from app.services.api_status.status_checker import APIStatusChecker
+
+
+class APIStatusMonitor:
+    """
+    Keeps a snapshot of every provider's status, refreshed in the background.
+
+    /api/status serves the snapshot instead of scraping the status pages on
+    each request. A provider whose refresh fails keeps its last known status,
+    marked with the error and the time it was last fetched successfully.
+    Without the background task (e.g. outside the app lifespan) the snapshot
+    is refreshed on demand once it is older than refresh_interval.
+    """
+
+    def __init__(self, checker: APIStatusChecker, refresh_interval: float = 60.0):
+        self.checker = checker
+        self.refresh_interval = refresh_interval
+        self._providers: Dict[str, Dict[str, Any]] = {}
+        self._updated_at: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Check all providers now and merge the results into the snapshot"""
+        async with self._refresh_lock:
+            await self._refresh()
+        return self._build_snapshot()
+
+    async def _refresh(self):
+        results = await self.checker.get_all_statuses()
+        for label, result in results.items():
+            previous = self._providers.get(label)
+            if result["error"] is not None and previous is not None and previous["status"] is not None:
+                # Keep the last good status, but say it is stale
+                result = {**result, "status": previous["status"], "fetched_at": previous["fetched_at"]}
+            self._providers[label] = result
+        self._updated_at = time.time()
+
+    def _build_snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        snapshot: Dict[str, Any] = {
+            label: provider["status"] if provider["status"] is not None else 0
+            for label, provider in self._providers.items()
+        }
+        snapshot["snapshot"] = {
+            "updated_at": self._updated_at,
+            "age_seconds": round(now - self._updated_at, 2) if self._updated_at else None,
+            "refresh_interval": self.refresh_interval,
+            "providers": {
+                label: {**provider, "age_seconds": round(now - provider["fetched_at"], 2)}
+                for label, provider in self._providers.items()
+            }
+        }
+        return snapshot
+
+    def _needs_refresh(self) -> bool:
+        if self._updated_at is None:
+            return True
+        return self._refresh_task is None and time.time() - self._updated_at > self.refresh_interval
+
+    async def get_snapshot(self) -> Dict[str, Any]:
+        """Return the latest snapshot, refreshing first if there is none yet or it is overdue"""
+        if self._needs_refresh():
+            async with self._refresh_lock:
+                # A concurrent caller or the background task may have refreshed while we waited
+                if self._needs_refresh():
+                    await self._refresh()
+        return self._build_snapshot()
+
+    async def start(self):
+        """Start refreshing in the background; the first refresh doesn't delay startup"""
+        self._refresh_task = asyncio.create_task(self._refresher())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+    async def _refresher(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f"API status refresh failed: {str(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+
+_status_monitor: Optional[APIStatusMonitor] = None
+
+
+def set_status_monitor(status_monitor: Optional[APIStatusMonitor]):
+    """Install the application-wide status monitor (called from the FastAPI lifespan hook)"""
+    global _status_monitor
+    _status_monitor = status_monitor
+
+
+def get_status_monitor() -> APIStatusMonitor:
+    """Return the application-wide status monitor, creating an on-demand one if none is installed"""
+    global _status_monitor
+    if _status_monitor is None:
+        _status_monitor = APIStatusMonitor(
+            APIStatusChecker(timeout=API_STATUS_TIMEOUT_SECONDS),
+            refresh_interval=API_STATUS_REFRESH_SECONDS
+        )
+    return _status_monitor
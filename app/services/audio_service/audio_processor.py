@@ -1,15 +1,25 @@
 import os
+import asyncio
+import tempfile
+import time
+import httpx
 import requests
 from mutagen.mp3 import MP3
 import logging
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Optional
 from pathlib import Path
 from fastapi import HTTPException
 import base64
 import json
+from app.core.http_clients import HTTPClientRegistry, get_http_registry
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Chunks are collected up to this size before each write to disk, to keep thread hand-offs few
+DOWNLOAD_WRITE_SIZE = 1024 * 1024
 
 class AudioProcessor:
-    def __init__(self):
+    def __init__(self, http_registry: Optional[HTTPClientRegistry] = None):
+        self.http_registry = http_registry or get_http_registry()
         self.upload_dir = Path("uploads/audio")
         self.upload_dir.mkdir(parents=True, exist_ok=True)
         logging.basicConfig(level=logging.INFO)
@@ -19,18 +29,14 @@ class AudioProcessor:
         try:
             logging.info(f"Attempting to download file from {url}")
             
-            # Create session for better connection handling
-            session = requests.Session()
-            
-            # Add basic auth
-            session.auth = (username, password)
-            
-            # Add headers
-            session.headers.update(headers)
+            # Reuse the shared session so connections to Exotel stay warm
+            session = self.http_registry.get_sync_session()
             
-            # Make request
+            # Make request (auth and headers are per call since the session is shared)
             response = session.get(
                 url,
+                auth=(username, password),
+                headers=headers,
                 verify=False,  # Only for testing
                 timeout=30,
                 allow_redirects=True
@@ -83,28 +89,119 @@ class AudioProcessor:
             with open(file_path, 'wb') as f:
                 f.write(content)
 
-            if not os.path.exists(file_path):
-                raise HTTPException(status_code=500, detail="Failed to save audio file")
+            size_bytes, duration_seconds = self.probe_file(file_path)
+            return str(file_path), size_bytes, duration_seconds
+        except HTTPException:
+            raise
+        except Exception as e:
+            logging.error(f"Error saving file: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to process audio file: {str(e)}")
+
+    def probe_file(self, file_path: Path) -> Tuple[int, float]:
+        """Return size and MP3 duration of a saved file"""
+        if not os.path.exists(file_path):
+            raise HTTPException(status_code=500, detail="Failed to save audio file")
+
+        # Get file size
+        size_bytes = os.path.getsize(file_path)
+        if size_bytes == 0:
+            raise HTTPException(status_code=500, detail="Saved file is empty")
+
+        # Get audio duration
+        try:
+            audio = MP3(file_path)
+            duration_seconds = audio.info.length
+        except Exception as e:
+            logging.error(f"Error reading MP3 file: {str(e)}")
+            raise HTTPException(status_code=500, detail="Invalid MP3 file format")
+
+        return size_bytes, duration_seconds
+
+    async def stream_download(self,
+                              url: str,
+                              username: str,
+                              password: str,
+                              headers: Dict[str, str],
+                              file_path: Path) -> Dict[str, Any]:
+        """
+        Stream a file from URL to disk in chunks without buffering the whole body.
+        Returns transfer metrics (bytes, time-to-first-byte, throughput).
+        """
+        partial_path = None
+        try:
+            logging.info(f"Streaming file from {url}")
+            client = self.http_registry.get_client(url, verify=False)  # Only for testing
+
+            started = time.perf_counter()
+            first_byte_at = None
+            size_bytes = 0
+
+            async with client.stream(
+                "GET",
+                url,
+                auth=(username, password),
+                headers=headers,
+                timeout=httpx.Timeout(30.0, connect=5.0)
+            ) as response:
+                logging.info(f"Response status code: {response.status_code}")
+
+                if response.status_code == 401:
+                    raise HTTPException(status_code=401, detail="Authentication failed for Exotel API")
+                elif response.status_code == 404:
+                    raise HTTPException(status_code=404, detail="Audio file not found on Exotel server")
+                elif response.status_code != 200:
+                    raise HTTPException(
+                        status_code=response.status_code,
+                        detail=f"Failed to download file. Server returned: {response.status_code}"
+                    )
+
+                content_type = response.headers.get('content-type', '')
+                if not any(ct in content_type.lower() for ct in ['audio/', 'application/octet-stream', 'binary/']):
+                    logging.warning(f"Unexpected content type: {content_type}")
+
+                # Unique partial file, so concurrent downloads to the same path don't collide
+                fd, partial_name = tempfile.mkstemp(dir=file_path.parent, prefix=file_path.name + ".", suffix=".part")
+                partial_path = Path(partial_name)
+                with os.fdopen(fd, 'wb') as f:
+                    pending = bytearray()
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        if first_byte_at is None:
+                            first_byte_at = time.perf_counter()
+                        size_bytes += len(chunk)
+                        pending += chunk
+                        if len(pending) >= DOWNLOAD_WRITE_SIZE:
+                            await asyncio.to_thread(f.write, pending)
+                            pending = bytearray()
+                    if pending:
+                        await asyncio.to_thread(f.write, pending)
 
-            # Get file size
-            size_bytes = os.path.getsize(file_path)
             if size_bytes == 0:
-                raise HTTPException(status_code=500, detail="Saved file is empty")
+                raise HTTPException(status_code=400, detail="Received empty file from Exotel")
 
-            # Get audio duration
-            try:
-                audio = MP3(file_path)
-                duration_seconds = audio.info.length
-            except Exception as e:
-                logging.error(f"Error reading MP3 file: {str(e)}")
-                raise HTTPException(status_code=500, detail="Invalid MP3 file format")
+            os.replace(partial_path, file_path)
+            elapsed = time.perf_counter() - started
+            logging.info(f"Downloaded file size: {size_bytes} bytes in {elapsed:.2f}s")
+
+            return {
+                "bytes": size_bytes,
+                "ttfb_ms": round((first_byte_at - started) * 1000, 2),
+                "download_ms": round(elapsed * 1000, 2),
+                "bytes_per_second": round(size_bytes / elapsed, 2) if elapsed > 0 else None
+            }
 
-            return str(file_path), size_bytes, duration_seconds
         except HTTPException:
             raise
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="Timeout while downloading audio file")
+        except httpx.HTTPError as e:
+            logging.error(f"Download failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to download audio file: {str(e)}")
         except Exception as e:
-            logging.error(f"Error saving file: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Failed to process audio file: {str(e)}")
+            logging.error(f"Unexpected error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error during file download")
+        finally:
+            if partial_path is not None and partial_path.exists():
+                partial_path.unlink()
 
     def make_api_call(self, api_url: str, params: Dict[str, str]) -> Dict[str, Any]:
         """Make API call to ReadyAssist"""
@@ -162,16 +259,13 @@ class AudioProcessor:
                 'Connection': 'keep-alive'
             }
 
-            # Download file
-            file_content = self.download_file(url, username, password, headers)
-            if not file_content:
-                raise HTTPException(status_code=400, detail="No audio content received")
-
             # Generate unique filename
             filename = f"{order_id}_{srn_number}.mp3"
+            filepath = self.upload_dir / filename
 
-            # Save file and get details
-            filepath, size_bytes, duration = self.save_file(file_content, filename)
+            # Stream file to disk, then probe it in a worker thread to keep the event loop free
+            transfer_metrics = await self.stream_download(url, username, password, headers, filepath)
+            size_bytes, duration = await asyncio.to_thread(self.probe_file, filepath)
 
             # Prepare response
             response_data = {
@@ -188,7 +282,8 @@ class AudioProcessor:
                         "duration": round(duration, 2),
                         "file_size": size_bytes
                     }
-                }
+                },
+                "transfer_metrics": transfer_metrics
             }
 
             logging.info(f"Successfully processed audio file: {json.dumps(response_data)}")
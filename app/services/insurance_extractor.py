@@ -0,0 +1,339 @@
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Pattern, Sequence
+
+# Fields of /extract_document_info, in response order
+INSURANCE_FIELDS = (
+    "customer_name",
+    "customer_contact_number",
+    "policy_number",
+    "insurance_company_name",
+    "type_of_policy",
+    "start_date_of_policy",
+    "expiry_date_of_policy",
+    "registration_number",
+    "engine_number",
+    "chassis_number",
+    "body_type",
+    "vehicle_make",
+    "model",
+    "manufacturing_year",
+    "total_premium_paid",
+    "address"
+)
+
+# Between a label and its value: punctuation, and the value may start on the next line
+_SEP = r"[ \t]*[:\-–.#]*[ \t]*(?:\r?\n[ \t]*)?"
+# Free-text values (names, makes...) only count after an explicit "Label:"
+_COLON = r"[ \t]*[:\-–][ \t]*"
+_NO = r"(?:no\.?|number|#)"
+_DATE = (r"(?:\d{1,2}[/\-.](?:\d{1,2}|[A-Za-z]{3,9})[/\-.]\d{2,4}"
+         r"|\d{1,2}(?:st|nd|rd|th)?[ \t]+[A-Za-z]{3,9},?[ \t]+\d{4}"
+         r"|\d{4}-\d{2}-\d{2})")
+# Time of day before a date: "From 00:00 Hrs of 01/04/2024 To Midnight of 31/03/2025"
+_TIME = r"(?:[^\n\d]{0,20}?\d{1,2}[:.]\d{2}[^\n\d]{0,12}?|[^\n\d]{0,20}?)"
+_DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y", "%d-%b-%Y", "%d/%b/%Y",
+                 "%d-%B-%Y", "%d %b %Y", "%d %B %Y", "%d %b, %Y", "%d %B, %Y", "%Y-%m-%d")
+_REGISTRATION = re.compile(r"^(?:[A-Z]{2}\d{1,2}[A-Z]{0,3}\d{1,4}|\d{2}BH\d{4}[A-Z]{1,2})$")
+
+
+def _rule(pattern: str) -> Pattern:
+    return re.compile(pattern, re.M)
+
+
+def _clean(value: str) -> str:
+    return re.sub(r"\s+", " ", value).strip(" \t.,;:-")
+
+
+def _parse_date(value: str) -> Optional[datetime]:
+    value = re.sub(r"(\d)(?:st|nd|rd|th)\b", r"\1", value.strip())
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def _normalize_registration(value: str) -> Optional[str]:
+    value = re.sub(r"[\s\-]", "", value).upper()
+    return value if _REGISTRATION.match(value) else None
+
+
+def _normalize_identifier(value: str) -> Optional[str]:
+    """Engine, chassis and policy numbers: must contain a digit"""
+    value = re.sub(r"\s+", "", value).strip(".,;:-/").upper()
+    return value if re.search(r"\d", value) and len(value) >= 5 else None
+
+
+def _normalize_chassis(value: str) -> Optional[str]:
+    value = _normalize_identifier(value)
+    return value if value and re.search(r"[A-Z]", value) else None
+
+
+def _normalize_date(value: str) -> Optional[str]:
+    return _clean(value) if _parse_date(value) is not None else None
+
+
+def _normalize_year(value: str) -> Optional[str]:
+    return value if 1950 <= int(value) <= datetime.now().year + 1 else None
+
+
+def _normalize_amount(value: str) -> Optional[str]:
+    value = value.replace(",", "")
+    return value if float(value) > 0 else None
+
+
+def _normalize_phone(value: str) -> Optional[str]:
+    digits = re.sub(r"\D", "", value)[-10:]
+    return digits if len(digits) == 10 and digits[0] in "6789" else None
+
+
+def _normalize_address(value: str) -> Optional[str]:
+    value = ", ".join(_clean(line) for line in value.splitlines() if _clean(line))
+    return value if len(value) >= 10 else None
+
+
+def _normalize_text(value: str) -> Optional[str]:
+    value = _clean(value)
+    return value if 2 <= len(value) <= 120 else None
+
+
+# How a matched value is checked and tidied; None rejects the match
+NORMALIZERS: Dict[str, Callable[[str], Optional[str]]] = {
+    "customer_name": _normalize_text,
+    "customer_contact_number": _normalize_phone,
+    "policy_number": _normalize_identifier,
+    "insurance_company_name": _normalize_text,
+    "type_of_policy": _normalize_text,
+    "start_date_of_policy": _normalize_date,
+    "expiry_date_of_policy": _normalize_date,
+    "registration_number": _normalize_registration,
+    "engine_number": _normalize_identifier,
+    "chassis_number": _normalize_chassis,
+    "body_type": _normalize_text,
+    "vehicle_make": _normalize_text,
+    "model": _normalize_text,
+    "manufacturing_year": _normalize_year,
+    "total_premium_paid": _normalize_amount,
+    "address": _normalize_address
+}
+
+# Rules for any Indian motor policy. Each named group is the field it fills;
+# rules run in order and a field keeps the first value that passes its normalizer.
+GENERIC_RULES: List[Pattern] = [
+    _rule(rf"(?i:(?:certificate[ \t]+cum[ \t]+)?policy[ \t]*{_NO}){_SEP}(?P<policy_number>[A-Z0-9][A-Z0-9/\-]{{4,34}})"),
+
+    _rule(rf"(?i:(?:vehicle[ \t]+)?(?:registration|regn\.?|reg\.?)[ \t]*(?:{_NO}|mark)){_SEP}"
+          r"(?P<registration_number>[A-Z]{2}[ \-]?\d{1,2}[ \-]?[A-Z]{0,3}[ \-]?\d{1,4}|\d{2}[ \-]?BH[ \-]?\d{4}[ \-]?[A-Z]{1,2})\b"),
+    _rule(r"\b(?P<registration_number>[A-Z]{2}[ \-]?\d{2}[ \-]?[A-Z]{1,3}[ \-]?\d{4}|\d{2}[ \-]?BH[ \-]?\d{4}[ \-]?[A-Z]{1,2})\b"),
+
+    # "Engine No. / Chassis No.: K12MN1234567 / MA3EWDE1S00123456"
+    _rule(rf"(?i:engine[ \t]*{_NO}?[ \t]*/[ \t]*chassis[ \t]*{_NO}?){_SEP}"
+          r"(?P<engine_number>[A-Z0-9][A-Z0-9\-]{4,24})[ \t]*/[ \t]*(?P<chassis_number>[A-Z0-9][A-Z0-9\-]{5,24})"),
+    _rule(rf"(?i:chassis[ \t]*{_NO}?[ \t]*/[ \t]*engine[ \t]*{_NO}?){_SEP}"
+          r"(?P<chassis_number>[A-Z0-9][A-Z0-9\-]{5,24})[ \t]*/[ \t]*(?P<engine_number>[A-Z0-9][A-Z0-9\-]{4,24})"),
+    _rule(rf"(?i:engine[ \t]*{_NO}){_SEP}(?P<engine_number>[A-Z0-9][A-Z0-9\-]{{4,24}})"),
+    _rule(rf"(?i:chassis[ \t]*{_NO}|vin(?:[ \t]*{_NO})?){_SEP}(?P<chassis_number>[A-Z0-9][A-Z0-9\-]{{5,24}})"),
+    _rule(r"\b(?P<chassis_number>[A-HJ-NPR-Z0-9]{17})\b"),
+
+    _rule(rf"(?i:period[ \t]+of[ \t]+(?:insurance|cover)|(?:policy|insurance)[ \t]+period){_SEP}(?i:from)?{_TIME}"
+          rf"(?P<start_date_of_policy>{_DATE})[\s\S]{{0,60}}?(?i:\bto\b|till|until|upto|-){_TIME}(?P<expiry_date_of_policy>{_DATE})"),
+    _rule(rf"(?i:(?:policy[ \t]+|risk[ \t]+)?(?:start|commencement|inception)[ \t]+date|valid[ \t]+from|(?:policy[ \t]+)?start[ \t]+from)"
+          rf"{_SEP}{_TIME}(?P<start_date_of_policy>{_DATE})"),
+    _rule(rf"(?i:(?:policy[ \t]+|risk[ \t]+)?(?:end|expiry|expiration)[ \t]+date|valid[ \t]+(?:upto|up[ \t]+to|till))"
+          rf"{_SEP}{_TIME}(?P<expiry_date_of_policy>{_DATE})"),
+
+    _rule(r"(?i:total[ \t]+(?:policy[ \t]+)?premium(?:[ \t]+(?:paid|payable|amount))?|total[ \t]+amount[ \t]+(?:paid|payable)"
+          r"|final[ \t]+premium|gross[ \t]+premium)(?:[ \t]*\([^)\n]*\))?" + _SEP +
+          r"(?:(?i:rs\.?|inr)|₹)?[ \t]*(?P<total_premium_paid>\d[\d,]*(?:\.\d{1,2})?)"),
+
+    _rule(r"(?i:(?:year|yr\.?)[ \t]+of[ \t]+(?:manufacture|manufacturing|mfg\.?)|mfg\.?[ \t]+(?:year|yr\.?)|manufacturing[ \t]+year|yom)"
+          + _SEP + r"(?:[A-Za-z]{3,9}[ \t/\-]*)?(?P<manufacturing_year>(?:19|20)\d{2})\b"),
+
+    _rule(rf"(?i:make[ \t]*/[ \t]*model){_COLON}(?P<vehicle_make>[^/\n]+?)[ \t]*/[ \t]*(?P<model>[^\n]+?)[ \t]*$"),
+    _rule(rf"(?i:(?:vehicle[ \t]+)?make\b)(?![ \t]*/){_COLON}(?P<vehicle_make>[A-Za-z][^\n:]{{1,40}}?)[ \t]*$"),
+    _rule(rf"(?i:(?:vehicle[ \t]+)?model(?:[ \t]*/[ \t]*variant)?\b){_COLON}(?P<model>[A-Za-z0-9][^\n:]{{0,60}}?)[ \t]*$"),
+    _rule(rf"(?i:body[ \t]*type){_COLON}(?P<body_type>[A-Za-z][A-Za-z /\-]{{1,30}}?)[ \t]*$"),
+
+    _rule(rf"(?i:type[ \t]+of[ \t]+(?:policy|cover)|policy[ \t]+type|cover[ \t]+type|product[ \t]+name|plan[ \t]+name)"
+          rf"{_COLON}(?P<type_of_policy>[^\n]{{3,80}}?)[ \t]*$"),
+    _rule(r"(?i:\b(?P<type_of_policy>(?:private[ \t]+car|two[ \-]wheeler|commercial[ \t]+vehicle)?[ \t]*"
+          r"(?:package|comprehensive|liability[ \t]+only|third[ \t]+party|stand[ \-]?alone[ \t]+own[ \t]+damage|bundled)"
+          r"[ \t]+(?:policy|cover|insurance))\b)"),
+
+    _rule(r"(?P<insurance_company_name>[A-Z][A-Za-z&.\- ]{2,60}?(?:General[ \t]+)?(?:Insurance|Assurance)[ \t]+"
+          r"(?:Company|Co\.?)[ \t]*(?:Limited|Ltd\.?))"),
+
+    _rule(r"(?i:name[ \t]+of[ \t]+(?:the[ \t]+)?(?:insured|proposer|policy[ \t]*holder)|(?:insured|proposer|policy[ \t]*holder)(?:'s)?[ \t]+name"
+          rf"|customer[ \t]+name|insured){_COLON}(?P<customer_name>[A-Za-z][A-Za-z .']{{1,80}}?)[ \t]*$"),
+    _rule(rf"(?i:mobile|phone|contact|tel(?:ephone)?)(?i:[ \t]+{_NO})?{_SEP}"
+          r"(?P<customer_contact_number>(?:\+?91[ \t\-]?)?[6-9]\d{4}[ \t\-]?\d{5})\b"),
+    # Continuation lines are taken until one that looks like the next "Label:"
+    _rule(rf"(?:(?i:(?:insured|proposer|communication|correspondence|customer|mailing)(?:'s)?[ \t]+address)|^[ \t]*(?i:address))"
+          rf"{_COLON}(?P<address>[^\n]+(?:\n(?![^\n:]{{1,40}}:)[^\n]+){{0,3}})"),
+]
+
+
+class InsurerLayout:
+    """
+    An insurer's policy document: how to recognise it, its registered name,
+    and rules for its own wording, tried before GENERIC_RULES.
+    """
+
+    def __init__(self, name: str, detect: str, company_name: str, rules: Sequence[str] = ()):
+        self.name = name
+        self.detect = re.compile(detect, re.I)
+        self.company_name = company_name
+        self.rules = [_rule(pattern) for pattern in rules]
+
+
+INSURER_LAYOUTS: List[InsurerLayout] = [
+    InsurerLayout("icici_lombard", r"ICICI\s+Lombard", "ICICI Lombard General Insurance Company Limited"),
+    InsurerLayout("hdfc_ergo", r"HDFC\s+ERGO", "HDFC ERGO General Insurance Company Limited"),
+    InsurerLayout("bajaj_allianz", r"Bajaj\s+Allianz", "Bajaj Allianz General Insurance Company Limited"),
+    InsurerLayout("tata_aig", r"TATA\s+AIG", "Tata AIG General Insurance Company Limited"),
+    InsurerLayout("new_india", r"New\s+India\s+Assurance", "The New India Assurance Company Limited"),
+    InsurerLayout("united_india", r"United\s+India\s+Insurance", "United India Insurance Company Limited"),
+    InsurerLayout("national", r"National\s+Insurance\s+Co", "National Insurance Company Limited"),
+    InsurerLayout("oriental", r"Oriental\s+Insurance", "The Oriental Insurance Company Limited"),
+    InsurerLayout("reliance_general", r"Reliance\s+General", "Reliance General Insurance Company Limited"),
+    InsurerLayout("sbi_general", r"SBI\s+General", "SBI General Insurance Company Limited"),
+    InsurerLayout("go_digit", r"Go\s+Digit|Digit\s+General", "Go Digit General Insurance Limited"),
+    InsurerLayout("acko", r"\bACKO\b", "Acko General Insurance Limited"),
+    InsurerLayout("iffco_tokio", r"IFFCO[\s\-]+TOKIO", "IFFCO Tokio General Insurance Company Limited"),
+    InsurerLayout("cholamandalam", r"Cholamandalam\s+MS", "Cholamandalam MS General Insurance Company Limited"),
+    InsurerLayout("royal_sundaram", r"Royal\s+Sundaram", "Royal Sundaram General Insurance Company Limited"),
+    InsurerLayout("kotak", r"Kotak\s+(?:Mahindra\s+)?General", "Kotak Mahindra General Insurance Company Limited"),
+    InsurerLayout("future_generali", r"Future\s+Generali", "Future Generali India Insurance Company Limited"),
+    InsurerLayout("liberty", r"Liberty\s+(?:Videocon\s+)?General", "Liberty General Insurance Limited"),
+    InsurerLayout("shriram", r"Shriram\s+General", "Shriram General Insurance Company Limited"),
+    InsurerLayout("universal_sompo", r"Universal\s+Sompo", "Universal Sompo General Insurance Company Limited"),
+    InsurerLayout("magma_hdi", r"Magma\s+HDI", "Magma HDI General Insurance Company Limited"),
+]
+
+
+class ExtractionResult:
+    """Field values for one document and where each came from ("rule", "llm" or None)"""
+
+    def __init__(self, fields: Dict[str, Optional[str]], sources: Dict[str, Optional[str]],
+                 insurer: Optional[str], local_ms: float):
+        self.fields = fields
+        self.sources = sources
+        self.insurer = insurer
+        self.local_ms = local_ms
+        self.llm_called = False
+
+    @property
+    def unresolved(self) -> List[str]:
+        return [field for field in INSURANCE_FIELDS if self.fields.get(field) is None]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "insurer": self.insurer,
+            "sources": dict(self.sources),
+            "llm_called": self.llm_called,
+            "local_ms": round(self.local_ms, 3)
+        }
+
+
+class InsuranceExtractor:
+    """
+    Extracts policy fields from insurance document text with compiled rules,
+    leaving an LLM only the fields the rules can't find.
+
+    The document's insurer is recognised from its text; that layout's rules
+    run first, then GENERIC_RULES. Each field keeps the first match its
+    normalizer accepts. extract() then asks the llm callback for whatever is
+    still missing. Per-field hit rates are kept for get_metrics().
+    """
+
+    def __init__(self, layouts: Sequence[InsurerLayout] = INSURER_LAYOUTS,
+                 rules: Sequence[Pattern] = GENERIC_RULES):
+        self.layouts = list(layouts)
+        self.rules = list(rules)
+        self.stats = {"documents": 0, "llm_calls": 0, "local_ms_total": 0.0, "insurers": {}}
+        self.field_stats = {field: {"rule": 0, "llm": 0, "missing": 0} for field in INSURANCE_FIELDS}
+
+    def detect_insurer(self, text: str) -> Optional[InsurerLayout]:
+        return next((layout for layout in self.layouts if layout.detect.search(text)), None)
+
+    def extract_local(self, text: str) -> ExtractionResult:
+        """Run the rule layer only; no I/O"""
+        started = time.perf_counter()
+        fields: Dict[str, Optional[str]] = {field: None for field in INSURANCE_FIELDS}
+        sources: Dict[str, Optional[str]] = {field: None for field in INSURANCE_FIELDS}
+
+        layout = self.detect_insurer(text)
+        if layout is not None:
+            fields["insurance_company_name"] = layout.company_name
+            sources["insurance_company_name"] = "rule"
+
+        for rule in (layout.rules if layout is not None else []) + self.rules:
+            wanted = [field for field in rule.groupindex if fields.get(field) is None]
+            if not wanted:
+                continue
+            for match in rule.finditer(text):
+                for field in wanted:
+                    raw = match.group(field)
+                    value = NORMALIZERS[field](raw) if raw else None
+                    if value is not None and fields[field] is None:
+                        fields[field] = value
+                        sources[field] = "rule"
+                if all(fields[field] is not None for field in wanted):
+                    break
+
+        return ExtractionResult(fields, sources, layout.name if layout is not None else None,
+                                (time.perf_counter() - started) * 1000)
+
+    async def extract(self, text: str,
+                      llm: Optional[Callable[[List[str], str], Awaitable[Dict[str, Any]]]] = None) -> ExtractionResult:
+        """
+        Rules first; then, if any field is unresolved and llm is given,
+        llm(unresolved_fields, text) for just those fields.
+        """
+        result = self.extract_local(text)
+        unresolved = result.unresolved
+        if unresolved and llm is not None:
+            result.llm_called = True
+            try:
+                answers = await llm(unresolved, text)
+            except Exception as e:
+                logging.error(f"LLM fallback for {len(unresolved)} insurance fields failed: {str(e)}")
+                answers = {}
+            for field in unresolved:
+                value = answers.get(field) if isinstance(answers, dict) else None
+                if value not in (None, ""):
+                    result.fields[field] = value if not isinstance(value, str) else value.strip()
+                    result.sources[field] = "llm"
+        self.record(result)
+        return result
+
+    def record(self, result: ExtractionResult):
+        self.stats["documents"] += 1
+        self.stats["local_ms_total"] += result.local_ms
+        if result.llm_called:
+            self.stats["llm_calls"] += 1
+        insurer = result.insurer or "unknown"
+        self.stats["insurers"][insurer] = self.stats["insurers"].get(insurer, 0) + 1
+        for field in INSURANCE_FIELDS:
+            self.field_stats[field][result.sources.get(field) or "missing"] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        documents = self.stats["documents"]
+        return {
+            "documents": documents,
+            "llm_calls": self.stats["llm_calls"],
+            "resolved_locally": documents - self.stats["llm_calls"],
+            "avg_local_ms": round(self.stats["local_ms_total"] / documents, 3) if documents else None,
+            "insurers": dict(self.stats["insurers"]),
+            "fields": {
+                field: {
+                    **counts,
+                    "rule_hit_rate": round(counts["rule"] / documents, 4) if documents else None
+                }
+                for field, counts in self.field_stats.items()
+            }
+        }
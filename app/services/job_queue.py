@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.http_clients import get_http_registry
+from app.models.vehicle_damage import VehicleDamageJobRequest
+from app.services.analysis_service import AnalysisService
+from app.services.report_service import persist_pdf_report, render_pdf_report
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class ReportJobQueue:
+    """
+    Durable background queue for vehicle damage reports.
+
+    Jobs are persisted in SQLite so queued and interrupted jobs are picked up
+    again after a restart. Submissions are idempotent on order_id: resubmitting
+    an order returns the existing job unless it failed, in which case it is
+    queued again.
+    """
+
+    def __init__(self, db_path: str, workers: int = 2, webhook_timeout: float = 10.0):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.webhook_timeout = webhook_timeout
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._initialize_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _initialize_db(self):
+        """Create the jobs table if it doesn't exist"""
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS report_jobs (
+                        job_id TEXT PRIMARY KEY,
+                        order_id TEXT NOT NULL UNIQUE,
+                        report_version TEXT NOT NULL,
+                        request TEXT NOT NULL,
+                        webhook_url TEXT,
+                        status TEXT NOT NULL,
+                        result TEXT,
+                        error TEXT,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                """)
+        except Exception as e:
+            logging.error(f"Error initializing report job store at {self.db_path}: {str(e)}")
+            raise
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "job_id": row["job_id"],
+            "order_id": row["order_id"],
+            "report_version": row["report_version"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    def _submit(self, request: VehicleDamageJobRequest) -> Tuple[Dict[str, Any], bool]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM report_jobs WHERE order_id = ?", (request.order_id,)).fetchone()
+            if row is not None and row["status"] != JOB_FAILED:
+                return self._row_to_job(row), False
+
+            if row is not None:
+                job_id = row["job_id"]
+                conn.execute(
+                    "UPDATE report_jobs SET report_version = ?, request = ?, webhook_url = ?, status = ?, "
+                    "result = NULL, error = NULL, updated_at = ? WHERE job_id = ?",
+                    (request.report_version, request.model_dump_json(), request.webhook_url, JOB_QUEUED, now, job_id)
+                )
+            else:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO report_jobs (job_id, order_id, report_version, request, webhook_url, status, "
+                    "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, request.order_id, request.report_version, request.model_dump_json(),
+                     request.webhook_url, JOB_QUEUED, now, now)
+                )
+            row = conn.execute("SELECT * FROM report_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return self._row_to_job(row), True
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM report_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return self._row_to_job(row) if row is not None else None
+
+    def _claim(self, job_id: str) -> Optional[Tuple[VehicleDamageJobRequest, str]]:
+        """Mark a queued job as running and return its request"""
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE report_jobs SET status = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (JOB_RUNNING, time.time(), job_id, JOB_QUEUED)
+            ).rowcount
+            if not updated:
+                return None
+            row = conn.execute("SELECT request, webhook_url FROM report_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return VehicleDamageJobRequest.model_validate_json(row["request"]), row["webhook_url"]
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE report_jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def _recover(self) -> List[str]:
+        """Requeue jobs interrupted by a restart and return every pending job id"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE report_jobs SET status = ?, updated_at = ? WHERE status = ?",
+                (JOB_QUEUED, time.time(), JOB_RUNNING)
+            )
+            rows = conn.execute(
+                "SELECT job_id FROM report_jobs WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)
+            ).fetchall()
+            return [row["job_id"] for row in rows]
+
+    async def submit(self, request: VehicleDamageJobRequest) -> Tuple[Dict[str, Any], bool]:
+        """Persist and enqueue a job; returns the job and whether it was newly queued"""
+        try:
+            job, created = await asyncio.to_thread(self._submit, request)
+        except sqlite3.IntegrityError:
+            # A concurrent submission for the same order won the insert
+            job, created = await asyncio.to_thread(self._submit, request)
+        if created and self._queue is not None:
+            await self._queue.put(job["job_id"])
+        return job, created
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the current state of a job"""
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def start(self):
+        """Recover pending jobs and start the worker pool"""
+        self._queue = asyncio.Queue()
+        for job_id in await asyncio.to_thread(self._recover):
+            self._queue.put_nowait(job_id)
+        self._worker_tasks = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+        logging.info(f"Started report job queue with {self.workers} workers, {self._queue.qsize()} pending jobs")
+
+    async def stop(self):
+        """Stop the workers; running jobs are requeued on next start"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                logging.error(f"Report job worker {index} crashed on job {job_id}: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str):
+        claimed = await asyncio.to_thread(self._claim, job_id)
+        if claimed is None:
+            return
+        request, webhook_url = claimed
+
+        logging.info(f"Running report job {job_id} for order {request.order_id}")
+        try:
+            analysis = await AnalysisService.analyze_vehicle_damage(request)
+            report = await render_pdf_report(analysis, request.report_version)
+            pdf_report = await persist_pdf_report(report, request.order_id, request.report_version)
+            await asyncio.to_thread(self._finish, job_id, JOB_COMPLETED, {
+                "analysis": analysis,
+                "pdf_report": pdf_report
+            })
+        except Exception as e:
+            logging.error(f"Report job {job_id} failed: {str(e)}")
+            await asyncio.to_thread(self._finish, job_id, JOB_FAILED, None, str(e))
+
+        if webhook_url:
+            await self._notify(webhook_url, await self.get(job_id))
+
+    async def _notify(self, webhook_url: str, job: Dict[str, Any]):
+        """POST the finished job to the client's webhook"""
+        try:
+            client = get_http_registry().get_client(webhook_url)
+            response = await client.post(webhook_url, json=job, timeout=self.webhook_timeout)
+            response.raise_for_status()
+        except Exception as e:
+            logging.error(f"Webhook delivery for job {job['job_id']} to {webhook_url} failed: {str(e)}")
+
+
+_job_queue: Optional[ReportJobQueue] = None
+
+
+def set_job_queue(job_queue: Optional[ReportJobQueue]):
+    """Install the application-wide job queue (called from the FastAPI lifespan hook)"""
+    global _job_queue
+    _job_queue = job_queue
+
+
+def get_job_queue() -> ReportJobQueue:
+    """Return the application-wide job queue"""
+    if _job_queue is None:
+        raise RuntimeError("Report job queue is not running")
+    return _job_queue
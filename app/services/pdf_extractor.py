@@ -0,0 +1,109 @@
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import PyPDF2
+
+
+def _page_count(data: bytes) -> int:
+    return len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+
+
+def extract_page_range(data: bytes, start: int, stop: int) -> List[str]:
+    """
+    Text of pages [start, stop) of an in-memory PDF. A page whose text
+    can't be extracted comes back empty rather than failing the document.
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    texts = []
+    for number in range(start, min(stop, len(reader.pages))):
+        try:
+            texts.append(reader.pages[number].extract_text() or "")
+        except Exception as e:
+            logging.warning(f"Could not extract text from PDF page {number + 1}: {str(e)}")
+            texts.append("")
+    return texts
+
+
+def extract_pages(data: bytes) -> List[str]:
+    """Text of every page of an in-memory PDF, in one thread"""
+    return extract_page_range(data, 0, _page_count(data))
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class PdfTextExtractor:
+    """
+    Extracts page text from in-memory PDFs in a pool of worker processes.
+
+    PyPDF2 is pure Python, so threads would still hold the GIL; separate
+    processes keep long documents from stalling the event loop and extract
+    their pages in parallel. A document is split into runs of
+    pages_per_task pages, each parsed by whichever worker is free.
+    """
+
+    def __init__(self, workers: int = 2, pages_per_task: int = 16):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        """Start the pool and wait for every worker to come up"""
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        futures = [self._pool.submit(_ping) for _ in range(self.workers)]
+        pids = {future.result() for future in futures}
+        logging.info(f"Started PDF text extraction pool with {len(pids)} workers")
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "pages_per_task": self.pages_per_task, "running": self._pool is not None}
+
+    async def extract(self, data: bytes) -> List[str]:
+        """Text of every page of the PDF, in page order"""
+        if self._pool is None:
+            raise RuntimeError("PDF text extraction pool is not running")
+
+        loop = asyncio.get_running_loop()
+        page_count = await loop.run_in_executor(self._pool, _page_count, data)
+        ranges = [(start, min(start + self.pages_per_task, page_count))
+                  for start in range(0, page_count, self.pages_per_task)]
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._pool, extract_page_range, data, start, stop)
+            for start, stop in ranges
+        ))
+        return [text for texts in results for text in texts]
+
+
+_pdf_extractor: Optional[PdfTextExtractor] = None
+
+
+def set_pdf_extractor(pdf_extractor: Optional[PdfTextExtractor]):
+    """Install the application-wide extraction pool (called from the FastAPI lifespan hook)"""
+    global _pdf_extractor
+    _pdf_extractor = pdf_extractor
+
+
+def get_pdf_extractor() -> Optional[PdfTextExtractor]:
+    """Return the application-wide extraction pool, or None when it isn't running"""
+    return _pdf_extractor
+
+
+async def extract_pdf_pages(data: bytes) -> List[str]:
+    """
+    Text of every page of an in-memory PDF: in the process pool when it is
+    running, otherwise in a thread so the event loop still isn't blocked.
+    """
+    pdf_extractor = get_pdf_extractor()
+    if pdf_extractor is not None:
+        return await pdf_extractor.extract(data)
+    return await asyncio.to_thread(extract_pages, data)
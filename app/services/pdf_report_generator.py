@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO, Union
 from pathlib import Path
 import logging
 from reportlab.lib import colors
@@ -19,6 +19,12 @@ class VehicleDamageReportGenerator:
             alignment=1  # Center alignment
         )
         
+    def get_report_filename(self, analysis_data: Dict[str, Any]) -> str:
+        """
+        File name used when the report is saved
+        """
+        return f"vehicle_damage_report_{analysis_data['order_id']}.pdf"
+
     def generate_report(self, analysis_data: Dict[str, Any], output_dir: str) -> str:
         """
         Generate a PDF report from the analysis data using reportlab
@@ -28,12 +34,26 @@ class VehicleDamageReportGenerator:
             Path(output_dir).mkdir(parents=True, exist_ok=True)
             
             # Generate PDF filename
-            pdf_filename = f"vehicle_damage_report_{analysis_data['order_id']}.pdf"
+            pdf_filename = self.get_report_filename(analysis_data)
             pdf_path = os.path.join(output_dir, pdf_filename)
             
+            self.render(analysis_data, pdf_path)
+            
+            logging.info(f"Generated PDF report at: {pdf_path}")
+            return pdf_path
+            
+        except Exception as e:
+            logging.error(f"Error generating PDF report: {str(e)}")
+            raise
+
+    def render(self, analysis_data: Dict[str, Any], output: Union[str, BinaryIO]) -> None:
+        """
+        Render the PDF report into a file path or a writable binary file object
+        """
+        try:
             # Create the PDF document
             doc = SimpleDocTemplate(
-                pdf_path,
+                output,
                 pagesize=letter,
                 rightMargin=72,
                 leftMargin=72,
@@ -117,9 +137,6 @@ class VehicleDamageReportGenerator:
             # Build the PDF
             doc.build(story)
             
-            logging.info(f"Generated PDF report at: {pdf_path}")
-            return pdf_path
-            
         except Exception as e:
-            logging.error(f"Error generating PDF report: {str(e)}")
+            logging.error(f"Error rendering PDF report: {str(e)}")
             raise 
\ No newline at end of file
@@ -1,92 +1,36 @@
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, cm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from datetime import datetime
 import os
 import logging
 from pathlib import Path
+from app.services.pdf_styles import get_style_registry, PRIMARY_COLOR, HEADER_BG, GRAY_BG
 
 class VehicleDamageReportGeneratorV2:
     def __init__(self):
-        self.stylesheet = getSampleStyleSheet()
+        # Fonts, stylesheet and styles are built once per process and shared
+        self._style_registry = get_style_registry()
+        self.stylesheet = self._style_registry.stylesheet
         self.styles = self.stylesheet['Normal'].clone('CustomNormal')  # Clone with a name
         self._setup_custom_styles()
         
     def _setup_custom_styles(self):
-        # Register fonts for currency symbol support
-        try:
-            pdfmetrics.registerFont(TTFont('DejaVuSans', 'static/fonts/DejaVuSans.ttf'))
-        except:
-            logging.warning("DejaVuSans font not found, using Helvetica")
-        
         # Colors from HTML
-        self.PRIMARY_COLOR = colors.HexColor('#015386')  # ReadyAssist blue
-        self.HEADER_BG = colors.HexColor('#FFF3D4')  # Light yellow
-        self.GRAY_BG = colors.HexColor('#F3F4F6')  # Light gray
+        self.PRIMARY_COLOR = PRIMARY_COLOR  # ReadyAssist blue
+        self.HEADER_BG = HEADER_BG  # Light yellow
+        self.GRAY_BG = GRAY_BG  # Light gray
         
-        # Create custom styles
-        self.custom_styles = {}
-        
-        # Title style - keep original size for main header
-        self.custom_styles['Title'] = ParagraphStyle(
-            'CustomTitle',
-            parent=self.stylesheet['Normal'],
-            fontName='Helvetica-Bold',
-            fontSize=24,
-            textColor=self.PRIMARY_COLOR,
-            spaceAfter=0,
-            spaceBefore=6,
-            leading=28,
-            alignment=0
-        )
-        
-        # Subtitle style - keep original size for main header
-        self.custom_styles['Subtitle'] = ParagraphStyle(
-            'CustomSubtitle',
-            parent=self.stylesheet['Normal'],
-            fontName='Helvetica',
-            fontSize=12,
-            textColor=colors.gray,
-            spaceAfter=0,
-            spaceBefore=2,
-            leading=14
-        )
-        
-        # Section Header style - reduced size
-        self.custom_styles['SectionHeader'] = ParagraphStyle(
-            'CustomSectionHeader',
-            parent=self.stylesheet['Normal'],
-            fontName='Helvetica-Bold',
-            fontSize=10,  # Reduced from 12
-            textColor=colors.black,
-            spaceBefore=6,  # Reduced from 10
-            spaceAfter=3,  # Reduced from 5
-            leading=12  # Reduced from 14
-        )
-        
-        # Subsection Header style - reduced size
-        self.custom_styles['SubsectionHeader'] = ParagraphStyle(
-            'CustomSubsectionHeader',
-            parent=self.stylesheet['Normal'],
-            fontName='Helvetica',
-            fontSize=9,  # Reduced from 11
-            textColor=colors.gray,
-            spaceBefore=6,  # Reduced from 10
-            spaceAfter=4,  # Reduced from 8
-            leading=11  # Reduced from 13
-        )
+        # Title, Subtitle, SectionHeader and SubsectionHeader styles
+        self.custom_styles = self._style_registry.custom_styles
 
     def _create_header(self, story):
         # Claims box with QR - styled to match the image exactly
         claims_box = Table(
             [
                 [Paragraph("CLAIMS", 
-                         ParagraphStyle('Claims',
-                                      parent=self.stylesheet['Normal'],
+                         self._style_registry.paragraph_style('Claims',
                                       fontSize=10,
                                       textColor=colors.black,
                                       fontName='Helvetica-Bold',
@@ -95,8 +39,7 @@ class VehicleDamageReportGeneratorV2:
                                       spaceBefore=0,
                                       spaceAfter=0))],
                 [Paragraph("QR", 
-                         ParagraphStyle('QR',
-                                      parent=self.stylesheet['Normal'],
+                         self._style_registry.paragraph_style('QR',
                                       fontSize=10,
                                       textColor=colors.black,
                                       fontName='Helvetica',
@@ -124,8 +67,7 @@ class VehicleDamageReportGeneratorV2:
                 [[
                     Image("static/images/readyassist_logo.png", width=0.3*inch, height=0.3*inch),
                     Paragraph("ReadyAssist", 
-                            ParagraphStyle('Logo', 
-                                         parent=self.stylesheet['Normal'],
+                            self._style_registry.paragraph_style('Logo', 
                                          fontSize=18,
                                          textColor=colors.black,
                                          fontName='Helvetica-Bold',
@@ -146,8 +88,7 @@ class VehicleDamageReportGeneratorV2:
         except:
             logo_row = Table(
                 [[Paragraph("ReadyAssist", 
-                          ParagraphStyle('Logo', 
-                                       parent=self.stylesheet['Normal'],
+                          self._style_registry.paragraph_style('Logo', 
                                        fontSize=18,
                                        textColor=colors.black,
                                        fontName='Helvetica-Bold',
@@ -167,8 +108,7 @@ class VehicleDamageReportGeneratorV2:
         header_content = [
             [logo_row, claims_box],
             [Paragraph("Comprehensive Vehicle Report", 
-                      ParagraphStyle('CustomTitle',
-                                   parent=self.stylesheet['Normal'],
+                      self._style_registry.paragraph_style('CustomTitle',
                                    fontName='Helvetica-Bold',
                                    fontSize=20,
                                    textColor=colors.HexColor('#015386'),
@@ -176,8 +116,7 @@ class VehicleDamageReportGeneratorV2:
                                    spaceBefore=0,
                                    spaceAfter=0)), ''],
             [Paragraph("A system generated report by AI operated Impact Analysis system", 
-                      ParagraphStyle('CustomSubtitle',
-                                   parent=self.stylesheet['Normal'],
+                      self._style_registry.paragraph_style('CustomSubtitle',
                                    fontName='Helvetica',
                                    fontSize=10,
                                    textColor=colors.gray,
@@ -259,16 +198,13 @@ class VehicleDamageReportGeneratorV2:
         damage_analysis = data.get('Damage Analysis', {})
         for component, details in damage_analysis.items():
             damage_data.append([
-                Paragraph(component, ParagraphStyle('Component', 
-                                                  parent=self.stylesheet['Normal'],
+                Paragraph(component, self._style_registry.paragraph_style('Component', 
                                                   fontSize=8,
                                                   wordWrap='CJK')),
-                Paragraph(details.get('Observation', 'N/A'), ParagraphStyle('Observation',
-                                                                          parent=self.stylesheet['Normal'],
+                Paragraph(details.get('Observation', 'N/A'), self._style_registry.paragraph_style('Observation',
                                                                           fontSize=8,
                                                                           wordWrap='CJK')),
-                Paragraph(details.get('Recommendation', 'N/A'), ParagraphStyle('Recommendation',
-                                                                             parent=self.stylesheet['Normal'],
+                Paragraph(details.get('Recommendation', 'N/A'), self._style_registry.paragraph_style('Recommendation',
                                                                              fontSize=8,
                                                                              wordWrap='CJK'))
             ])
@@ -314,9 +250,8 @@ class VehicleDamageReportGeneratorV2:
             
         repair_data = [['Component', 'COST']]
         
-        cost_style = ParagraphStyle(
+        cost_style = self._style_registry.paragraph_style(
             'Cost',
-            parent=self.stylesheet['Normal'],
             fontSize=8,
             fontName='Helvetica',
             alignment=2
@@ -365,9 +300,8 @@ class VehicleDamageReportGeneratorV2:
         story.append(Paragraph("Market Valuation", self.custom_styles['SectionHeader']))
         
         # Create cost style for rupee values
-        cost_style = ParagraphStyle(
+        cost_style = self._style_registry.paragraph_style(
             'Cost',
-            parent=self.stylesheet['Normal'],
             fontSize=8,
             fontName='Helvetica',
             alignment=2  # Right alignment
@@ -416,8 +350,7 @@ class VehicleDamageReportGeneratorV2:
         
         # Market Quotes section - only add if quotes exist
         if market_valuation.get('Market Quotes'):
-            story.append(Paragraph("Market Quotes", ParagraphStyle('SubsectionHeader',
-                                                                parent=self.stylesheet['Normal'],
+            story.append(Paragraph("Market Quotes", self._style_registry.paragraph_style('SubsectionHeader',
                                                                 fontName='Helvetica-Bold',
                                                                 fontSize=9,
                                                                 textColor=colors.black,
@@ -428,8 +361,7 @@ class VehicleDamageReportGeneratorV2:
             for quote in market_valuation.get('Market Quotes', []):
                 if 'Dealer' in quote and 'Value' in quote:  # Only add complete quote entries
                     quotes_data.append([
-                        Paragraph(quote.get('Dealer', 'N/A'), ParagraphStyle('Dealer',
-                                                                        parent=self.stylesheet['Normal'],
+                        Paragraph(quote.get('Dealer', 'N/A'), self._style_registry.paragraph_style('Dealer',
                                                                         fontSize=10,
                                                                         wordWrap='CJK')),
                         Paragraph("Rs. " + "{:,}".format(quote.get('Value', 0)), cost_style)
@@ -509,9 +441,8 @@ class VehicleDamageReportGeneratorV2:
         consistency_check = data.get('Vehicle Consistency Check', {})
         
         # Create a style for the reason text that handles wrapping
-        reason_style = ParagraphStyle(
+        reason_style = self._style_registry.paragraph_style(
             'Reason',
-            parent=self.stylesheet['Normal'],
             fontSize=10,
             wordWrap='CJK',
             alignment=0
@@ -549,13 +480,7 @@ class VehicleDamageReportGeneratorV2:
     def _get_cell_style(self, alignment=0):
         """Get cell style with proper word wrapping
         alignment: 0=left, 1=center, 2=right"""
-        return ParagraphStyle(
-            'CellStyle',
-            parent=self.stylesheet['Normal'],
-            fontSize=8,
-            wordWrap='CJK',
-            alignment=alignment
-        )
+        return self._style_registry.cell_style(alignment)
 
     def _format_value(self, value, align_right=False, is_boolean=False):
         """Format a value for display in a table cell"""
@@ -619,8 +544,23 @@ class VehicleDamageReportGeneratorV2:
             # Convert to string and wrap in Paragraph
             return Paragraph(str(value), self._get_cell_style())
 
+    def get_report_filename(self, data):
+        """File name used when the report is saved"""
+        return f"vehicle_damage_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+
     def generate_report(self, data, output_dir):
         """Generate a PDF report from the analysis data"""
+        try:
+            filepath = os.path.join(output_dir, self.get_report_filename(data))
+            self.render(data, filepath)
+            return filepath
+            
+        except Exception as e:
+            logging.error(f"Error generating PDF report: {str(e)}")
+            raise
+
+    def render(self, data, output):
+        """Render the PDF report into a file path or a writable binary file object"""
         try:
             # Get the actual data from the structure
             report_data = data.get('data', {})
@@ -674,12 +614,7 @@ class VehicleDamageReportGeneratorV2:
                                 layout_table = Table(
                                     [[table, '', self._create_image_placeholder()]],
                                     colWidths=[5*inch, 0.2*inch, 2*inch],
-                                    style=TableStyle([
-                                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                                        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                                        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                                    ])
+                                    style=self._get_layout_table_style()
                                 )
                                 story.append(layout_table)
                             else:
@@ -718,12 +653,7 @@ class VehicleDamageReportGeneratorV2:
                                 layout_table = Table(
                                     [[table, '', self._create_image_placeholder()]],
                                     colWidths=[5*inch, 0.2*inch, 2*inch],
-                                    style=TableStyle([
-                                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                                        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                                        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                                    ])
+                                    style=self._get_layout_table_style()
                                 )
                                 story.append(layout_table)
                             else:
@@ -773,9 +703,8 @@ class VehicleDamageReportGeneratorV2:
             self._create_image_placeholders_grid(story)
             
             # Generate the PDF
-            filepath = os.path.join(output_dir, f"vehicle_damage_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
             doc = SimpleDocTemplate(
-                filepath,
+                output,
                 pagesize=A4,
                 rightMargin=25,
                 leftMargin=25,
@@ -784,41 +713,22 @@ class VehicleDamageReportGeneratorV2:
             )
             
             doc.build(story, onFirstPage=self._add_page_number, onLaterPages=self._add_page_number)
-            return filepath
             
         except Exception as e:
-            logging.error(f"Error generating PDF report: {str(e)}")
+            logging.error(f"Error rendering PDF report: {str(e)}")
             raise
 
     def _get_table_style(self, has_money=False):
         """Get consistent table styling
         has_money: True if the table contains monetary values (will right-align the last column)"""
-        style = [
-            ('BACKGROUND', (0, 0), (-1, 0), self.GRAY_BG),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),  # Increased padding
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),  # Increased padding
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),  # Increased padding
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),  # Increased padding
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.gray),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),  # Align content to top
-        ]
-        
-        if has_money:
-            # Right align the last column for monetary values
-            style.append(('ALIGN', (-1, 1), (-1, -1), 'RIGHT'))
-            
-        return TableStyle(style)
+        return self._style_registry.data_table_style(has_money)
 
     def _create_image_placeholder(self):
         return Table(
             [['Image\nPlaceholder']],
             colWidths=[2*inch],
             rowHeights=[2*inch],
-            style=TableStyle([
+            style=self._style_registry.table_style('image_placeholder', lambda: [
                 ('BOX', (0, 0), (-1, -1), 1, colors.black),
                 ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
                 ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
@@ -828,6 +738,15 @@ class VehicleDamageReportGeneratorV2:
             ])
         )
 
+    def _get_layout_table_style(self):
+        """Style for the table that places a data table next to an image placeholder"""
+        return self._style_registry.table_style('image_layout', lambda: [
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ])
+
     def _add_page_number(self, canvas, doc):
         canvas.saveState()
         # Create concise footer table
@@ -838,8 +757,7 @@ class VehicleDamageReportGeneratorV2:
                     [[
                         Paragraph(
                             "Sundaravijayam Automobile Services Private Limited",
-                            ParagraphStyle('FooterCompany',
-                                         parent=self.stylesheet['Normal'],
+                            self._style_registry.paragraph_style('FooterCompany',
                                          fontSize=8,
                                          fontName='Helvetica-Bold')
                         )
@@ -847,8 +765,7 @@ class VehicleDamageReportGeneratorV2:
                     [
                         Paragraph(
                             "839/2, 24th Main Rd, Behind Thirumala Theatre, 1st Sector, HSR Layout, Bengaluru, Karnataka 560102",
-                            ParagraphStyle('FooterAddress',
-                                         parent=self.stylesheet['Normal'],
+                            self._style_registry.paragraph_style('FooterAddress',
                                          fontSize=8,
                                          fontName='Helvetica',
                                          textColor=colors.gray)
@@ -857,8 +774,7 @@ class VehicleDamageReportGeneratorV2:
                     [
                         Paragraph(
                             '<link href="https://www.readyassist.in">www.readyassist.in</link>',
-                            ParagraphStyle('FooterLink',
-                                         parent=self.stylesheet['Normal'],
+                            self._style_registry.paragraph_style('FooterLink',
                                          fontSize=8,
                                          textColor=colors.blue,
                                          fontName='Helvetica')
@@ -873,8 +789,7 @@ class VehicleDamageReportGeneratorV2:
                 ),
                 Paragraph(
                     f"Page {canvas.getPageNumber()} of {doc.page}",
-                    ParagraphStyle('PageNumber',
-                                 parent=self.stylesheet['Normal'],
+                    self._style_registry.paragraph_style('PageNumber',
                                  fontSize=8,
                                  fontName='Helvetica',
                                  alignment=2)  # Right alignment
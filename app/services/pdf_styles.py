@@ -0,0 +1,156 @@
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import TableStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Colors from HTML
+PRIMARY_COLOR = colors.HexColor('#015386')  # ReadyAssist blue
+HEADER_BG = colors.HexColor('#FFF3D4')  # Light yellow
+GRAY_BG = colors.HexColor('#F3F4F6')  # Light gray
+
+
+class ReportStyleRegistry:
+    """
+    Process-wide cache of fonts, paragraph styles and table styles for the PDF reports.
+
+    Building a stylesheet, parsing a TTF font or allocating a ParagraphStyle per
+    table cell is wasted work when every report uses the same handful of styles,
+    so they are built once here and shared by all generator instances.
+    ReportLab treats styles as read-only during rendering, so sharing is safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._register_fonts()
+        self.stylesheet = getSampleStyleSheet()
+        self.custom_styles = self._build_custom_styles()
+        self._paragraph_styles: Dict[Tuple, ParagraphStyle] = {}
+        self._table_styles: Dict[str, TableStyle] = {}
+
+    @staticmethod
+    def _register_fonts():
+        # Register fonts for currency symbol support
+        if 'DejaVuSans' in pdfmetrics.getRegisteredFontNames():
+            return
+        try:
+            pdfmetrics.registerFont(TTFont('DejaVuSans', 'static/fonts/DejaVuSans.ttf'))
+        except Exception:
+            logging.warning("DejaVuSans font not found, using Helvetica")
+
+    def _build_custom_styles(self) -> Dict[str, ParagraphStyle]:
+        normal = self.stylesheet['Normal']
+        return {
+            # Title style - keep original size for main header
+            'Title': ParagraphStyle(
+                'CustomTitle',
+                parent=normal,
+                fontName='Helvetica-Bold',
+                fontSize=24,
+                textColor=PRIMARY_COLOR,
+                spaceAfter=0,
+                spaceBefore=6,
+                leading=28,
+                alignment=0
+            ),
+            # Subtitle style - keep original size for main header
+            'Subtitle': ParagraphStyle(
+                'CustomSubtitle',
+                parent=normal,
+                fontName='Helvetica',
+                fontSize=12,
+                textColor=colors.gray,
+                spaceAfter=0,
+                spaceBefore=2,
+                leading=14
+            ),
+            # Section Header style - reduced size
+            'SectionHeader': ParagraphStyle(
+                'CustomSectionHeader',
+                parent=normal,
+                fontName='Helvetica-Bold',
+                fontSize=10,
+                textColor=colors.black,
+                spaceBefore=6,
+                spaceAfter=3,
+                leading=12
+            ),
+            # Subsection Header style - reduced size
+            'SubsectionHeader': ParagraphStyle(
+                'CustomSubsectionHeader',
+                parent=normal,
+                fontName='Helvetica',
+                fontSize=9,
+                textColor=colors.gray,
+                spaceBefore=6,
+                spaceAfter=4,
+                leading=11
+            )
+        }
+
+    def paragraph_style(self, name: str, **attributes: Any) -> ParagraphStyle:
+        """Return a shared ParagraphStyle derived from Normal with the given attributes"""
+        key = (name, tuple(sorted(attributes.items())))
+        style = self._paragraph_styles.get(key)
+        if style is None:
+            with self._lock:
+                style = self._paragraph_styles.get(key)
+                if style is None:
+                    style = ParagraphStyle(name, parent=self.stylesheet['Normal'], **attributes)
+                    self._paragraph_styles[key] = style
+        return style
+
+    def cell_style(self, alignment: int = 0) -> ParagraphStyle:
+        """Table cell style with word wrapping; alignment: 0=left, 1=center, 2=right"""
+        return self.paragraph_style('CellStyle', fontSize=8, wordWrap='CJK', alignment=alignment)
+
+    def table_style(self, name: str, build_commands: Callable[[], list]) -> TableStyle:
+        """Return a shared TableStyle, building its command list only on first use"""
+        style = self._table_styles.get(name)
+        if style is None:
+            with self._lock:
+                style = self._table_styles.get(name)
+                if style is None:
+                    style = TableStyle(build_commands())
+                    self._table_styles[name] = style
+        return style
+
+    def data_table_style(self, has_money: bool = False) -> TableStyle:
+        """Consistent data table styling; has_money right-aligns the last column"""
+        def build_commands():
+            commands = [
+                ('BACKGROUND', (0, 0), (-1, 0), GRAY_BG),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, -1), 8),
+                ('TOPPADDING', (0, 0), (-1, -1), 4),  # Increased padding
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),  # Increased padding
+                ('LEFTPADDING', (0, 0), (-1, -1), 6),  # Increased padding
+                ('RIGHTPADDING', (0, 0), (-1, -1), 6),  # Increased padding
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.gray),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),  # Align content to top
+            ]
+            if has_money:
+                # Right align the last column for monetary values
+                commands.append(('ALIGN', (-1, 1), (-1, -1), 'RIGHT'))
+            return commands
+
+        return self.table_style(f"data_table_money={has_money}", build_commands)
+
+
+_registry: Optional[ReportStyleRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_style_registry() -> ReportStyleRegistry:
+    """Return the process-wide style registry, building it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ReportStyleRegistry()
+    return _registry
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, Optional
+
+from app.services.pdf_report_generator import VehicleDamageReportGenerator
+from app.services.pdf_report_generator_v2 import VehicleDamageReportGeneratorV2
+
+REPORT_GENERATORS = {
+    "v1": VehicleDamageReportGenerator,
+    "v2": VehicleDamageReportGeneratorV2
+}
+
+# Generators built once per worker process by _warm_worker, so fonts are
+# registered and styles built before the first report arrives
+_worker_generators: Dict[str, Any] = {}
+
+
+def _warm_worker():
+    """Process pool initializer: build every generator up front"""
+    for report_version, generator_class in REPORT_GENERATORS.items():
+        try:
+            _worker_generators[report_version] = generator_class()
+        except Exception as e:
+            logging.error(f"Error warming {report_version} report generator in worker {os.getpid()}: {str(e)}")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class RenderedReport:
+    """
+    A rendered PDF, held in memory or spilled to a temporary file when it is
+    larger than the spool threshold. Picklable, so it can come back from a
+    worker process.
+    """
+
+    def __init__(self, filename: str, data: Optional[bytes] = None, path: Optional[str] = None):
+        self.filename = filename
+        self.data = data
+        self.path = path
+
+    @property
+    def size(self) -> int:
+        return len(self.data) if self.data is not None else os.path.getsize(self.path)
+
+    def iter_chunks(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield the PDF in chunks, e.g. for a StreamingResponse"""
+        if self.data is not None:
+            for offset in range(0, len(self.data), chunk_size):
+                yield self.data[offset:offset + chunk_size]
+            return
+        with open(self.path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def read(self) -> bytes:
+        """Return the whole PDF"""
+        if self.data is not None:
+            return self.data
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def cleanup(self):
+        """Remove the spill file, if any"""
+        if self.path is not None and self.path.startswith(tempfile.gettempdir()) and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def _get_generator(report_version: str):
+    generator = _worker_generators.get(report_version)
+    if generator is None:
+        generator = REPORT_GENERATORS[report_version]()
+        _worker_generators[report_version] = generator
+    return generator
+
+
+def render_report(analysis: Dict[str, Any], report_version: str, spool_threshold: int) -> RenderedReport:
+    """
+    Render a report into a spooled buffer that stays in memory up to
+    spool_threshold bytes and rolls over to disk beyond that; larger reports
+    are handed back as a temporary file instead of inline bytes.
+    """
+    generator = _get_generator(report_version)
+    filename = generator.get_report_filename(analysis)
+    with tempfile.SpooledTemporaryFile(max_size=spool_threshold, suffix='.pdf') as spool:
+        generator.render(analysis, spool)
+        size = spool.tell()
+        spool.seek(0)
+        if size <= spool_threshold:
+            return RenderedReport(filename, data=spool.read())
+
+        # The rolled-over file is anonymous, so copy it to one the caller can open by path
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as spill_file:
+            shutil.copyfileobj(spool, spill_file)
+    return RenderedReport(filename, path=spill_file.name)
+
+
+class RenderQueueFullError(RuntimeError):
+    """Raised when too many reports are already waiting for a render worker"""
+
+
+class ReportRenderExecutor:
+    """
+    Renders PDF reports in a pool of warm worker processes.
+
+    ReportLab's doc.build is pure CPU work; running it in a separate process
+    keeps it from freezing the event loop. At most max_queue_depth renders
+    may be pending (running or waiting) at once; further requests are
+    rejected with RenderQueueFullError instead of piling up.
+    """
+
+    def __init__(self, workers: int = 2, max_queue_depth: int = 32):
+        self.workers = workers
+        self.max_queue_depth = max_queue_depth
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    def start(self):
+        """Start the pool and make sure every worker has run its initializer"""
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        futures = [self._pool.submit(_ping) for _ in range(self.workers)]
+        pids = {future.result() for future in futures}
+        logging.info(f"Started report render pool with {len(pids)} warm workers")
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_queue_depth": self.max_queue_depth
+        }
+
+    async def render(self, analysis: Dict[str, Any], report_version: str, spool_threshold: int) -> RenderedReport:
+        """Render a report in the pool"""
+        if self._pool is None:
+            raise RuntimeError("Report render pool is not running")
+        if report_version not in REPORT_GENERATORS:
+            raise ValueError(f"Unknown report version: {report_version}")
+        if self._pending >= self.max_queue_depth:
+            raise RenderQueueFullError(f"Report render queue is full ({self._pending} pending)")
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, render_report, analysis, report_version, spool_threshold)
+        finally:
+            self._pending -= 1
+
+
+_render_executor: Optional[ReportRenderExecutor] = None
+
+
+def set_render_executor(render_executor: Optional[ReportRenderExecutor]):
+    """Install the application-wide render pool (called from the FastAPI lifespan hook)"""
+    global _render_executor
+    _render_executor = render_executor
+
+
+def get_render_executor() -> Optional[ReportRenderExecutor]:
+    """Return the application-wide render pool, or None when it isn't running"""
+    return _render_executor
@@ -0,0 +1,58 @@
+from typing import Dict, Any, Optional
+import asyncio
+import logging
+from app.config.settings import REPORT_SPOOL_THRESHOLD_BYTES
+from app.services.report_renderer import (
+    REPORT_GENERATORS,
+    RenderedReport,
+    get_render_executor,
+    render_report
+)
+from app.services.report_store import get_report_store
+
+
+def generate_pdf_report(analysis: Dict[str, Any], report_version: str = "v1") -> RenderedReport:
+    """
+    Render the PDF report for an analysis result in this process
+    """
+    try:
+        if report_version not in REPORT_GENERATORS:
+            raise ValueError(f"Unknown report version: {report_version}")
+        return render_report(analysis, report_version, REPORT_SPOOL_THRESHOLD_BYTES)
+    except Exception as e:
+        logging.error(f"Error generating {report_version} PDF report: {str(e)}")
+        raise
+
+
+async def render_pdf_report(analysis: Dict[str, Any], report_version: str = "v1") -> RenderedReport:
+    """
+    Render the PDF report without blocking the event loop.
+    Uses the process pool when it is running, otherwise a worker thread.
+    Small reports come back in memory, large ones spilled to a temp file.
+    """
+    render_executor = get_render_executor()
+    if render_executor is None:
+        return await asyncio.to_thread(generate_pdf_report, analysis, report_version)
+
+    try:
+        report = await render_executor.render(analysis, report_version, REPORT_SPOOL_THRESHOLD_BYTES)
+        logging.info(f"Rendered {report_version} PDF report {report.filename} ({report.size} bytes)")
+        return report
+    except Exception as e:
+        logging.error(f"Error rendering {report_version} PDF report: {str(e)}")
+        raise
+
+
+async def persist_pdf_report(report: RenderedReport, order_id: str,
+                             report_version: str = "v1") -> Optional[Dict[str, Any]]:
+    """
+    Store a rendered report in the report store and return its filename and URL.
+    Returns None when persistence is disabled.
+    """
+    try:
+        report_store = get_report_store()
+        if report_store is None:
+            return None
+        return await asyncio.to_thread(report_store.save, report, order_id, report_version)
+    finally:
+        await asyncio.to_thread(report.cleanup)
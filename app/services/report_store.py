@@ -0,0 +1,439 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config.settings import (
+    REPORT_PERSISTENCE,
+    REPORT_STORE_DB_PATH,
+    REPORT_STORE_LOCAL_DIR,
+    REPORT_STORE_TTL_SECONDS,
+    REPORT_STORE_MAX_BYTES,
+    REPORT_STORE_SWEEP_INTERVAL_SECONDS,
+    REPORT_STORE_S3_BUCKET,
+    REPORT_STORE_S3_PREFIX,
+    REPORT_STORE_S3_ENDPOINT_URL,
+    REPORT_STORE_S3_REGION,
+    REPORT_STORE_URL_EXPIRY_SECONDS
+)
+from app.services.report_renderer import RenderedReport
+
+try:
+    import boto3
+except ImportError:  # Only needed for REPORT_PERSISTENCE=s3
+    boto3 = None
+
+# Artifacts are named after the SHA-256 of their content
+ARTIFACT_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}\.pdf$")
+
+
+def _artifact_key(report: RenderedReport) -> str:
+    digest = hashlib.sha256()
+    for chunk in report.iter_chunks():
+        digest.update(chunk)
+    return f"{digest.hexdigest()}.pdf"
+
+
+def _check_key(key: str):
+    if not ARTIFACT_KEY_PATTERN.match(key):
+        raise ValueError(f"Invalid report key: {key}")
+
+
+class LocalReportBackend:
+    """Stores report artifacts as files in a local directory"""
+
+    def __init__(self, root_dir: Path):
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+
+    def put(self, key: str, report: RenderedReport):
+        _check_key(key)
+        # Write under a temporary name so readers never see a partial file
+        tmp_path = self.root_dir / f".{key}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(tmp_path, 'wb') as f:
+            for chunk in report.iter_chunks():
+                f.write(chunk)
+        os.replace(tmp_path, self.root_dir / key)
+
+    def delete(self, key: str):
+        _check_key(key)
+        (self.root_dir / key).unlink(missing_ok=True)
+
+    def list_keys(self) -> List[str]:
+        return [path.name for path in self.root_dir.glob("*.pdf") if ARTIFACT_KEY_PATTERN.match(path.name)]
+
+    def download_target(self, key: str, filename: str) -> Tuple[str, str]:
+        """Return ("file", path) for the route to serve"""
+        _check_key(key)
+        return "file", str(self.root_dir / key)
+
+
+class S3ReportBackend:
+    """
+    Stores report artifacts in an S3-compatible bucket. Pass endpoint_url to
+    use MinIO, LocalStack or moto instead of AWS. Credentials come from the
+    usual boto3 sources (AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY etc.).
+    """
+
+    def __init__(self, bucket: str, prefix: str = "reports/", endpoint_url: Optional[str] = None,
+                 region_name: Optional[str] = None, url_expiry: int = 3600):
+        if boto3 is None:
+            raise RuntimeError("boto3 is required for the S3 report store (pip install boto3)")
+        if not bucket:
+            raise ValueError("REPORT_STORE_S3_BUCKET must be set for the S3 report store")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.url_expiry = url_expiry
+        self._client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region_name)
+
+    def put(self, key: str, report: RenderedReport):
+        _check_key(key)
+        if report.data is not None:
+            self._client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=report.data,
+                                    ContentType="application/pdf")
+        else:
+            self._client.upload_file(report.path, self.bucket, self.prefix + key,
+                                     ExtraArgs={"ContentType": "application/pdf"})
+
+    def delete(self, key: str):
+        _check_key(key)
+        self._client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def list_keys(self) -> List[str]:
+        keys = []
+        paginator = self._client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                key = item["Key"][len(self.prefix):]
+                if ARTIFACT_KEY_PATTERN.match(key):
+                    keys.append(key)
+        return keys
+
+    def download_target(self, key: str, filename: str) -> Tuple[str, str]:
+        """Return ("redirect", presigned URL) for the route to redirect to"""
+        _check_key(key)
+        url = self._client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.prefix + key,
+                "ResponseContentType": "application/pdf",
+                "ResponseContentDisposition": f'inline; filename="{filename}"'
+            },
+            ExpiresIn=self.url_expiry
+        )
+        return "redirect", url
+
+
+class ReportArtifactStore:
+    """
+    Content-addressed store for rendered PDF reports.
+
+    Artifacts are named by the SHA-256 of their bytes, so identical reports are
+    stored once and concurrent renders never overwrite each other. A SQLite
+    index maps each order to its reports and tracks size and last access.
+    A background sweeper deletes artifacts not accessed within ttl_seconds,
+    then the least recently used ones until the total is under max_total_bytes,
+    and finally stray files in the backend that the index doesn't know about.
+    """
+
+    def __init__(self, backend, db_path: str, ttl_seconds: int = 30 * 24 * 3600,
+                 max_total_bytes: int = 1024 * 1024 * 1024, sweep_interval: int = 600,
+                 url_prefix: str = "/vehicle/reports"):
+        self.backend = backend
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        self.sweep_interval = sweep_interval
+        self.url_prefix = url_prefix
+
+        self._lock = threading.Lock()
+        # Keys the sweeper is deleting from the backend; save waits for them to go
+        self._deleting: Set[str] = set()
+        self._deletions_done = threading.Condition(self._lock)
+        self._sweeper_task: Optional[asyncio.Task] = None
+        self._last_sweep: Optional[Dict[str, Any]] = None
+        self._initialize_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _initialize_db(self):
+        """Create the artifact and order index tables if they don't exist"""
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS report_artifacts (
+                        key TEXT PRIMARY KEY,
+                        size INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_accessed REAL NOT NULL
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS report_index (
+                        order_id TEXT NOT NULL,
+                        key TEXT NOT NULL REFERENCES report_artifacts(key),
+                        report_version TEXT NOT NULL,
+                        filename TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        PRIMARY KEY (order_id, key)
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_report_index_key ON report_index (key)")
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_report_artifacts_accessed ON report_artifacts (last_accessed)"
+                )
+        except Exception as e:
+            logging.error(f"Error initializing report store index at {self.db_path}: {str(e)}")
+            raise
+
+    def _link(self, key: str, filename: str, size: int) -> Dict[str, Any]:
+        return {
+            "filename": filename,
+            "url": f"{self.url_prefix}/{key}",
+            "key": key,
+            "size": size
+        }
+
+    def save(self, report: RenderedReport, order_id: str, report_version: str) -> Dict[str, Any]:
+        """Store a rendered report under its content hash and index it for the order"""
+        key = _artifact_key(report)
+        size = report.size
+        now = time.time()
+
+        # Index the artifact before uploading it, so the sweeper never
+        # mistakes an in-flight upload for a stray file
+        with self._lock, self._connect() as conn:
+            # A sweep deleting this artifact must finish first, or it would delete the new upload
+            self._deletions_done.wait_for(lambda: key not in self._deleting)
+            exists = conn.execute("SELECT 1 FROM report_artifacts WHERE key = ?", (key,)).fetchone() is not None
+            conn.execute(
+                "INSERT INTO report_artifacts (key, size, created_at, last_accessed) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET last_accessed = excluded.last_accessed",
+                (key, size, now, now)
+            )
+
+        if not exists:
+            try:
+                self.backend.put(key, report)
+            except Exception as e:
+                logging.error(f"Error storing report {key}: {str(e)}")
+                with self._lock, self._connect() as conn:
+                    conn.execute("DELETE FROM report_artifacts WHERE key = ?", (key,))
+                raise
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO report_index (order_id, key, report_version, filename, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (order_id, key, report_version, report.filename, now)
+            )
+
+        logging.info(f"Stored {report_version} report for order {order_id} as {key}"
+                     f"{' (deduplicated)' if exists else ''}")
+        return self._link(key, report.filename, size)
+
+    def list_reports(self, order_id: str) -> List[Dict[str, Any]]:
+        """Return the stored reports of an order, newest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT i.key, i.report_version, i.filename, i.created_at, a.size FROM report_index i "
+                "JOIN report_artifacts a ON a.key = i.key WHERE i.order_id = ? ORDER BY i.created_at DESC",
+                (order_id,)
+            ).fetchall()
+        return [
+            {**self._link(row["key"], row["filename"], row["size"]),
+             "report_version": row["report_version"],
+             "created_at": row["created_at"]}
+            for row in rows
+        ]
+
+    def open(self, key: str) -> Optional[Tuple[str, str, str]]:
+        """
+        Look up an artifact for download and mark it as used.
+        Returns (kind, target, filename) from the backend, or None if unknown.
+        """
+        if not ARTIFACT_KEY_PATTERN.match(key):
+            return None
+        with self._lock, self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE report_artifacts SET last_accessed = ? WHERE key = ?", (time.time(), key)
+            ).rowcount
+            if not updated:
+                return None
+            row = conn.execute(
+                "SELECT filename FROM report_index WHERE key = ? ORDER BY created_at DESC LIMIT 1", (key,)
+            ).fetchone()
+        filename = row["filename"] if row is not None else key
+        kind, target = self.backend.download_target(key, filename)
+        return kind, target, filename
+
+    def _delete_artifacts(self, conn: sqlite3.Connection, keys: List[str]):
+        for key in keys:
+            conn.execute("DELETE FROM report_index WHERE key = ?", (key,))
+            conn.execute("DELETE FROM report_artifacts WHERE key = ?", (key,))
+
+    def sweep(self) -> Dict[str, Any]:
+        """Apply TTL and size retention and remove stray backend files"""
+        started = time.time()
+        # Only the index is updated under the lock; backend calls (network
+        # round trips with S3) happen outside it. Keys being deleted are
+        # listed in self._deleting so a concurrent save waits for them.
+        with self._lock, self._connect() as conn:
+            expired = conn.execute(
+                "SELECT key, size FROM report_artifacts WHERE last_accessed < ?",
+                (started - self.ttl_seconds,)
+            ).fetchall()
+            self._delete_artifacts(conn, [row["key"] for row in expired])
+
+            evicted = []
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM report_artifacts").fetchone()[0]
+            if total > self.max_total_bytes:
+                for row in conn.execute("SELECT key, size FROM report_artifacts ORDER BY last_accessed"):
+                    if total <= self.max_total_bytes:
+                        break
+                    evicted.append(row)
+                    total -= row["size"]
+                self._delete_artifacts(conn, [row["key"] for row in evicted])
+            conn.commit()
+
+            indexed = {row["key"] for row in conn.execute("SELECT key FROM report_artifacts")}
+            removed = [row["key"] for row in expired] + [row["key"] for row in evicted]
+            self._deleting.update(removed)
+
+        strays = []
+        try:
+            candidates = [key for key in self.backend.list_keys() if key not in indexed and key not in removed]
+            if candidates:
+                # Saves indexed while the backend was being listed aren't strays
+                with self._lock, self._connect() as conn:
+                    indexed_now = {row["key"] for row in conn.execute("SELECT key FROM report_artifacts")}
+                    strays = [key for key in candidates if key not in indexed_now]
+                    self._deleting.update(strays)
+        except Exception as e:
+            logging.error(f"Error listing report artifacts: {str(e)}")
+
+        try:
+            for key in removed + strays:
+                try:
+                    self.backend.delete(key)
+                except Exception as e:
+                    logging.error(f"Error deleting report artifact {key}: {str(e)}")
+        finally:
+            with self._lock:
+                self._deleting.difference_update(removed + strays)
+                self._deletions_done.notify_all()
+
+        self._last_sweep = {
+            "expired": len(expired),
+            "evicted": len(evicted),
+            "strays": len(strays),
+            "bytes_freed": sum(row["size"] for row in expired) + sum(row["size"] for row in evicted),
+            "duration_ms": int((time.time() - started) * 1000),
+            "finished_at": time.time()
+        }
+        if removed or strays:
+            logging.info(f"Report store sweep: {self._last_sweep}")
+        return self._last_sweep
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            artifacts, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM report_artifacts"
+            ).fetchone()
+            orders = conn.execute("SELECT COUNT(DISTINCT order_id) FROM report_index").fetchone()[0]
+        return {
+            "backend": type(self.backend).__name__,
+            "artifacts": artifacts,
+            "orders": orders,
+            "total_bytes": total,
+            "max_total_bytes": self.max_total_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "last_sweep": self._last_sweep
+        }
+
+    async def start(self):
+        """Start the background sweeper"""
+        self._sweeper_task = asyncio.create_task(self._sweeper())
+
+    async def stop(self):
+        """Stop the background sweeper"""
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+            await asyncio.gather(self._sweeper_task, return_exceptions=True)
+            self._sweeper_task = None
+
+    async def _sweeper(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logging.error(f"Report store sweep failed: {str(e)}")
+            await asyncio.sleep(self.sweep_interval)
+
+
+def _create_local_backend():
+    return LocalReportBackend(REPORT_STORE_LOCAL_DIR)
+
+
+def _create_s3_backend():
+    return S3ReportBackend(
+        REPORT_STORE_S3_BUCKET,
+        prefix=REPORT_STORE_S3_PREFIX,
+        endpoint_url=REPORT_STORE_S3_ENDPOINT_URL,
+        region_name=REPORT_STORE_S3_REGION,
+        url_expiry=REPORT_STORE_URL_EXPIRY_SECONDS
+    )
+
+
+# Storage backends, selected with REPORT_PERSISTENCE; "none" keeps reports
+# off storage entirely and only supports inline delivery
+REPORT_STORE_BACKENDS = {
+    "local": _create_local_backend,
+    "s3": _create_s3_backend
+}
+
+
+def create_report_store() -> Optional[ReportArtifactStore]:
+    """Build the report store configured in settings, or None when persistence is disabled"""
+    if REPORT_PERSISTENCE == "none":
+        return None
+    if REPORT_PERSISTENCE not in REPORT_STORE_BACKENDS:
+        raise ValueError(f"Unknown REPORT_PERSISTENCE backend: {REPORT_PERSISTENCE}")
+    return ReportArtifactStore(
+        REPORT_STORE_BACKENDS[REPORT_PERSISTENCE](),
+        str(REPORT_STORE_DB_PATH),
+        ttl_seconds=REPORT_STORE_TTL_SECONDS,
+        max_total_bytes=REPORT_STORE_MAX_BYTES,
+        sweep_interval=REPORT_STORE_SWEEP_INTERVAL_SECONDS
+    )
+
+
+_report_store: Optional[ReportArtifactStore] = None
+_report_store_lock = threading.Lock()
+
+
+def set_report_store(report_store: Optional[ReportArtifactStore]):
+    """Install the application-wide report store (called from the FastAPI lifespan hook)"""
+    global _report_store
+    _report_store = report_store
+
+
+def get_report_store() -> Optional[ReportArtifactStore]:
+    """Return the application-wide report store, building it on first use; None when disabled"""
+    global _report_store
+    if _report_store is None and REPORT_PERSISTENCE != "none":
+        with _report_store_lock:
+            if _report_store is None:
+                _report_store = create_report_store()
+    return _report_store
@@ -0,0 +1,126 @@
+import asyncio
+import base64
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.utils.uploads import BufferReader
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif"
+}
+
+
+class PreparedImage:
+    """An image ready to be base64-encoded for a vision request"""
+
+    def __init__(self, data: bytes, mime_type: str, original_bytes: int,
+                 width: Optional[int] = None, height: Optional[int] = None):
+        self.data = data
+        self.mime_type = mime_type
+        self.original_bytes = original_bytes
+        self.width = width
+        self.height = height
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - len(self.data)
+
+    def to_data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+
+class ImagePreprocessor:
+    """
+    Shrinks photos before they are sent to a vision model.
+
+    Each image is rotated according to its EXIF orientation, downscaled so its
+    longest edge is at most max_edge, and re-encoded without EXIF/ICC metadata:
+    JPEG for opaque images, PNG when there is transparency. Decoding and
+    resizing are CPU bound, so async callers run them on a dedicated thread
+    pool instead of the event loop.
+    """
+
+    def __init__(self, max_edge: int = 2048, jpeg_quality: int = 85, workers: int = 4):
+        self.max_edge = max_edge
+        self.jpeg_quality = jpeg_quality
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-preprocess")
+
+    def process(self, data: bytes) -> PreparedImage:
+        """
+        Preprocess one image; bytes Pillow can't read are passed through
+        untouched. data may be any buffer, such as a memory-mapped upload,
+        and is decoded in place rather than copied. The result never refers
+        to data, so a mapping can be closed as soon as this returns.
+        """
+        source = io.BytesIO(data) if isinstance(data, bytes) else BufferReader(data)
+        try:
+            return self._process(data, source)
+        finally:
+            source.close()  # Releases the reader's view of data
+
+    def _process(self, data: bytes, source) -> PreparedImage:
+        try:
+            image = Image.open(source)
+        except UnidentifiedImageError:
+            logging.warning("Image preprocessing skipped: unrecognized image format")
+            return PreparedImage(bytes(data), "image/jpeg", len(data))
+
+        source_format = image.format
+        has_exif = bool(image.info.get("exif"))
+        # Let the JPEG decoder scale down by DCT while decoding, much cheaper than a full decode
+        if source_format == "JPEG":
+            image.draft("RGB", (self.max_edge, self.max_edge))
+
+        image = ImageOps.exif_transpose(image)
+        resized = max(image.size) > self.max_edge
+        if resized:
+            image.thumbnail((self.max_edge, self.max_edge), Image.Resampling.LANCZOS)
+
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        output = io.BytesIO()
+        if has_alpha:
+            image.save(output, format="PNG", optimize=True)
+            output_format = "PNG"
+        else:
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.save(output, format="JPEG", quality=self.jpeg_quality, optimize=True)
+            output_format = "JPEG"
+        processed = output.getvalue()
+
+        # Re-encoding an already small, clean image can make it bigger; keep the original then
+        if len(processed) >= len(data) and not resized and not has_exif and source_format in MIME_TYPES:
+            return PreparedImage(bytes(data), MIME_TYPES[source_format], len(data), image.width, image.height)
+
+        return PreparedImage(processed, MIME_TYPES[output_format], len(data), image.width, image.height)
+
+    async def aprocess(self, data: bytes) -> PreparedImage:
+        """Preprocess one image on the preprocessing thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.process, data)
+
+    async def aprocess_many(self, images: List[bytes]) -> List[PreparedImage]:
+        """Preprocess several images concurrently, keeping their order"""
+        return list(await asyncio.gather(*(self.aprocess(data) for data in images)))
+
+    @staticmethod
+    def summarize(prepared: List[PreparedImage]) -> Dict[str, Any]:
+        """Per-request totals for logging and responses"""
+        original = sum(image.original_bytes for image in prepared)
+        processed = sum(len(image.data) for image in prepared)
+        return {
+            "images": len(prepared),
+            "original_bytes": original,
+            "processed_bytes": processed,
+            "bytes_saved": original - processed
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,303 @@
+import json
+import re
+from json.decoder import scanstring
+from typing import Any, List, NamedTuple, Tuple
+
+# Whitespace plus the // and /* */ comments models sometimes add
+_WHITESPACE = re.compile(r'(?:\s+|//[^\n]*|/\*.*?\*/)*', re.S)
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?')
+_NUMBER_END = re.compile(r'[ \t]*(?:[,}\]\r\n"\']|/[/*]|$)')
+_BARE_KEY = re.compile(r'[^\s:,{}\[\]"\']+')
+_BARE_VALUE = re.compile(r'(?:[^,}\]\r\n/]|/(?![/*]))+')
+# Outside strict JSON, a quote only closes a string if a delimiter follows,
+# (or the next member starts on a new line), so apostrophes ('driver's door')
+# and stray quotes inside it survive
+_CLOSING_QUOTE_END = re.compile(r'\s*(?:[:,}\]]|$)|[ \t]*\r?\n\s*["\']')
+_QUOTE_OR_BACKSLASH = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+_ESCAPES = {'"': '"', "'": "'", '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_LITERALS = {"true": True, "false": False, "null": None}
+_PYTHON_LITERALS = {"True": True, "False": False, "None": None}
+
+_strict_decoder = json.JSONDecoder(strict=False)
+
+
+class JSONExtractError(ValueError):
+    """Raised when no JSON value can be recovered from model output"""
+
+
+class ExtractedJSON(NamedTuple):
+    value: Any
+    repaired: bool  # Needed leniency beyond standard JSON (quotes, commas, comments...)
+    truncated: bool  # Output stopped mid-document; unfinished members were dropped
+
+
+class _Truncated(Exception):
+    pass
+
+
+class _TolerantParser:
+    """
+    Single-pass recursive-descent JSON parser that accepts what models get
+    wrong: single-quoted or bare keys and strings, trailing or missing commas,
+    comments, Python literals and output cut off mid-document.
+    """
+
+    def __init__(self, text: str, complete: bool = False):
+        self.text = text
+        self.end = len(text)
+        self.complete = complete  # Text ends with the value, so a bare word at the end isn't cut off
+        self.repaired = False
+        self.truncated = False
+        self._fast_hits = 0
+        self._fast_misses = 0
+
+    def _skip(self, pos: int) -> int:
+        end = _WHITESPACE.match(self.text, pos).end()
+        if end > pos and self.text.find("/", pos, end) != -1:
+            self.repaired = True  # Skipped a comment
+        return end
+
+    def value(self, pos: int) -> Tuple[Any, int]:
+        pos = self._skip(pos)
+        if pos >= self.end:
+            raise _Truncated
+        char = self.text[pos]
+        if char in "{[":
+            # Well-formed containers are decoded at C speed and only broken ones
+            # walked here; stop trying once most attempts fail (errors everywhere)
+            if self._fast_misses <= self._fast_hits + 2:
+                try:
+                    value = _strict_decoder.raw_decode(self.text, pos)
+                    self._fast_hits += 1
+                    return value
+                except ValueError:
+                    self._fast_misses += 1
+            return self._object(pos + 1) if char == "{" else self._array(pos + 1)
+        if char == '"':
+            return self._string(pos + 1)
+        if char == "'":
+            self.repaired = True
+            return self._quoted(pos + 1, "'")
+
+        match = _NUMBER.match(self.text, pos)
+        if match and _NUMBER_END.match(self.text, match.end()):
+            if match.end() >= self.end and not self.complete:
+                raise _Truncated  # Might have been cut off mid-number
+            number = match.group()
+            return (float(number) if any(c in number for c in ".eE") else int(number)), match.end()
+
+        match = _BARE_VALUE.match(self.text, pos)
+        if match is None:
+            raise JSONExtractError(f"Unexpected {char!r} at position {pos}")
+        if match.end() >= self.end and not self.complete:
+            raise _Truncated
+        word = match.group().strip()
+        if word in _LITERALS:
+            return _LITERALS[word], match.end()
+        self.repaired = True
+        if word in _PYTHON_LITERALS:
+            return _PYTHON_LITERALS[word], match.end()
+        return word, match.end()  # Unquoted text such as N/A
+
+    def _string(self, pos: int) -> Tuple[str, int]:
+        try:
+            value, end = scanstring(self.text, pos, False)
+            if _CLOSING_QUOTE_END.match(self.text, end):
+                return value, end
+        except json.JSONDecodeError as e:
+            if e.msg.startswith("Unterminated string"):
+                raise _Truncated
+        # Invalid escape such as \d, or an unescaped quote inside the string
+        self.repaired = True
+        return self._quoted(pos, '"')
+
+    def _quoted(self, pos: int, quote: str) -> Tuple[str, int]:
+        pattern = _QUOTE_OR_BACKSLASH[quote]
+        chunks = []
+        while True:
+            match = pattern.search(self.text, pos)
+            if match is None:
+                raise _Truncated
+            chunks.append(self.text[pos:match.start()])
+            pos = match.end()
+            if match.group() == quote:
+                if _CLOSING_QUOTE_END.match(self.text, pos):
+                    return "".join(chunks), pos
+                chunks.append(quote)
+                continue
+            if pos >= self.end:
+                raise _Truncated
+            escaped = self.text[pos]
+            if escaped in _ESCAPES:
+                chunks.append(_ESCAPES[escaped])
+                pos += 1
+            elif escaped == "u" and re.fullmatch(r"[0-9a-fA-F]{4}", self.text[pos + 1:pos + 5]):
+                chunks.append(chr(int(self.text[pos + 1:pos + 5], 16)))
+                pos += 5
+            else:
+                chunks.append("\\" + escaped)  # Keep unknown escapes (e.g. Windows paths) as written
+                pos += 1
+
+    def _key(self, pos: int) -> Tuple[str, int]:
+        char = self.text[pos]
+        if char == '"':
+            return self._string(pos + 1)
+        if char == "'":
+            self.repaired = True
+            return self._quoted(pos + 1, "'")
+        match = _BARE_KEY.match(self.text, pos)
+        if match is None:
+            raise JSONExtractError(f"Expected a key at position {pos}")
+        if match.end() >= self.end:
+            raise _Truncated
+        self.repaired = True
+        return match.group(), match.end()
+
+    def _object(self, pos: int) -> Tuple[dict, int]:
+        result = {}
+        while True:
+            pos = self._skip(pos)
+            if pos >= self.end:
+                self.truncated = True
+                return result, pos
+            char = self.text[pos]
+            if char == "}":
+                return result, pos + 1
+            if char == ",":
+                self.repaired = True  # Leading or doubled comma
+                pos += 1
+                continue
+
+            try:
+                key, pos = self._key(pos)
+                pos = self._skip(pos)
+                if pos >= self.end:
+                    raise _Truncated
+                if self.text[pos] != ":":
+                    raise JSONExtractError(f"Expected ':' at position {pos}")
+                value, pos = self.value(pos + 1)
+            except _Truncated:
+                self.truncated = True
+                return result, self.end
+            if self.truncated and not value and isinstance(value, (dict, list)):
+                return result, pos  # Cut off before the nested container got anything
+            result[key] = value
+
+            pos = self._skip(pos)
+            if pos >= self.end:
+                self.truncated = True
+                return result, pos
+            char = self.text[pos]
+            if char == ",":
+                pos = self._skip(pos + 1)
+                if pos < self.end and self.text[pos] == "}":
+                    self.repaired = True  # Trailing comma
+            elif char != "}":
+                self.repaired = True  # Missing comma
+
+    def _array(self, pos: int) -> Tuple[list, int]:
+        result = []
+        while True:
+            pos = self._skip(pos)
+            if pos >= self.end:
+                self.truncated = True
+                return result, pos
+            char = self.text[pos]
+            if char == "]":
+                return result, pos + 1
+            if char == ",":
+                self.repaired = True
+                pos += 1
+                continue
+
+            try:
+                value, pos = self.value(pos)
+            except _Truncated:
+                self.truncated = True
+                return result, self.end
+            if self.truncated and not value and isinstance(value, (dict, list)):
+                return result, pos  # Cut off before the nested container got anything
+            result.append(value)
+
+            pos = self._skip(pos)
+            if pos >= self.end:
+                self.truncated = True
+                return result, pos
+            char = self.text[pos]
+            if char == ",":
+                pos = self._skip(pos + 1)
+                if pos < self.end and self.text[pos] == "]":
+                    self.repaired = True
+            elif char != "]":
+                self.repaired = True
+
+
+def _parse_at(text: str, start: int, complete: bool = False) -> ExtractedJSON:
+    # Well-formed output (the common case) is decoded at C speed in one pass
+    parser = _TolerantParser(text, complete)
+    try:
+        value, _ = parser.value(start)
+    except _Truncated:
+        raise JSONExtractError("Output ends before any value is complete")
+    except RecursionError:
+        raise JSONExtractError("JSON nested too deeply")
+    return ExtractedJSON(value, parser.repaired, parser.truncated)
+
+
+def scan_json(text: str) -> ExtractedJSON:
+    """
+    Recover the JSON object (or array) in a model response, skipping code
+    fences and surrounding prose, and report whether it needed repairs or
+    was cut off. Raises JSONExtractError if nothing can be recovered.
+    """
+    starts: List[int] = sorted(index for index in (text.find("{"), text.find("[")) if index != -1)
+    if not starts:
+        raise JSONExtractError("No JSON object or array in model output")
+
+    error = None
+    for start in starts:
+        try:
+            return _parse_at(text, start)
+        except JSONExtractError as e:
+            error = e
+    raise error
+
+
+def extract_json(text: str) -> Any:
+    """The JSON object (or array) in a model response; see scan_json"""
+    return scan_json(text).value
+
+
+def loads_tolerant(text: str) -> Any:
+    """Parse text that is a single JSON value, with the same leniency as scan_json"""
+    start = _WHITESPACE.match(text).end()
+    return _parse_at(text, start, complete=True).value
+
+
+def read_members(text: str) -> List[Tuple[str, Any]]:
+    """
+    The key/value pairs in text, a piece of an object's body between its
+    braces (one member, or several if a comma is missing), parsed with the
+    same leniency as scan_json. Raises JSONExtractError if a member is
+    malformed or cut off.
+    """
+    parser = _TolerantParser(text, complete=True)
+    members = []
+    try:
+        pos = parser._skip(0)
+        while pos < parser.end:
+            if text[pos] == ",":
+                pos = parser._skip(pos + 1)
+                continue
+            key, pos = parser._key(pos)
+            pos = parser._skip(pos)
+            if pos >= parser.end or text[pos] != ":":
+                raise JSONExtractError(f"Expected ':' at position {pos}")
+            value, pos = parser.value(pos + 1)
+            members.append((key, value))
+            pos = parser._skip(pos)
+    except _Truncated:
+        raise JSONExtractError("Member ends before its value is complete")
+    except RecursionError:
+        raise JSONExtractError("JSON nested too deeply")
+    return members
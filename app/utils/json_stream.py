@@ -0,0 +1,135 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.json_extract import JSONExtractError, read_members
+
+_CLOSERS = ":,}]"
+
+
+class JSONSectionStream:
+    """
+    Incremental parser for a JSON object arriving in pieces (e.g. a streamed
+    completion) that hands back each top-level member as soon as its value is
+    complete, without re-parsing what it has already seen.
+
+    A character scanner carries nesting depth, string and comment state from
+    one piece to the next to find where each top-level member ends; only
+    then is that member parsed, once, by app.utils.json_extract.read_members.
+    Keys and values therefore get the same leniency as scan_json: single-
+    quoted or bare keys and strings, comments, missing commas and Python
+    literals. As there, a quote only closes a string when a delimiter
+    follows, so apostrophes ('driver's door') stay inside it.
+
+    Text before the opening brace, such as a ```json fence or a sentence of
+    prose, is skipped. A member that can't be parsed is left out of the
+    sections; the full text is still available from text.
+    """
+
+    def __init__(self):
+        self.sections: Dict[str, Any] = {}
+        self.complete = False
+        self._chunks: List[str] = []
+        self._member: List[str] = []  # Text of the current top-level member from earlier pieces
+        self._depth = 0
+        self._quote: Optional[str] = None  # Quote character of the string we're in
+        self._escape = False
+        self._closing = False  # Saw a quote that closes the string if a delimiter follows
+        self._closing_newline = False
+        self._slash = False  # A "/" that may start a comment
+        self._comment: Optional[str] = None  # "line" or "block"
+        self._star = False  # A "*" that may end a block comment
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return "".join(self._chunks)
+
+    def _finish_member(self, text: str) -> List[Tuple[str, Any]]:
+        if not text.strip():
+            return []  # Empty member, e.g. a trailing comma
+        try:
+            members = read_members(text)
+        except JSONExtractError as e:
+            logging.warning(f"Skipping streamed section that couldn't be parsed: {e}")
+            return []
+        self.sections.update(members)
+        return members
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume the next piece of text; returns the (key, value) pairs it completed"""
+        self._chunks.append(chunk)
+        completed = []
+        if self.complete:
+            return completed
+
+        start = 0  # Where the current member's text begins within chunk
+        for index, char in enumerate(chunk):
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    start = index + 1
+                continue
+
+            if self._closing:
+                if char.isspace():
+                    self._closing_newline = self._closing_newline or char == "\n"
+                    continue
+                self._closing = False
+                if char in _CLOSERS or (self._closing_newline and char in "\"'"):
+                    self._quote = None  # The quote did close the string; char is outside it
+                # Otherwise the quote was part of the string and char still is
+
+            if self._quote is not None:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == self._quote:
+                    self._closing = True
+                    self._closing_newline = False
+                continue
+
+            if self._comment == "line":
+                if char == "\n":
+                    self._comment = None
+                continue
+            if self._comment == "block":
+                if self._star and char == "/":
+                    self._comment = None
+                self._star = char == "*"
+                continue
+            if self._slash:
+                self._slash = False
+                if char == "/":
+                    self._comment = "line"
+                    continue
+                if char == "*":
+                    self._comment = "block"
+                    self._star = False
+                    continue
+
+            if char == "/":
+                self._slash = True
+            elif char in "\"'":
+                self._quote = char
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.extend(self._finish_member("".join(self._member) + chunk[start:index]))
+                    self._member = []
+                    self.complete = True
+                    return completed
+            elif char == "," and self._depth == 1:
+                completed.extend(self._finish_member("".join(self._member) + chunk[start:index]))
+                self._member = []
+                start = index + 1
+
+        if self._depth > 0:
+            self._member.append(chunk[start:])
+        return completed
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """The whole object once its closing brace has arrived, otherwise None"""
+        return self.sections if self.complete else None
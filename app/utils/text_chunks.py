@@ -0,0 +1,87 @@
+import re
+from typing import List
+
+from app.core.prompts import count_tokens
+from app.core.rate_limiter import CHARS_PER_TOKEN
+
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+
+
+class TextChunk:
+    """A run of consecutive pages (1-based, inclusive) small enough for one prompt"""
+
+    def __init__(self, text: str, first_page: int, last_page: int, tokens: int):
+        self.text = text
+        self.first_page = first_page
+        self.last_page = last_page
+        self.tokens = tokens
+
+    def to_dict(self):
+        return {"first_page": self.first_page, "last_page": self.last_page, "tokens": self.tokens}
+
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text over the budget at paragraph breaks, then line breaks, then
+    spaces; anything still too long is cut at the character estimate.
+    """
+    for separator, pieces in (("\n\n", _PARAGRAPHS.split(text)), ("\n", text.split("\n")), (" ", text.split(" "))):
+        if len(pieces) < 2:
+            continue
+        parts: List[str] = []
+        current: List[str] = []
+        current_tokens = 0
+        for piece in pieces:
+            piece_tokens = count_tokens(piece) + 1
+            if current and current_tokens + piece_tokens > max_tokens:
+                parts.append(separator.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+        if current:
+            parts.append(separator.join(current))
+        result: List[str] = []
+        for part in parts:
+            result.extend(_split_oversized(part, max_tokens) if count_tokens(part) > max_tokens else [part])
+        return result
+
+    width = max_tokens * CHARS_PER_TOKEN
+    return [text[start:start + width] for start in range(0, len(text), width)]
+
+
+def chunk_pages(pages: List[str], max_tokens: int) -> List[TextChunk]:
+    """
+    Pack page texts, in order, into chunks of at most max_tokens. Pages are
+    never merged out of order and a chunk only breaks between pages, except
+    that a single page over the budget is split on its own.
+    """
+    chunks: List[TextChunk] = []
+    texts: List[str] = []
+    first_page = last_page = 0
+    tokens = 0
+
+    def flush():
+        nonlocal texts, tokens
+        if texts:
+            chunks.append(TextChunk("\n".join(texts), first_page, last_page, tokens))
+        texts, tokens = [], 0
+
+    for number, page in enumerate(pages, start=1):
+        page = page.strip()
+        if not page:
+            continue
+        page_tokens = count_tokens(page) + 1
+        if page_tokens > max_tokens:
+            flush()
+            for part in _split_oversized(page, max_tokens):
+                chunks.append(TextChunk(part, number, number, count_tokens(part)))
+            continue
+        if texts and tokens + page_tokens > max_tokens:
+            flush()
+        if not texts:
+            first_page = number
+        texts.append(page)
+        last_page = number
+        tokens += page_tokens
+    flush()
+    return chunks
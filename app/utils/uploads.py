@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import io
+import logging
+import mmap
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from fastapi import UploadFile
+
+# Leading bytes of the formats we accept, mapped to (MIME type, extension)
+SIGNATURES = [
+    (b"\xff\xd8\xff", ("image/jpeg", "jpg")),
+    (b"\x89PNG\r\n\x1a\n", ("image/png", "png")),
+    (b"%PDF-", ("application/pdf", "pdf"))
+]
+IMAGE_TYPES = {"image/jpeg", "image/png"}
+PDF_TYPES = {"application/pdf"}
+
+CHUNK_SIZE = 1024 * 1024
+SNIFF_BYTES = 16
+
+
+class UploadRejected(ValueError):
+    """Raised for an upload that is empty, too large or not an allowed type"""
+
+
+def sniff_type(head: bytes) -> Optional[str]:
+    """MIME type of a file from its first bytes, or None if it isn't a supported format"""
+    for signature, (mime_type, _) in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+def _extension(mime_type: str) -> str:
+    return next(extension for _, (known, extension) in SIGNATURES if known == mime_type)
+
+
+class IngestedUpload:
+    """An upload that has been validated, hashed and written to disk in one pass"""
+
+    def __init__(self, filename: str, path: Path, size: int, sha256: str, mime_type: str):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.mime_type = mime_type
+
+    @property
+    def extension(self) -> str:
+        return _extension(self.mime_type)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "filename": self.filename,
+            "size": self.size,
+            "sha256": self.sha256,
+            "mime_type": self.mime_type
+        }
+
+
+def _spool(source, destination: Path, max_bytes: Optional[int]) -> Dict[str, object]:
+    """
+    Copy source to destination through one reusable buffer, hashing and
+    sniffing the type as the chunks go by. Returns size, digest and type.
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    head = b""
+    size = 0
+    source.seek(0)
+    with destination.open("wb") as output:
+        while True:
+            count = source.readinto(buffer)
+            if not count:
+                break
+            chunk = view[:count]
+            if len(head) < SNIFF_BYTES:
+                head += bytes(chunk[:SNIFF_BYTES - len(head)])
+            size += count
+            if max_bytes is not None and size > max_bytes:
+                raise UploadRejected(f"larger than {max_bytes} bytes")
+            digest.update(chunk)
+            output.write(chunk)
+    return {"size": size, "sha256": digest.hexdigest(), "mime_type": sniff_type(head)}
+
+
+async def ingest_upload(file: UploadFile, directory: Path, allowed_types=IMAGE_TYPES,
+                        max_bytes: Optional[int] = None) -> IngestedUpload:
+    """
+    Stream an upload to directory once, without reading it into memory.
+
+    The file type is taken from its content rather than its name, and the
+    stored file is named by a UUID and that type, so the client's filename
+    never reaches the filesystem. Raises UploadRejected (after removing the
+    partial file) if the upload is empty, over max_bytes or not one of
+    allowed_types.
+    """
+    path = Path(directory) / f"{uuid.uuid4()}.part"
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(None, _spool, file.file, path, max_bytes)
+        if result["size"] == 0:
+            raise UploadRejected("file is empty")
+        if result["mime_type"] not in allowed_types:
+            raise UploadRejected("unsupported file type")
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    final_path = path.with_suffix("." + _extension(result["mime_type"]))
+    path.rename(final_path)
+    logging.info(f"Stored upload {file.filename} ({result['size']} bytes, sha256 {result['sha256'][:12]}) "
+                 f"at {final_path}")
+    return IngestedUpload(file.filename, final_path, result["size"], result["sha256"], result["mime_type"])
+
+
+def map_file(path) -> mmap.mmap:
+    """
+    Read-only memory map of a file. The OS pages it in on demand from the
+    page cache and can drop it again under pressure, so nothing is copied
+    onto the heap. Supports the buffer protocol (hashlib, base64, len).
+    """
+    with open(path, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@contextmanager
+def mapped_files(paths) -> Iterator[List[mmap.mmap]]:
+    """
+    map_file for each path, closing every mapping (and its file descriptor)
+    on exit. A mapping that a cancelled worker thread is still reading
+    can't be closed yet; it is left for garbage collection instead.
+    """
+    mappings: List[mmap.mmap] = []
+    try:
+        for path in paths:
+            mappings.append(map_file(path))
+        yield mappings
+    finally:
+        for mapping in mappings:
+            try:
+                mapping.close()
+            except BufferError:
+                logging.warning("Memory-mapped upload still in use; leaving it to be released later")
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file object over a bytes-like buffer (e.g. an mmap) that doesn't copy it"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        count = max(0, min(len(target), len(self._view) - self._position))
+        target[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
@@ -0,0 +1,235 @@
+import copy
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+from app.utils.image_preprocess import PreparedImage
+
+# Size assumed for images whose dimensions are unknown (Pillow couldn't read them)
+UNKNOWN_IMAGE_EDGE = 2048
+
+# Placeholder answers that shouldn't win a merge over a real value from another batch
+_BLANKS = {"", "n/a", "na", "none", "null", "unknown", "not visible", "not available", "not applicable",
+           "not specified", "not provided", "not determined", "-"}
+# Fields that identify an entry in a list of objects, so the same entry from two batches is merged
+_IDENTITY_KEYS = ("Component", "Dealer", "Source", "Name")
+_AMOUNT = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def image_tokens(width: Optional[int], height: Optional[int]) -> int:
+    """
+    Prompt tokens of one high-detail image, as OpenAI bills them: scaled to
+    fit 2048x2048, then to a shortest side of 768, at 170 tokens per 512px
+    tile plus 85.
+    """
+    width = width or UNKNOWN_IMAGE_EDGE
+    height = height or UNKNOWN_IMAGE_EDGE
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+class VisionBatch:
+    """Images (by index into the planned list) sent together in one vision request"""
+
+    def __init__(self):
+        self.indices: List[int] = []
+        self.pixels = 0
+        self.tokens = 0
+        self.bytes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"images": list(self.indices), "pixels": self.pixels, "tokens": self.tokens, "bytes": self.bytes}
+
+
+class VisionBatchPlanner:
+    """
+    Groups images into vision requests that stay within an image count, a
+    pixel budget, an image-token budget and a payload size. Images are packed
+    in their original order, each batch filled before the next is started, so
+    the same images always produce the same batches. An image too large for
+    any budget on its own still gets a batch of its own.
+    """
+
+    def __init__(self, max_images: int = 8, max_pixels: int = 16_000_000,
+                 max_tokens: int = 8000, max_bytes: int = 15 * 1024 * 1024):
+        self.max_images = max_images
+        self.max_pixels = max_pixels
+        self.max_tokens = max_tokens
+        self.max_bytes = max_bytes
+
+    def plan(self, images: List[PreparedImage]) -> List[VisionBatch]:
+        batches: List[VisionBatch] = []
+        current = VisionBatch()
+        for index, image in enumerate(images):
+            pixels = (image.width or UNKNOWN_IMAGE_EDGE) * (image.height or UNKNOWN_IMAGE_EDGE)
+            tokens = image_tokens(image.width, image.height)
+            # base64 inflates the payload by 4/3
+            size = math.ceil(len(image.data) * 4 / 3)
+            fits = (len(current.indices) < self.max_images
+                    and current.pixels + pixels <= self.max_pixels
+                    and current.tokens + tokens <= self.max_tokens
+                    and current.bytes + size <= self.max_bytes)
+            if current.indices and not fits:
+                batches.append(current)
+                current = VisionBatch()
+            current.indices.append(index)
+            current.pixels += pixels
+            current.tokens += tokens
+            current.bytes += size
+        if current.indices:
+            batches.append(current)
+        return batches
+
+
+def _is_blank(value: Any) -> bool:
+    if value is None or value == [] or value == {}:
+        return True
+    return isinstance(value, str) and value.strip().lower() in _BLANKS
+
+
+def _identity(item: Any) -> str:
+    if isinstance(item, dict):
+        for key in _IDENTITY_KEYS:
+            if isinstance(item.get(key), str):
+                return f"{key}:{item[key].strip().lower()}"
+        return json.dumps(item, sort_keys=True, default=str)
+    if isinstance(item, str):
+        return item.strip().lower()
+    return json.dumps(item, default=str)
+
+
+def _merge_value(existing: Any, new: Any) -> Any:
+    if _is_blank(existing):
+        return copy.deepcopy(new) if not _is_blank(new) else existing
+    if isinstance(existing, dict) and isinstance(new, dict):
+        for key, value in new.items():
+            existing[key] = _merge_value(existing.get(key), value)
+        return existing
+    if isinstance(existing, list) and isinstance(new, list):
+        positions = {_identity(item): position for position, item in enumerate(existing)}
+        for item in new:
+            position = positions.get(_identity(item))
+            if position is None:
+                positions[_identity(item)] = len(existing)
+                existing.append(copy.deepcopy(item))
+            else:
+                existing[position] = _merge_value(existing[position], item)
+        return existing
+    return existing  # Scalars: the earliest batch wins
+
+
+def _amount(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _AMOUNT.search(value)
+        if match:
+            return float(match.group().replace(",", ""))
+    return None
+
+
+def _as_number(value: float) -> Any:
+    return int(value) if value == int(value) else round(value, 2)
+
+
+def _recompute_repair_total(section: Dict[str, Any], batch_sections: List[Dict[str, Any]]):
+    """
+    Set the total of a merged repair cost section: the sum of the merged
+    components when every cost is a readable amount, otherwise the sum of
+    the batches' own totals.
+    """
+    total_keys = [key for key in section if "total" in key.lower()]
+    if not total_keys:
+        return
+    total_key = total_keys[0]
+
+    component_list = next((value for value in section.values() if isinstance(value, list)), None)
+    if component_list is not None:
+        costs = [_amount(item.get("Cost")) if isinstance(item, dict) else None for item in component_list]
+    else:
+        costs = [_amount(value) for key, value in section.items() if key not in total_keys]
+
+    if costs and all(cost is not None for cost in costs):
+        section[total_key] = _as_number(sum(costs))
+        return
+    batch_totals = [_amount(batch.get(total_key)) for batch in batch_sections]
+    if batch_totals and all(total is not None for total in batch_totals):
+        section[total_key] = _as_number(sum(batch_totals))
+
+
+def _find_key(report: Dict[str, Any], *words: str) -> Optional[str]:
+    return next((key for key in report if all(word in key.lower() for word in words)), None)
+
+
+def _reconcile_consistency(merged: Dict[str, Any], reports: List[Dict[str, Any]]):
+    """
+    Each batch only compared its own photos. The claim shows one vehicle
+    only if every batch says so and they all read the same registration.
+    """
+    registrations = []
+    for report in reports:
+        details_key = _find_key(report, "vehicle", "details")
+        details = report.get(details_key) if details_key else None
+        if isinstance(details, dict):
+            registration_key = _find_key(details, "registration", "number")
+            value = details.get(registration_key) if registration_key else None
+            if isinstance(value, str) and not _is_blank(value):
+                registrations.append(re.sub(r"[^0-9A-Z]", "", value.upper()))
+    mismatch = len(set(registrations)) > 1
+
+    check_key = _find_key(merged, "consistency")
+    if check_key is None or not isinstance(merged[check_key], dict):
+        if mismatch:
+            merged["Vehicle Consistency Check"] = {
+                "Same Vehicle Detected": False,
+                "Reason": f"Photos show different registration numbers: {', '.join(sorted(set(registrations)))}"
+            }
+        return
+
+    check = merged[check_key]
+    flag_key = next((key for key, value in check.items() if isinstance(value, bool)), None)
+    reason_key = _find_key(check, "reason")
+    verdicts = [report[check_key].get(flag_key) for report in reports
+                if flag_key and isinstance(report.get(check_key), dict)]
+    if flag_key is not None:
+        check[flag_key] = all(verdict is not False for verdict in verdicts) and not mismatch
+    if reason_key is not None:
+        reasons = []
+        if mismatch:
+            reasons.append(f"Photos show different registration numbers: {', '.join(sorted(set(registrations)))}")
+        for report in reports:
+            reason = report[check_key].get(reason_key) if isinstance(report.get(check_key), dict) else None
+            if isinstance(reason, str) and reason not in reasons:
+                reasons.append(reason)
+        check[reason_key] = " ".join(reasons)
+
+
+def merge_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge the JSON reports of several batches of one claim into one report.
+
+    Deterministic for reports given in batch order. Objects merge key by
+    key. Lists are unioned, with entries naming the same Component or Dealer
+    merged. For scalars the earliest non-placeholder answer wins. Repair
+    totals are recomputed and the vehicle consistency check covers all
+    batches.
+    """
+    if len(reports) == 1:
+        return reports[0]
+
+    merged: Dict[str, Any] = {}
+    for report in reports:
+        merged = _merge_value(merged, report)
+
+    for key, section in merged.items():
+        if "repair" in key.lower() and isinstance(section, dict):
+            _recompute_repair_total(section, [report[key] for report in reports
+                                              if isinstance(report.get(key), dict)])
+    _reconcile_consistency(merged, reports)
+    return merged
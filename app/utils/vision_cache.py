@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class VisionResultCache:
+    """
+    Two-tier cache for vision analysis results.
+
+    Entries are keyed by the SHA-256 of the image bytes, the model name and a
+    hash of the prompt, so the same photos analyzed with the same prompt and
+    model are only paid for once. The first tier is an in-memory LRU, the
+    second is a SQLite file with TTL and size-based eviction that survives
+    restarts.
+
+    The size of the SQLite tier is tracked as a running total, so a write
+    only touches the table when the cap is exceeded. Expired rows are swept,
+    and the total resynced with the file, at most once per sweep interval.
+    """
+
+    def __init__(self,
+                 db_path: str,
+                 ttl_seconds: int = 7 * 24 * 3600,
+                 max_memory_entries: int = 256,
+                 max_disk_bytes: int = 256 * 1024 * 1024,
+                 sweep_interval_seconds: int = 300):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+        self._disk_bytes = 0
+        self._next_sweep = 0.0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._initialize_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=10)
+
+    def _initialize_db(self):
+        """Create the cache table if it doesn't exist"""
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS vision_cache (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        size_bytes INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_vision_cache_accessed ON vision_cache (accessed_at)")
+                self._disk_bytes = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM vision_cache").fetchone()[0]
+        except Exception as e:
+            logging.error(f"Error initializing vision cache at {self.db_path}: {str(e)}")
+            raise
+
+    @staticmethod
+    def make_key(images: List[bytes], model: str, prompt: str) -> str:
+        """Build a cache key from the image contents, model name and prompt"""
+        digest = hashlib.sha256()
+        for image_data in images:
+            digest.update(hashlib.sha256(image_data).digest())
+        digest.update(model.encode("utf-8"))
+        digest.update(hashlib.sha256(prompt.encode("utf-8")).digest())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a cached result or None if missing or expired"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at, size_bytes FROM vision_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or now - row[1] >= self.ttl_seconds:
+                    deleted = 0
+                    if row is not None:
+                        deleted = conn.execute("DELETE FROM vision_cache WHERE key = ?", (key,)).rowcount
+                    with self._lock:
+                        self.stats["misses"] += 1
+                        if deleted:
+                            self._disk_bytes -= row[2]
+                    return None
+                conn.execute("UPDATE vision_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        except Exception as e:
+            logging.error(f"Error reading vision cache: {str(e)}")
+            return None
+
+        value = json.loads(row[0])
+        with self._lock:
+            self.stats["disk_hits"] += 1
+            self._remember(key, row[1], value)
+        return value
+
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable result in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self.stats["writes"] += 1
+
+        try:
+            payload = json.dumps(value)
+            size_bytes = len(payload.encode("utf-8"))
+            with self._connect() as conn:
+                replaced = conn.execute("SELECT size_bytes FROM vision_cache WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO vision_cache (key, value, size_bytes, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, size_bytes, now, now)
+                )
+                with self._lock:
+                    self._disk_bytes += size_bytes - (replaced[0] if replaced else 0)
+                self._evict(conn, now)
+        except Exception as e:
+            logging.error(f"Error writing vision cache: {str(e)}")
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """Async variant of get that keeps SQLite I/O off the event loop"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any):
+        """Async variant of set that keeps SQLite I/O off the event loop"""
+        await asyncio.to_thread(self.set, key, value)
+
+    def _remember(self, key: str, created_at: float, value: Any):
+        """Insert into the memory tier, evicting least recently used entries"""
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Sweep expired entries when due, then drop least recently used ones until under the size cap"""
+        with self._lock:
+            sweep_due = now >= self._next_sweep
+            if sweep_due:
+                self._next_sweep = now + self.sweep_interval_seconds
+
+        expired = 0
+        if sweep_due:
+            expired = conn.execute(
+                "DELETE FROM vision_cache WHERE created_at <= ?", (now - self.ttl_seconds,)
+            ).rowcount
+            # Resync the running total, which other processes sharing the file don't update
+            total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM vision_cache").fetchone()[0]
+            with self._lock:
+                self._disk_bytes = total
+
+        with self._lock:
+            total = self._disk_bytes
+        evicted = 0
+        if total > self.max_disk_bytes:
+            stale_keys = []
+            freed = 0
+            for key, size_bytes in conn.execute("SELECT key, size_bytes FROM vision_cache ORDER BY accessed_at ASC"):
+                if total - freed <= self.max_disk_bytes:
+                    break
+                stale_keys.append((key,))
+                freed += size_bytes
+            conn.executemany("DELETE FROM vision_cache WHERE key = ?", stale_keys)
+            evicted = len(stale_keys)
+            with self._lock:
+                self._disk_bytes -= freed
+
+        if expired or evicted:
+            with self._lock:
+                self.stats["evictions"] += expired + evicted
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_bytes"] = self._disk_bytes
+        return stats
@@ -0,0 +1,170 @@
+"""
+Benchmark for recovering JSON from model output.
+
+Runs every response in benchmarks/fixtures/model_outputs through:
+
+  before   the fallback chain analyze_image_from_openai used to run
+           (reproduced in legacy_extract below): json.loads, strip the
+           fences, replace every ' with ", find/rfind the braces, retry
+  after    app.utils.json_extract.scan_json
+
+and reports, per response, whether each recovered the expected object
+(<name>.expected.json) and the CPU time per call. It also feeds every
+response to app.utils.json_stream.JSONSectionStream in small chunks, as a
+streamed completion arrives, and checks that the sections come out under
+the expected top-level keys, in order ("streamed"). The fixtures are a few
+KB, so it also streams reports with one large "Damage Analysis" section
+(--large-kb, and four times that), double- and single-quoted, and checks
+the time grows linearly with the size: streaming runs on the event loop. The corpus covers the
+failure modes seen in vision reports: code fences, surrounding prose,
+trailing and missing commas, Python reprs and literals, comments,
+unescaped quotes, apostrophes in single-quoted values and output cut off
+at max_tokens.
+
+Run from the repository root:
+
+    python benchmarks/bench_json_extract.py --repeat 200 --chunk 4
+"""
+import argparse
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.json_extract import JSONExtractError, scan_json
+from app.utils.json_stream import JSONSectionStream
+
+CORPUS = Path(__file__).resolve().parent / "fixtures" / "model_outputs"
+
+
+def legacy_extract(res_content):
+    try:
+        return json.loads(res_content)
+    except json.JSONDecodeError:
+        response_content = res_content.strip("```json").strip("```").strip()
+        try:
+            response_content = response_content.replace("'", '"')
+            json_start = response_content.find("{")
+            json_end = response_content.rfind("}")
+
+            if json_start != -1 and json_end != -1:
+                valid_json = response_content[json_start : json_end + 1]
+                try:
+                    return json.loads(valid_json)
+                except json.JSONDecodeError:
+                    pass
+            return json.loads(response_content)
+        except json.JSONDecodeError:
+            return None
+
+
+def new_extract(text):
+    try:
+        return scan_json(text).value
+    except JSONExtractError:
+        return None
+
+
+def streamed_sections(text, chunk):
+    """Section names JSONSectionStream emits when text arrives chunk characters at a time"""
+    stream = JSONSectionStream()
+    names = []
+    for start in range(0, len(text), chunk):
+        names.extend(name for name, _ in stream.feed(text[start:start + chunk]))
+    return names, stream.complete
+
+
+def large_report(expected, kilobytes, single_quoted=False):
+    """expected with its "Damage Analysis" section repeated until the report is about kilobytes KB"""
+    report = copy.deepcopy(expected)
+    entries = expected["Damage Analysis"]
+    while len(json.dumps(report, indent=2)) < kilobytes * 1024:
+        report["Damage Analysis"].extend(copy.deepcopy(entries))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    # Like 11_single_quoted_apostrophes: every quote single, apostrophes left as they are
+    return (text.replace('"', "'") if single_quoted else text), report
+
+
+def stream_large(expected, kilobytes, chunk, single_quoted):
+    text, report = large_report(expected, kilobytes, single_quoted)
+    stream = JSONSectionStream()
+    started = time.process_time()
+    for start in range(0, len(text), chunk):
+        stream.feed(text[start:start + chunk])
+    millis = 1000 * (time.process_time() - started)
+    return len(text), millis, stream.complete and stream.sections == report
+
+
+def sections_ok(names, complete, expected):
+    # Output cut off mid-document only has its finished members as sections
+    keys = list(expected)
+    return names == keys if complete else names == keys[:len(names)] and len(names) >= len(keys) - 1
+
+
+def load_corpus():
+    return [
+        (path.stem, path.read_text(), json.loads(path.with_name(f"{path.stem}.expected.json").read_text()))
+        for path in sorted(CORPUS.glob("*.txt"))
+    ]
+
+
+def timed(extract, text, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        value = extract(text)
+    return value, 1e6 * (time.process_time() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=100, help="calls timed per response and variant")
+    parser.add_argument("--chunk", type=int, default=4, help="characters per piece fed to JSONSectionStream")
+    parser.add_argument("--large-kb", type=int, default=20, help="size of the large-section reports streamed")
+    args = parser.parse_args()
+
+    totals = {"before": [0, 0.0], "after": [0, 0.0]}
+    streamed_total = 0
+    print(f"{'response':<32}{'bytes':>7}{'before':>9}{'us':>9}{'after':>8}{'us':>9}{'streamed':>10}")
+    for name, text, expected in load_corpus():
+        row = []
+        for variant, extract in (("before", legacy_extract), ("after", new_extract)):
+            value, micros = timed(extract, text, args.repeat)
+            ok = value == expected
+            totals[variant][0] += ok
+            totals[variant][1] += micros
+            row.append(("ok" if ok else "FAIL", micros))
+        (before_ok, before_us), (after_ok, after_us) = row
+        streamed = sections_ok(*streamed_sections(text, args.chunk), expected)
+        streamed_total += streamed
+        print(f"{name:<32}{len(text):>7}{before_ok:>9}{before_us:>9.1f}{after_ok:>8}{after_us:>9.1f}"
+              f"{'ok' if streamed else 'FAIL':>10}")
+
+    count = len(load_corpus())
+    print()
+    for variant, (recovered, micros) in totals.items():
+        print(f"{variant:<8} recovered {recovered}/{count}, {micros / count:.1f} us per response on average")
+    print(f"streamed sections matched {streamed_total}/{count} ({args.chunk}-character chunks)")
+
+    print(f"\n{'large section':<32}{'bytes':>7}{'ms':>9}{'sections':>10}")
+    expected = json.loads((CORPUS / "01_clean.expected.json").read_text())
+    large_ok = True
+    for single_quoted in (False, True):
+        timings = []
+        for kilobytes in (args.large_kb, 4 * args.large_kb):
+            size, millis, ok = stream_large(expected, kilobytes, args.chunk, single_quoted)
+            large_ok = large_ok and ok
+            timings.append(millis)
+            label = f"{kilobytes} KB, {'single' if single_quoted else 'double'}-quoted"
+            print(f"{label:<32}{size:>7}{millis:>9.1f}{'ok' if ok else 'FAIL':>10}")
+        # Four times the text should take about four times as long, not sixteen
+        large_ok = large_ok and timings[1] < 8 * max(timings[0], 1.0)
+
+    if streamed_total < count or not large_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Micro-benchmark for VehicleDamageReportGeneratorV2 style handling.
+
+Compares the shared ReportStyleRegistry against the previous behaviour,
+where every generator rebuilt the stylesheet and re-registered fonts, every
+table cell allocated a fresh ParagraphStyle and every table rebuilt its
+TableStyle. "before" is reproduced by LegacyStyleGenerator below.
+
+The font must be a real TrueType file, since re-parsing it is part of what
+"before" paid for. By default static/fonts/DejaVuSans.ttf is used, falling
+back to the Vera.ttf bundled with ReportLab; the benchmark fails rather than
+silently measuring Helvetica when no font can be loaded.
+
+Run from the repository root:
+
+    python benchmarks/bench_pdf_styles.py --reports 20 --pages 10
+    python benchmarks/bench_pdf_styles.py --font /usr/share/fonts/truetype/dejavu/DejaVuSans.ttf
+"""
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import reportlab
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import TableStyle
+
+from app.services.pdf_report_generator_v2 import VehicleDamageReportGeneratorV2
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_FONTS = [
+    ROOT / "static" / "fonts" / "DejaVuSans.ttf",
+    Path(reportlab.__file__).resolve().parent / "fonts" / "Vera.ttf",
+]
+
+# Set by load_font before anything is measured
+font_path = None
+
+
+def load_font(candidates) -> str:
+    """Register the first candidate that parses as a TrueType font as DejaVuSans"""
+    errors = []
+    for candidate in candidates:
+        try:
+            pdfmetrics.registerFont(TTFont('DejaVuSans', str(candidate)))
+            return str(candidate)
+        except Exception as e:
+            errors.append(f"  {candidate}: {e}")
+    sys.exit("No usable TrueType font, so font parsing would not be measured:\n" + "\n".join(errors))
+
+
+class LegacyStyleGenerator(VehicleDamageReportGeneratorV2):
+    """Generator with the per-instance / per-cell style allocation used before the registry"""
+
+    def __init__(self):
+        super().__init__()
+        self.stylesheet = getSampleStyleSheet()
+        pdfmetrics.registerFont(TTFont('DejaVuSans', font_path))
+        self.custom_styles = {name: style.clone(style.name) for name, style in self.custom_styles.items()}
+
+    def _get_cell_style(self, alignment=0):
+        return ParagraphStyle('CellStyle', parent=self.stylesheet['Normal'],
+                              fontSize=8, wordWrap='CJK', alignment=alignment)
+
+    def _get_table_style(self, has_money=False):
+        style = [
+            ('BACKGROUND', (0, 0), (-1, 0), self.GRAY_BG),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.gray),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]
+        if has_money:
+            style.append(('ALIGN', (-1, 1), (-1, -1), 'RIGHT'))
+        return TableStyle(style)
+
+
+def build_report_data(pages: int) -> dict:
+    """Synthetic analysis spanning roughly one page per damage zone"""
+    data = {
+        "Vehicle Details": {
+            "Make": "Maruti Suzuki", "Model": "Swift", "Year of Manufacture": 2019,
+            "Registration Number": "KA01AB1234", "Registered State": "Karnataka",
+        }
+    }
+    # Every "damage" section starts on a new page
+    for zone in range(pages):
+        data[f"Damage Analysis - Zone {zone + 1}"] = {
+            f"Component {i}": {
+                "Observation": f"Dent and paint scratch on panel {i}, approx {i % 7 + 2} cm deep",
+                "Recommendation": "Denting, painting and polishing" if i % 2 else "Replace part",
+            }
+            for i in range(12)
+        }
+    data["Repair Cost Estimation (INR)"] = {f"Component {i}": 1500 + i * 37 for i in range(30)}
+    data["Market Valuation (INR)"] = {
+        "Pre-Accident Value": 550000, "Post-Accident Value": 420000,
+        "Market Quotes": [{"Dealer": f"Dealer {i}", "Value": 500000 + i * 1000} for i in range(5)],
+    }
+    return {"data": data}
+
+
+def run(generator_class, data: dict, reports: int, output_dir: str) -> dict:
+    # First instance outside the measurement so one-off imports don't skew results
+    generator_class().generate_report(data, output_dir)
+
+    tracemalloc.start()
+    durations, peaks = [], []
+    for _ in range(reports):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        generator_class().generate_report(data, output_dir)
+        durations.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        "mean_ms": 1000 * sum(durations) / len(durations),
+        "min_ms": 1000 * min(durations),
+        "peak_kib": sum(peaks) / len(peaks) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=10, help="reports rendered per variant")
+    parser.add_argument("--pages", type=int, default=10, help="approximate pages per report")
+    parser.add_argument("--font", type=Path, help="TrueType font to load (default: static/fonts/DejaVuSans.ttf, then ReportLab's Vera.ttf)")
+    args = parser.parse_args()
+
+    global font_path
+    font_path = load_font([args.font] if args.font else DEFAULT_FONTS)
+    print(f"font: {font_path}")
+
+    data = build_report_data(args.pages)
+    with tempfile.TemporaryDirectory() as output_dir:
+        before = run(LegacyStyleGenerator, data, args.reports, output_dir)
+        after = run(VehicleDamageReportGeneratorV2, data, args.reports, output_dir)
+
+    print(f"{'variant':<10}{'mean ms':>10}{'min ms':>10}{'peak KiB':>12}")
+    for name, result in (("before", before), ("after", after)):
+        print(f"{name:<10}{result['mean_ms']:>10.1f}{result['min_ms']:>10.1f}{result['peak_kib']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark for the provider status parsers behind /api/status.
+
+Compares one refresh of all four providers (parsing only, no network) with:
+
+  before  BeautifulSoup html.parser tree per page plus the old find_all
+          selectors (reproduced in LEGACY_CHECKS below)
+  html    the targeted, tree-less HTML extractors
+  json    statuspage.io summary.json where the provider has one, the HTML
+          extractor otherwise (what APIStatusChecker tries first)
+
+and checks that all three agree on every status. The pages in
+benchmarks/fixtures/status_pages mirror the markup the selectors target on
+the live status pages, padded with the scripts and uptime charts that make
+the real pages large.
+
+Run from the repository root:
+
+    python benchmarks/bench_status_parsers.py --refreshes 50
+"""
+import argparse
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bs4 import BeautifulSoup
+
+from app.services.api_status.parsers import (
+    StatuspageSummaryParser,
+    OpenAIStatusExtractor,
+    GeminiStatusExtractor,
+    LlamaStatusExtractor,
+    ClaudeStatusExtractor
+)
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "status_pages"
+
+
+def _legacy_openai(soup):
+    text = soup.find_all('svg', {'class': 'mb-1'})[0].find_all('rect')[-1]
+    return 1 if 'transition UptimeChart_pillOperational__sYJ07' in str(text) else 0
+
+
+def _legacy_gemini(soup):
+    status_element = soup.findAll('tr')[-7].find_all('td')[2].find_all('svg')[0]
+    return 1 if 'psd__status-icon psd__available' in str(status_element) else 0
+
+
+def _legacy_llama(soup):
+    text = soup.findAll('div', {'class': 'component-container border-color is-group'})[0].findAll('span')[8].get_text()
+    return 1 if re.sub(r'\s+', '', text) == 'Operational' else 0
+
+
+def _legacy_claude(soup):
+    text = soup.findAll('div', {"class": 'component-container border-color'})[0].findAll('span', {'class': 'component-status'})[0].get_text()
+    return 1 if re.sub(r'\s+', '', text) == "Operational" else 0
+
+
+LEGACY_CHECKS = {
+    "openai": _legacy_openai,
+    "gemini": _legacy_gemini,
+    "llama": _legacy_llama,
+    "claude": _legacy_claude
+}
+
+HTML_EXTRACTORS = {
+    "openai": OpenAIStatusExtractor,
+    "gemini": GeminiStatusExtractor,
+    "llama": LlamaStatusExtractor,
+    "claude": ClaudeStatusExtractor
+}
+
+
+def load_pages():
+    pages = {}
+    for name in LEGACY_CHECKS:
+        pages[name] = {"html": (FIXTURES / f"{name}.html").read_text()}
+        summary = FIXTURES / f"{name}_summary.json"
+        if summary.exists():
+            pages[name]["json"] = summary.read_text()
+    return pages
+
+
+def refresh_before(pages):
+    return {name: check(BeautifulSoup(pages[name]["html"], 'html.parser')) for name, check in LEGACY_CHECKS.items()}
+
+
+def refresh_html(pages):
+    return {name: extractor.parse(pages[name]["html"]) for name, extractor in HTML_EXTRACTORS.items()}
+
+
+def refresh_json(pages):
+    summary_parser = StatuspageSummaryParser()
+    return {
+        name: summary_parser.parse(page["json"]) if "json" in page else HTML_EXTRACTORS[name].parse(page["html"])
+        for name, page in pages.items()
+    }
+
+
+def run(refresh, pages, refreshes):
+    statuses = refresh(pages)  # warm-up
+
+    started = time.process_time()
+    for _ in range(refreshes):
+        refresh(pages)
+    cpu_ms = 1000 * (time.process_time() - started) / refreshes
+
+    tracemalloc.start()
+    refresh(pages)
+    peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    return statuses, cpu_ms, peak_kib
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--refreshes", type=int, default=20, help="refreshes timed per variant")
+    args = parser.parse_args()
+
+    pages = load_pages()
+    results = {name: run(refresh, pages, args.refreshes)
+               for name, refresh in (("before", refresh_before), ("html", refresh_html), ("json", refresh_json))}
+
+    expected = results["before"][0]
+    for name, (statuses, _, _) in results.items():
+        if statuses != expected:
+            raise SystemExit(f"{name} disagrees with the BeautifulSoup checks: {statuses} != {expected}")
+
+    print(f"{'variant':<10}{'CPU ms/refresh':>16}{'peak KiB':>12}")
+    for name, (_, cpu_ms, peak_kib) in results.items():
+        print(f"{name:<10}{cpu_ms:>16.2f}{peak_kib:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Peak memory of taking a batch of photo uploads from the request body to
+preprocessed vision inputs.
+
+  before   what /analyze_files did: await file.read() to check the upload
+           isn't empty, seek(0), shutil.copyfileobj to static/uploads, then
+           open().read() of every saved file for the vision request
+  after    app.utils.uploads: ingest_upload streams each upload to disk
+           once (hashing and sniffing as it goes) and map_file hands the
+           saved file to the preprocessor and the cache key as an mmap
+
+Both variants start from uploads spooled the way Starlette's multipart
+parser leaves them (SpooledTemporaryFile, 1 MiB in memory), hash the
+images for the vision cache key and preprocess them all at once, as the
+batched vision path does. Each variant runs in a fresh process, so peak
+RSS (ru_maxrss) is its own: "ingest" is the peak once every upload is
+saved, loaded and hashed, "total" after preprocessing too. "heap" is the
+peak of Python allocations (tracemalloc); "anon" is anonymous RSS with
+every image still held, i.e. memory the OS can't drop and re-read from
+the page cache.
+
+Run from the repository root:
+
+    python benchmarks/bench_upload_ingest.py --photos 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import UploadFile
+from PIL import Image
+
+from app.utils.image_preprocess import ImagePreprocessor
+from app.utils.uploads import IMAGE_TYPES, ingest_upload, map_file
+from app.utils.vision_cache import VisionResultCache
+
+
+def make_photos(directory: Path, count: int, width: int, height: int):
+    """Noise JPEGs: incompressible, so each is about the size of a phone photo"""
+    for index in range(count):
+        image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+        image.save(directory / f"photo_{index:02d}.jpg", format="JPEG", quality=75)
+
+
+def spooled_uploads(photo_dir: Path):
+    uploads = []
+    for path in sorted(photo_dir.glob("*.jpg")):
+        spool = SpooledTemporaryFile(max_size=1024 * 1024)
+        with open(path, "rb") as source:
+            shutil.copyfileobj(source, spool)
+        spool.seek(0)
+        uploads.append(UploadFile(file=spool, filename=path.name))
+    return uploads
+
+
+async def before(uploads, upload_dir: Path):
+    saved_paths = []
+    for file in uploads:
+        content = await file.read()
+        if len(content) == 0:
+            continue
+        await file.seek(0)
+        file_path = upload_dir / f"{len(saved_paths)}.jpg"
+        with file_path.open("wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        saved_paths.append(file_path)
+
+    images = []
+    for path in saved_paths:
+        with open(path, "rb") as image_file:
+            images.append(image_file.read())
+    return images
+
+
+async def after(uploads, upload_dir: Path):
+    saved = [await ingest_upload(file, upload_dir, IMAGE_TYPES) for file in uploads]
+    return [map_file(upload.path) for upload in saved]
+
+
+def anon_rss_kib() -> int:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return -1
+
+
+def peak_rss_kib() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # Bytes on macOS, KiB elsewhere
+
+
+def run_variant(variant: str, photo_dir: Path):
+    """Runs in the child process; prints one JSON line of results"""
+    preprocessor = ImagePreprocessor()
+    uploads = spooled_uploads(photo_dir)
+    with tempfile.TemporaryDirectory() as upload_dir:
+        tracemalloc.start()
+        started = time.perf_counter()
+        images = asyncio.run((before if variant == "before" else after)(uploads, Path(upload_dir)))
+        VisionResultCache.make_key(images, "gpt-4o-mini", "prompt")
+        ingest_peak = peak_rss_kib()
+        prepared = asyncio.run(preprocessor.aprocess_many(images))
+        elapsed = time.perf_counter() - started
+        heap_peak = tracemalloc.get_traced_memory()[1]
+        anon = anon_rss_kib()
+        tracemalloc.stop()
+        del images, prepared
+    preprocessor.shutdown()
+
+    print(json.dumps({"seconds": elapsed, "ingest_rss_kib": ingest_peak, "peak_rss_kib": peak_rss_kib(),
+                      "heap_kib": heap_peak // 1024, "anon_kib": anon}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=20, help="photos in the upload")
+    parser.add_argument("--width", type=int, default=3024)
+    parser.add_argument("--height", type=int, default=2268)
+    parser.add_argument("--variant", choices=["before", "after"], help=argparse.SUPPRESS)
+    parser.add_argument("--photo-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, Path(args.photo_dir))
+        return
+
+    with tempfile.TemporaryDirectory() as photo_dir:
+        make_photos(Path(photo_dir), args.photos, args.width, args.height)
+        total = sum(path.stat().st_size for path in Path(photo_dir).iterdir())
+        print(f"{args.photos} photos, {total / 1024 / 1024:.1f} MiB in total\n")
+
+        results = {}
+        for variant in ("before", "after"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--variant", variant, "--photo-dir", photo_dir],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results[variant] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'':<10}{'':>10}{'peak RSS MiB':^22}")
+    print(f"{'variant':<10}{'seconds':>10}{'ingest':>11}{'total':>11}{'heap MiB':>11}{'anon MiB':>11}")
+    for variant, result in results.items():
+        print(f"{variant:<10}{result['seconds']:>10.2f}{result['ingest_rss_kib'] / 1024:>11.1f}"
+              f"{result['peak_rss_kib'] / 1024:>11.1f}"
+              f"{result['heap_kib'] / 1024:>11.1f}{result['anon_kib'] / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
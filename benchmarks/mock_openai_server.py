@@ -0,0 +1,126 @@
+"""
+Minimal OpenAI-compatible chat completions server for exercising the AI
+provider router, retries and rate limiting locally.
+
+Start one per simulated provider and point the app at them:
+
+    python benchmarks/mock_openai_server.py --port 9101 --latency-ms 300
+    python benchmarks/mock_openai_server.py --port 9102 --latency-ms 1500 --error-rate 0.2
+
+    GORK_BASE_URL=http://127.0.0.1:9101/v1 OPENAI_BASE_URL=http://127.0.0.1:9102/v1 uvicorn app.main:app
+
+Behaviour can be changed while running with POST /control, e.g.
+{"latency_ms": 5000} or {"error_rate": 1.0}. {"content": "..."} sets the
+completion text; requests with "stream": true get it as SSE chunks spread
+over latency_ms.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Mock OpenAI-compatible API")
+config = {
+    "name": "mock",
+    "latency_ms": 200.0,
+    "jitter_ms": 50.0,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "retry_after": 1.0,
+    "content": None,
+    "stream_chunk_chars": 8
+}
+counters = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    counters["requests"] += 1
+
+    latency = max(0.0, config["latency_ms"] + random.uniform(-1, 1) * config["jitter_ms"]) / 1000
+    rate_limited = random.random() < config["rate_limit_rate"]
+    failed = not rate_limited and random.random() < config["error_rate"]
+    content = config["content"] if config["content"] is not None else f'{{"provider": "{config["name"]}"}}'
+
+    if body.get("stream") and not (rate_limited or failed):
+        return StreamingResponse(_stream(body.get("model", "mock"), content, latency), media_type="text/event-stream")
+    await asyncio.sleep(latency)
+
+    if rate_limited:
+        counters["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(config["retry_after"])},
+            content={"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}
+        )
+    if failed:
+        counters["errors"] += 1
+        return JSONResponse(status_code=500, content={"error": {"message": "Mock failure", "type": "server_error"}})
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    }
+
+
+async def _stream(model: str, content: str, latency: float):
+    size = max(1, int(config["stream_chunk_chars"]))
+    pieces = [content[i:i + size] for i in range(0, len(content), size)]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    for piece in pieces:
+        await asyncio.sleep(latency / len(pieces))
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/control")
+async def control(request: Request):
+    config.update(await request.json())
+    return config
+
+
+@app.get("/control")
+async def status():
+    return {**config, **counters}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--name", default="mock")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    config.update(name=args.name, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                  error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,42 @@
-from fastapi import FastAPI, Request, Form, UploadFile, File, HTTPException
+from fastapi import FastAPI, Request, Form, UploadFile, File, HTTPException, Query
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 import os
 from openai import AsyncOpenAI
 import logging
-from typing import Optional, List, Dict
-import shutil
-import uuid
+from typing import Optional, List, Dict, Tuple
 from pathlib import Path
 import base64
 from datetime import datetime
 import httpx
 import json
 import asyncio
-import PyPDF2
-import tempfile
+import time
+from contextlib import aclosing, asynccontextmanager
+from pydantic import ValidationError
+from app.models.vehicle_damage import DamageReport
+from app.utils.vision_cache import VisionResultCache
+from app.utils.image_preprocess import ImagePreprocessor
+from app.utils.json_stream import JSONSectionStream
+from app.utils.json_extract import JSONExtractError, extract_json, scan_json
+from app.utils.vision_batching import VisionBatchPlanner, merge_reports
+from app.utils.uploads import IMAGE_TYPES, UploadRejected, ingest_upload, mapped_files
+from app.services.insurance_extractor import INSURANCE_FIELDS, InsuranceExtractor
+from app.services.pdf_extractor import extract_pdf_pages
+from app.config.settings import (
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_MAX_KEEPALIVE_PER_HOST,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_HOST_CONNECTION_LIMITS,
+    HTTP_ENABLE_HTTP2,
+    HTTP_MAX_CLIENTS
+)
+from app.core.http_clients import HTTPClientRegistry, parse_host_limits, set_http_registry, get_http_registry
+from app.core.rate_limiter import RateLimiter, estimate_tokens, rate_limit_tenant
+from app.core.resilience import ResilienceLayer
+from app.core.prompts import PromptTemplate, prompt_registry
 
 # Configure logging
 logging.basicConfig(
@@ -45,9 +65,15 @@ if not OPEN_API_KEY:
     raise ValueError("OpenAI API key not found!")
 
 # Initialize OpenAI client for Grok
+# (SDK retries are off; the resilience layer below retries with backoff and a deadline)
+# The AI clients keep their own connection pools rather than borrowing from the
+# HTTP client registry: they are built at import, before the lifespan creates the
+# registry, and live for the whole process, whereas the registry closes a host's
+# client once it falls out of its least-recently-used set.
 grokClient = AsyncOpenAI(
     api_key=GORK_API_KEY,
     base_url="https://api.x.ai/v1",
+    max_retries=0,
     http_client=httpx.AsyncClient(
         timeout=httpx.Timeout(60.0, connect=5.0, read=30.0, write=30.0),
         limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
@@ -59,6 +85,7 @@ grokClient = AsyncOpenAI(
 openaiClient = AsyncOpenAI(
     api_key=OPEN_API_KEY,
     base_url="https://api.openai.com/v1",
+    max_retries=0,
     http_client=httpx.AsyncClient(
         timeout=httpx.Timeout(60.0, connect=5.0, read=30.0, write=30.0),
         limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
@@ -66,7 +93,68 @@ openaiClient = AsyncOpenAI(
     )
 )
 
-app = FastAPI()
+# Retries with backoff, per-provider circuit breakers and a total deadline for AI calls
+resilience = ResilienceLayer(
+    max_attempts=int(os.getenv("AI_RETRY_MAX_ATTEMPTS", "3")),
+    base_delay=float(os.getenv("AI_RETRY_BASE_DELAY_SECONDS", "0.5")),
+    max_delay=float(os.getenv("AI_RETRY_MAX_DELAY_SECONDS", "20")),
+    deadline=float(os.getenv("AI_REQUEST_DEADLINE_SECONDS", "90")),
+    failure_threshold=int(os.getenv("AI_CIRCUIT_FAILURE_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("AI_CIRCUIT_RESET_SECONDS", "30"))
+)
+
+# Client-side RPM/TPM quotas per provider (0 disables a limit)
+rate_limiter = RateLimiter(
+    {
+        "grok": (int(os.getenv("GROK_RPM", "60")), int(os.getenv("GROK_TPM", "100000"))),
+        "openai": (int(os.getenv("OPENAI_RPM", "500")), int(os.getenv("OPENAI_TPM", "200000")))
+    },
+    burst_seconds=float(os.getenv("AI_RATE_LIMIT_BURST_SECONDS", "10"))
+)
+
+async def create_chat_completion(provider: str, ai_client: AsyncOpenAI,
+                                 prompt: Optional[PromptTemplate] = None, **kwargs):
+    """
+    Chat completion that waits for the provider's quota and retries through the resilience layer.
+    With prompt, the provider's prefix-caching option is added and the call's token usage and
+    cost are recorded against that template.
+    """
+    if prompt is not None:
+        kwargs = {**prompt.request_options(provider), **kwargs}
+    create = rate_limiter.limited(
+        provider,
+        lambda: ai_client.chat.completions.create(**kwargs),
+        estimate_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+    )
+    response = await resilience.call(provider, create)
+    if prompt is not None:
+        # Streamed responses carry no usage with this SDK; they are counted as unmetered
+        usage = None if kwargs.get("stream") else response.usage
+        prompt_registry.record_usage(prompt, provider, getattr(response, "model", None) or kwargs["model"], usage)
+    return response
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pooled HTTP clients for post_to_gork's calls to the Gork endpoints
+    # (grokClient and openaiClient above keep their own pools)
+    http_registry = HTTPClientRegistry(
+        max_connections_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_per_host=HTTP_MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        timeout=60.0,
+        host_limits=parse_host_limits(HTTP_HOST_CONNECTION_LIMITS),
+        http2=HTTP_ENABLE_HTTP2,
+        max_clients=HTTP_MAX_CLIENTS
+    )
+    set_http_registry(http_registry)
+    app.state.http_registry = http_registry
+    try:
+        yield
+    finally:
+        await http_registry.aclose()
+        set_http_registry(None)
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -81,236 +169,377 @@ COMPANY_INFO = {
     "website": "https://www.readyassist.in"
 }
 
+# Vision result cache shared by the image analysis endpoints
+vision_cache = VisionResultCache(
+    os.getenv("VISION_CACHE_PATH", "cache/vision_cache.sqlite3"),
+    ttl_seconds=int(os.getenv("VISION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    max_memory_entries=int(os.getenv("VISION_CACHE_MAX_MEMORY_ENTRIES", "256")),
+    max_disk_bytes=int(os.getenv("VISION_CACHE_MAX_DISK_BYTES", str(256 * 1024 * 1024))),
+    sweep_interval_seconds=int(os.getenv("VISION_CACHE_SWEEP_INTERVAL_SECONDS", "300"))
+)
+
+# Downscales, rotates and strips metadata from photos before they are base64-encoded
+image_preprocessor = ImagePreprocessor(
+    max_edge=int(os.getenv("IMAGE_MAX_EDGE", "2048")),
+    jpeg_quality=int(os.getenv("IMAGE_JPEG_QUALITY", "85")),
+    workers=int(os.getenv("IMAGE_PREPROCESS_WORKERS", "4"))
+)
+
+# Single-photo vehicle assessment prompt (/analyze_files, /gen_report)
+VEHICLE_ASSESSMENT_PROMPT = prompt_registry.get("vehicle-assessment", "v1")
+
+# Insurance policy fields the rule layer left unresolved (/extract_document_info)
+INSURANCE_FIELDS_PROMPT = prompt_registry.get("insurance-extraction", "v2")
+
+# Rules for each insurer's policy layout first; the LLM only sees what they miss
+insurance_extractor = InsuranceExtractor()
+INSURANCE_LLM_FALLBACK = os.getenv("INSURANCE_LLM_FALLBACK", "true").lower() == "true"
+
 # Gork AI API endpoints
 GORK_IMAGE_API_URL = "https://api.gork.ai/vision/v1/analyze"
 GORK_DOCUMENT_API_URL = "https://api.gork.ai/document/v1/extract"
 
+async def post_to_gork(url: str, headers: Dict, payload: Dict) -> httpx.Response:
+    """POST to a Gork AI endpoint; 429s and 5xx raise inside the resilience layer so they are retried"""
+    async def send():
+        response = await get_http_registry().get_client(url).post(url, headers=headers, json=payload)
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+        return response
+
+    return await resilience.call("gork", send)
+
 async def analyze_image(image_path: str) -> Optional[Dict]:
     try:
-        with open(image_path, "rb") as image_file:
-            image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
+        with mapped_files([image_path]) as (image,):
+            prepared = await image_preprocessor.aprocess(image)
+        logging.info(f"Image preprocessing saved {prepared.bytes_saved} bytes for {image_path}")
+        
+        logging.info("Making API call to OpenAI Vision...")
+        try:
+            response = await create_chat_completion("openai", openaiClient,
+                prompt=VEHICLE_ASSESSMENT_PROMPT,
+                model="gpt-4-vision-preview",  # Current stable version that supports vision
+                max_tokens=4096,
+                temperature=0.7,
+                messages=VEHICLE_ASSESSMENT_PROMPT.messages([prepared.to_data_url()])
+            )
+            logging.info("Successfully received response from OpenAI")
             
-            logging.info("Making API call to OpenAI Vision...")
-            for attempt in range(3):  # Try up to 3 times
-                try:
-                    response = await client.chat.completions.create(
-                        model="gpt-4-vision-preview",  # Current stable version that supports vision
-                        max_tokens=4096,
-                        temperature=0.7,
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": """You are an expert vehicle damage assessor with deep knowledge of Indian vehicles, repair costs, and RTO regulations. 
-                                Analyze the image in detail and provide comprehensive information about the vehicle's condition, damage assessment, and repair estimates in INR."""
-                            },
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": """Analyze the attached vehicle images and provide a detailed report in JSON format. Include the following sections: 
-
-Vehicle Details: Provide the make, model, year of manufacture, odometer reading, vehicle color, registration number, registered state, RTO name, and claims reported location.
-
-Vehicle Dashboard and Condition: Report the speedometer reading, odometer reading, fuel level, warning lights, temperature, and gear position.
-
-Stickers and Signs Observed: List any visible stickers, signs, or branding on the vehicle.
-
-Damage Analysis: Identify all damaged components, provide observations, and suggest recommendations for each component.
-
-Repair Cost Estimation (INR): Provide an estimated repair cost for each damaged component along with a total repair cost.
-
-Market Valuation (INR): Provide the current market value of the vehicle pre-accident, post-accident value, salvage value, and estimated value after repairs. Include quotes from at least three different market sources.
-
-Ensure the output is in a structured JSON format with human-readable keys."""
-                                    },
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": f"data:image/jpeg;base64,{image_base64}"
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    )
-                    logging.info("Successfully received response from OpenAI")
-                    
-                    # Parse the response into JSON format
-                    content = response.choices[0].message.content
-                    try:
-                        return json.loads(content)
-                    except json.JSONDecodeError as je:
-                        logging.error(f"Failed to parse JSON response: {je}")
-                        return {"raw_analysis": content}
-                        
-                except httpx.ConnectError as ce:
-                    if attempt < 2:  # If not the last attempt
-                        wait_time = (attempt + 1) * 2  # Progressive backoff
-                        logging.warning(f"Connection error, retrying in {wait_time} seconds... (Attempt {attempt + 1}/3)")
-                        await asyncio.sleep(wait_time)
-                        continue
-                    logging.error(f"Failed after 3 attempts: {str(ce)}")
-                    raise  # Re-raise the last error if all attempts failed
-                except Exception as api_error:
-                    logging.error(f"OpenAI API Error: {str(api_error)}")
-                    raise
-                    
+            # Parse the response into JSON format
+            content = response.choices[0].message.content
+            try:
+                return extract_json(content)
+            except JSONExtractError as je:
+                logging.error(f"Failed to parse JSON response: {je}")
+                return {"raw_analysis": content}
+                
+        except Exception as api_error:
+            logging.error(f"OpenAI API Error: {str(api_error)}")
+            raise
+                
     except Exception as e:
         logging.error(f"Error analyzing image 1: {str(e)}")
         return None
 
 async def analyze_image_from_x(image_path: str) -> Optional[Dict]:
     try:
-        with open(image_path, "rb") as image_file:
-            image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
-
-            prompt = f"""
-            Analyze the attached vehicle images and provide a detailed report in JSON format. Include the following sections: 
-            Vehicle Details: Provide the make, model, year of manufacture, odometer reading, vehicle color, registration number, registered state, RTO name, and claims reported location.
-            Vehicle Dashboard and Condition: Report the speedometer reading, odometer reading, fuel level, warning lights, temperature, and gear position.
-            Stickers and Signs Observed: List any visible stickers, signs, or branding on the vehicle.
-            Damage Analysis: Identify all damaged components, provide observations, and suggest recommendations for each component.
-            Repair Cost Estimation (INR): Provide an estimated repair cost for each damaged component along with a total repair cost.
-            Market Valuation (INR): Provide the current market value of the vehicle pre-accident, post-accident value, salvage value, and estimated value after repairs. Include quotes from at least three different market sources.
-            Ensure the output is in a structured JSON format with human-readable keys.
-            """
+        with mapped_files([image_path]) as (image,):
+            prepared = await image_preprocessor.aprocess(image)
+        logging.info(f"Image preprocessing saved {prepared.bytes_saved} bytes for {image_path}")
+
+        logging.info("Making API call to Grok...")
+        try:
+            response = await create_chat_completion("grok", grokClient,
+                prompt=VEHICLE_ASSESSMENT_PROMPT,
+                model="grok-beta",
+                max_tokens=4096,
+                temperature=0.7,
+                messages=VEHICLE_ASSESSMENT_PROMPT.messages([prepared.to_data_url()])
+            )
+            logging.info("Successfully received response from Grok")
             
-            logging.info("Making API call to Grok...")
-            for attempt in range(3):
-                try:
-                    response = await grokClient.chat.completions.create(
-                        model="grok-beta",
-                        max_tokens=4096,
-                        temperature=0.7,
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": """You are an expert vehicle damage assessor with deep knowledge of Indian vehicles, repair costs, and RTO regulations. 
-                                Analyze the image in detail and provide comprehensive information about the vehicle's condition, damage assessment, and repair estimates in INR."""
-                            },
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": prompt
-                                    },
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": f"data:image/jpeg;base64,{image_base64}"
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    )
-                    logging.info("Successfully received response from Grok")
-                    
-                    # Parse the response into JSON format
-                    content = response.choices[0].message.content
-                    try:
-                        return json.loads(content)
-                    except json.JSONDecodeError as je:
-                        logging.error(f"Failed to parse JSON response: {je}")
-                        return content
-                        
-                except httpx.ConnectError as ce:
-                    if attempt < 2:  # If not the last attempt
-                        wait_time = (attempt + 1) * 2  # Progressive backoff
-                        logging.warning(f"Connection error, retrying in {wait_time} seconds... (Attempt {attempt + 1}/3)")
-                        await asyncio.sleep(wait_time)
-                        continue
-                    logging.error(f"Failed after 3 attempts: {str(ce)}")
-                    raise  # Re-raise the last error if all attempts failed
-                except Exception as api_error:
-                    logging.error(f"OpenAI API Error: {str(api_error)}")
-                    raise
-                    
+            # Parse the response into JSON format
+            content = response.choices[0].message.content
+            try:
+                return extract_json(content)
+            except JSONExtractError as je:
+                logging.error(f"Failed to parse JSON response: {je}")
+                return content
+                
+        except Exception as api_error:
+            logging.error(f"OpenAI API Error: {str(api_error)}")
+            raise
+                
     except Exception as e:
         logging.error(f"Error analyzing image 2: {str(e)}")
         return None
 
-async def analyze_image_from_openai(image_path: str) -> Optional[Dict]:
+# Prompt for the OpenAI vision report; its fingerprint is part of the vision cache key,
+# so a new version invalidates cached analyses
+OPENAI_VISION_PROMPT = prompt_registry.get("vehicle-assessment", "v2")
+
+# Structured-output mode: the model must answer with the DamageReport JSON schema
+OPENAI_STRUCTURED_OUTPUT = os.getenv("OPENAI_STRUCTURED_OUTPUT", "false").lower() == "true"
+DAMAGE_REPORT_RESPONSE_FORMAT = DamageReport.response_format()
+# Part of the cache key, so a schema change doesn't serve reports of the old shape
+DAMAGE_REPORT_SCHEMA_JSON = json.dumps(DAMAGE_REPORT_RESPONSE_FORMAT, sort_keys=True)
+
+# Packs a claim's photos into as few vision requests as fit these budgets
+vision_batch_planner = VisionBatchPlanner(
+    max_images=int(os.getenv("VISION_BATCH_MAX_IMAGES", "8")),
+    max_pixels=int(os.getenv("VISION_BATCH_MAX_PIXELS", "16000000")),
+    max_tokens=int(os.getenv("VISION_BATCH_MAX_IMAGE_TOKENS", "8000")),
+    max_bytes=int(os.getenv("VISION_BATCH_MAX_BYTES", str(15 * 1024 * 1024)))
+)
+VISION_BATCH_CONCURRENCY = int(os.getenv("VISION_BATCH_CONCURRENCY", "4"))
+
+async def run_vision_batches(images: List[bytes], prepared_images: List, analyze_batch) -> List:
+    """
+    Split a claim's images into batches with vision_batch_planner and run
+    analyze_batch(batch_images, batch_prepared) on each, at most
+    VISION_BATCH_CONCURRENCY at a time. Results come back in batch order;
+    a batch that raised is logged and returned as None.
+    """
+    batches = vision_batch_planner.plan(prepared_images)
+    if len(batches) > 1:
+        logging.info(f"Splitting {len(images)} images into {len(batches)} vision requests: "
+                     f"{[batch.to_dict() for batch in batches]}")
+    semaphore = asyncio.Semaphore(VISION_BATCH_CONCURRENCY)
+
+    async def run(batch):
+        async with semaphore:
+            return await analyze_batch([images[i] for i in batch.indices],
+                                       [prepared_images[i] for i in batch.indices])
+
+    results = await asyncio.gather(*(run(batch) for batch in batches), return_exceptions=True)
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            logging.error(f"Vision batch of images {batch.indices} failed: {str(result)}")
+    return [None if isinstance(result, Exception) else result for result in results]
+
+async def request_damage_report(images: List[bytes], prepared_images: List) -> Optional[DamageReport]:
+    """One structured-output vision request, cached per set of images"""
+    cache_key = VisionResultCache.make_key(images, "gpt-4o-mini",
+                                           OPENAI_VISION_PROMPT.fingerprint + DAMAGE_REPORT_SCHEMA_JSON)
+    cached = await vision_cache.aget(cache_key)
+    if cached is not None:
+        return DamageReport.model_validate(cached)
+
+    logging.info(f"Making structured-output API call to OpenAI with {len(images)} images...")
+    response = await create_chat_completion(
+        "openai", openaiClient,
+        prompt=OPENAI_VISION_PROMPT,
+        model="gpt-4o-mini",
+        max_tokens=4096,
+        temperature=0.7,
+        response_format=DAMAGE_REPORT_RESPONSE_FORMAT,
+        messages=OPENAI_VISION_PROMPT.messages([prepared.to_data_url() for prepared in prepared_images])
+    )
+
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        logging.error("Structured OpenAI response was cut off at max_tokens")
+        return None
+    if not choice.message.content:
+        logging.error("OpenAI returned no structured report (refusal or empty response)")
+        return None
+
+    try:
+        report = DamageReport.model_validate_json(choice.message.content)
+    except ValidationError as e:
+        logging.error(f"OpenAI response did not match the damage report schema: {str(e)}")
+        return None
+    await vision_cache.aset(cache_key, report.to_report_dict())
+    return report
+
+async def analyze_damage_report_from_openai(image_paths: List[str]) -> Optional[DamageReport]:
+    """
+    Structured-output version of analyze_image_from_openai. Each response is
+    validated into a DamageReport once and cached in that shape, so cache
+    hits need no parsing or repair.
+    """
+    try:
+        with mapped_files(image_paths) as images:
+            cache_key = VisionResultCache.make_key(
+                images, "gpt-4o-mini",
+                OPENAI_VISION_PROMPT.fingerprint + DAMAGE_REPORT_SCHEMA_JSON
+            )
+            cached = await vision_cache.aget(cache_key)
+            if cached is not None:
+                logging.info("Serving structured OpenAI analysis from vision cache")
+                return DamageReport.model_validate(cached)
+
+            prepared_images = await image_preprocessor.aprocess_many(images)
+            results = await run_vision_batches(images, prepared_images, request_damage_report)
+            reports = [report for report in results if report is not None]
+            if not reports:
+                return None
+            if len(results) == 1:
+                return reports[0]  # Cached by request_damage_report under this same key
+
+            report = DamageReport.model_validate(merge_reports([report.to_report_dict() for report in reports]))
+            if len(reports) == len(results):
+                await vision_cache.aset(cache_key, report.to_report_dict())
+            else:
+                logging.warning(f"Structured report covers {len(reports)} of {len(results)} image batches")
+            return report
+
+    except Exception as e:
+        logging.error(f"Error analyzing images with structured output: {str(e)}")
+        return None
+
+async def request_vision_report(images: List[bytes], prepared_images: List) -> Tuple[object, bool]:
+    """
+    One free-form vision request, cached per set of images. Returns the
+    report (or the raw text if no JSON could be recovered) and whether it
+    was complete enough to cache.
+    """
+    cache_key = VisionResultCache.make_key(images, "gpt-4o-mini", OPENAI_VISION_PROMPT.fingerprint)
+    cached = await vision_cache.aget(cache_key)
+    if cached is not None:
+        return cached, True
+
+    logging.info(f"Making API call to OpenAI with {len(images)} images...")
+    try:
+        response = await create_chat_completion("openai", openaiClient,
+            prompt=OPENAI_VISION_PROMPT,
+            model="gpt-4o-mini",
+            max_tokens=4096,
+            temperature=0.7,
+            messages=OPENAI_VISION_PROMPT.messages([prepared.to_data_url() for prepared in prepared_images])
+        )
+        logging.info("Successfully received response from OpenAI")
+    except Exception as api_error:
+        logging.error(f"OpenAI API Error: {str(api_error)}")
+        raise
+
+    res_content = response.choices[0].message.content
+    try:
+        extracted = scan_json(res_content)
+    except JSONExtractError as je:
+        logging.error(f"Failed to parse JSON response: {je}")
+        return res_content, False
+
+    if extracted.truncated:
+        # Cut off at max_tokens: return the complete sections, but don't cache a partial report
+        logging.warning("OpenAI response was truncated; returning the sections that were complete")
+        return extracted.value, False
+    await vision_cache.aset(cache_key, extracted.value)
+    return extracted.value, True
+
+async def analyze_image_from_openai(image_path: str, structured: bool = OPENAI_STRUCTURED_OUTPUT) -> Optional[Dict]:
+    if structured:
+        report = await analyze_damage_report_from_openai(image_path)
+        return report.to_report_dict() if report is not None else None
+
     try:
-        # with open(image_path, "rb") as image_file:
         if len(image_path) > 0:
-            # image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
-
-            prompt = f"""
-            Analyze the attached vehicle images and provide a detailed report in JSON format. Include the following sections: 
-            Vehicle Details: Provide the make, model, year of manufacture, odometer reading, vehicle color, registration number, registered state, RTO name, and claims reported location.
-            Vehicle Dashboard and Condition: Report the speedometer reading, odometer reading, fuel level, warning lights, temperature, and gear position.
-            Stickers and Signs Observed: List any visible stickers, signs, or branding on the vehicle.
-            Damage Analysis: Identify all damaged components, provide observations, and suggest recommendations for each component.
-            Repair Cost Estimation (INR): Provide an estimated repair cost for each damaged component along with a total repair cost.
-            Market Valuation (INR): Provide the current market value of the vehicle pre-accident, post-accident value, salvage value, and estimated value after repairs. Include quotes from at least three different market sources.
-            Ensure the output is in a structured JSON format with human-readable keys. If multiple images uploaded, then verify if its the same vehicle, add this result in json including the reason of consistency. In vehicle details, the result should be an object of high confidence.
-            """
-
-            content = [{"type": "text", "text": prompt}]
-            
-            for ip in range(len(image_path)):
-                with open(image_path[ip], "rb") as image_file:
-                    image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
-                    content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}})
-            
-            logging.info("Making API call to OpenAI...")
-            
-            try:
-                response = await openaiClient.chat.completions.create(
-                    model="gpt-4o-mini",
-                        max_tokens=4096,
-                        temperature=0.7,
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": """You are an expert vehicle damage assessor with deep knowledge of Indian vehicles, repair costs, and RTO regulations. 
-                                Analyze the image in detail and provide comprehensive information about the vehicle's condition, damage assessment, and repair estimates in INR."""
-                            },
-                            {
-                                "role": "user",
-                                "content": content
-                            }
-                        ]
-                    )
-                logging.info("Successfully received response from OpenAI")
-
-                # print(response.choices[0].message.content)
-                    
-                res_content = response.choices[0].message.content
-                try:
-                    return json.loads(res_content)
-                except json.JSONDecodeError:
-                    response_content = res_content.strip("```json").strip("```").strip()
-                    try:
-                        response_content = response_content.replace("'", '"')
-                        json_start = response_content.find("{")
-                        json_end = response_content.rfind("}")
-
-                        if json_start != -1 and json_end != -1:
-                            valid_json = response_content[json_start : json_end + 1]
-                            try:
-                                parsed_json = json.loads(valid_json)
-                                # print("Parsed JSON:", json.dumps(parsed_json, indent=2))
-                                return parsed_json
-                            except json.JSONDecodeError:
-                                logging.info("Still invalid JSON after formatting.")
-                        return json.loads(response_content)
-                    except json.JSONDecodeError:
-                        logging.info("Error: Unable to parse JSON")
-                except json.JSONDecodeError as je:
-                    logging.error(f"Failed to parse JSON response: Child: {je}")
-                    return res_content
-            except json.JSONDecodeError as je:
-                        logging.error(f"Failed to parse JSON response: Main: {je}")
-                        return res_content
-                    
+            with mapped_files(image_path) as images:
+                # Serve resubmitted photos from the cache instead of paying for another call
+                cache_key = VisionResultCache.make_key(images, "gpt-4o-mini", OPENAI_VISION_PROMPT.fingerprint)
+                cached = await vision_cache.aget(cache_key)
+                if cached is not None:
+                    logging.info("Serving OpenAI analysis from vision cache")
+                    return cached
+
+                prepared_images = await image_preprocessor.aprocess_many(images)
+                preprocessing = ImagePreprocessor.summarize(prepared_images)
+                logging.info(f"Image preprocessing saved {preprocessing['bytes_saved']} of "
+                             f"{preprocessing['original_bytes']} bytes across {preprocessing['images']} images")
+
+                results = await run_vision_batches(images, prepared_images, request_vision_report)
+                if len(results) == 1:
+                    # Cached by request_vision_report under this same key
+                    return results[0][0] if results[0] is not None else None
+
+                reports = [result[0] for result in results if result is not None and isinstance(result[0], dict)]
+                if not reports:
+                    logging.error("No image batch returned a JSON report")
+                    return next((result[0] for result in results if result is not None), None)
+
+                report = merge_reports(reports)
+                if len(reports) == len(results) and all(cacheable for _, cacheable in results):
+                    await vision_cache.aset(cache_key, report)
+                else:
+                    logging.warning(f"Report covers {len(reports)} of {len(results)} image batches; not caching it")
+                return report
+
     except Exception as e:
         logging.error(f"Error analyzing image 3: {str(e)}")
         return None
 
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_image_analysis_from_openai(image_paths: List[str]):
+    """
+    Streamed version of analyze_image_from_openai, as Server-Sent Events:
+    "started" once the images are prepared, one "section" per top-level
+    report section ("Vehicle Details", "Damage Analysis", ...) as soon as
+    the model has finished writing it, then "done" with the whole report,
+    or "error".
+    """
+    stream = None
+    try:
+        # The mappings are only needed for the cache key and preprocessing, not while the model streams
+        with mapped_files(image_paths) as images:
+            cache_key = VisionResultCache.make_key(images, "gpt-4o-mini", OPENAI_VISION_PROMPT.fingerprint)
+            cached = await vision_cache.aget(cache_key)
+            prepared_images = await image_preprocessor.aprocess_many(images) if cached is None else None
+
+        if cached is not None:
+            logging.info("Streaming OpenAI analysis from vision cache")
+            yield sse_event("started", {"images": len(image_paths), "cached": True})
+            if isinstance(cached, dict):
+                for name, data in cached.items():
+                    yield sse_event("section", {"name": name, "data": data})
+            yield sse_event("done", {"report": cached, "cached": True})
+            return
+
+        yield sse_event("started", {"images": len(image_paths), "cached": False,
+                                    "preprocessing": ImagePreprocessor.summarize(prepared_images)})
+
+        logging.info("Making streaming API call to OpenAI...")
+        stream = await create_chat_completion(
+            "openai", openaiClient,
+            prompt=OPENAI_VISION_PROMPT,
+            model="gpt-4o-mini",
+            max_tokens=4096,
+            temperature=0.7,
+            stream=True,
+            messages=OPENAI_VISION_PROMPT.messages([prepared.to_data_url() for prepared in prepared_images])
+        )
+
+        parser = JSONSectionStream()
+        async for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            for name, data in parser.feed(chunk.choices[0].delta.content):
+                yield sse_event("section", {"name": name, "data": data})
+
+        # The sections are a preview; the final report is parsed from the full
+        # text so single-quoted or otherwise repaired output comes out right
+        try:
+            extracted = scan_json(parser.text)
+        except JSONExtractError:
+            logging.error("Streamed OpenAI response contained no JSON")
+            yield sse_event("done", {"report": parser.text, "cached": False})
+            return
+        if extracted.truncated:
+            logging.warning("Streamed OpenAI response was cut off; not caching the partial report")
+        else:
+            await vision_cache.aset(cache_key, extracted.value)
+        yield sse_event("done", {"report": extracted.value, "cached": False, "truncated": extracted.truncated})
+
+    except Exception as e:
+        logging.error(f"Error streaming image analysis: {str(e)}")
+        yield sse_event("error", {"error": str(e)})
+    finally:
+        if stream is not None:
+            await stream.close()
+
 def generate_html_report(analyses: List[Dict], company_info: Dict) -> str:
     try:
         # Initialize combined data structure
@@ -532,8 +761,147 @@ def generate_repair_costs_table(costs: List[Dict]) -> str:
 async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.middleware("http")
+async def set_rate_limit_tenant(request: Request, call_next):
+    """Queue this request's AI calls under its tenant for fair rate limiting"""
+    tenant = request.headers.get("X-Tenant-ID") or (request.client.host if request.client else "default")
+    rate_limit_tenant.set(tenant)
+    return await call_next(request)
+
+@app.get("/ai_call_metrics")
+async def ai_call_metrics():
+    """Rate limiter wait times, retry/circuit breaker state and per-prompt token spend for AI calls"""
+    return JSONResponse(content={
+        "rate_limits": rate_limiter.get_metrics(),
+        "resilience": resilience.get_metrics(),
+        "prompts": prompt_registry.get_metrics(),
+        "insurance_extraction": insurance_extractor.get_metrics()
+    })
+
+# Vision calls in flight at once for the files of one /analyze_files or /gen_report upload
+UPLOAD_ANALYSIS_CONCURRENCY = int(os.getenv("UPLOAD_ANALYSIS_CONCURRENCY", "10"))
+
+NO_VALID_IMAGES = "No valid images to analyze. Please ensure you upload supported image files (JPG, JPEG, PNG)."
+
+async def save_uploads(files: List[UploadFile]) -> List[Dict]:
+    """
+    Ingest every uploaded photo concurrently. Returns one entry per file, in
+    upload order, with a status of "saved", "rejected" or "duplicate" (the
+    same photo as an earlier file in the request).
+    """
+    async def save(file: UploadFile):
+        try:
+            return await ingest_upload(file, UPLOAD_DIR, IMAGE_TYPES)
+        except UploadRejected as rejected:
+            return rejected
+
+    outcomes = await asyncio.gather(*(save(file) for file in files), return_exceptions=True)
+    entries = []
+    seen_digests = set()
+    for index, (file, outcome) in enumerate(zip(files, outcomes)):
+        entry = {"index": index, "filename": file.filename}
+        if isinstance(outcome, Exception):
+            logging.warning(f"Skipping {file.filename}: {outcome}")
+            entry.update(status="rejected", error=str(outcome))
+        elif outcome.sha256 in seen_digests:
+            logging.info(f"Skipping {file.filename}: same photo as an earlier upload")
+            outcome.path.unlink(missing_ok=True)
+            entry["status"] = "duplicate"
+        else:
+            seen_digests.add(outcome.sha256)
+            entry.update(status="saved", path=str(outcome.path), file_url=f"/static/uploads/{outcome.path.name}")
+        entries.append(entry)
+    return entries
+
+async def analyze_uploads(entries: List[Dict], analyze):
+    """
+    Run analyze(path) on every saved upload, at most
+    UPLOAD_ANALYSIS_CONCURRENCY at a time, and yield each entry as soon as
+    its analysis finishes, marked "analyzed" or "failed".
+    """
+    semaphore = asyncio.Semaphore(UPLOAD_ANALYSIS_CONCURRENCY)
+
+    async def run(entry: Dict) -> Dict:
+        async with semaphore:
+            logging.info(f"Starting analysis for: {entry['filename']}")
+            started = time.perf_counter()
+            try:
+                analysis = await analyze(entry["path"])
+            except Exception as e:
+                logging.error(f"Error processing file {entry['filename']}: {str(e)}")
+                analysis = None
+                entry["error"] = str(e)
+            entry["seconds"] = round(time.perf_counter() - started, 3)
+
+        if analysis:
+            entry.update(status="analyzed", analysis=analysis)
+            logging.info(f"Successfully analyzed: {entry['filename']}")
+        else:
+            entry["status"] = "failed"
+            entry.setdefault("error", "Analysis failed")
+            logging.error(f"Failed to analyze: {entry['filename']}")
+        return entry
+
+    tasks = [asyncio.create_task(run(entry)) for entry in entries if entry["status"] == "saved"]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # The client went away mid-stream: don't leave calls running for nobody
+        for task in tasks:
+            task.cancel()
+
+def upload_entry(entry: Dict, include_analysis: bool = False) -> Dict:
+    """The client-facing part of a save_uploads entry"""
+    return {key: value for key, value in entry.items()
+            if key != "path" and (include_analysis or key != "analysis")}
+
+def upload_summary(entries: List[Dict], analyses: List) -> Dict:
+    summary = {
+        "success": bool(analyses),
+        "response_content": analyses,
+        "file_urls": [entry["file_url"] for entry in entries if "file_url" in entry],
+        "files": [upload_entry(entry) for entry in entries]
+    }
+    if not analyses:
+        summary["error"] = NO_VALID_IMAGES
+    return summary
+
+async def respond_to_uploads(events, stream: bool):
+    """
+    Turn ("file" | "done", data) events into a response: Server-Sent Events
+    as they happen when stream is set, otherwise the "done" summary as JSON.
+    """
+    if stream:
+        async def sse():
+            # Closed with the response, so a client that disconnects cancels the analyses still running
+            async with aclosing(events):
+                async for event, data in events:
+                    yield sse_event(event, data)
+
+        return StreamingResponse(
+            sse(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    summary = None
+    async with aclosing(events):
+        async for event, data in events:
+            if event == "done":
+                summary = data
+    if not summary["success"]:
+        logging.error("No valid images were successfully analyzed")
+        return JSONResponse(status_code=400, content={"success": False, "error": summary["error"],
+                                                      "files": summary["files"]})
+    return summary
+
 @app.post("/analyze_files")
-async def handle_file_uploads(files: List[UploadFile] = File(...)):
+async def handle_file_uploads(
+    files: List[UploadFile] = File(...),
+    per_image: bool = Query(False, description="Analyze each photo in its own request instead of batching them into one report"),
+    stream: bool = Query(False, description="Stream per-file progress as Server-Sent Events")
+):
     try:
         if not files:
             logging.error("No files were uploaded")
@@ -542,74 +910,31 @@ async def handle_file_uploads(files: List[UploadFile] = File(...)):
                 content={"success": False, "error": "No files were uploaded"}
             )
 
-        analyses = []
-        file_urls = []
-        
         logging.info(f"Received {len(files)} files for analysis")
-        
-        for file in files:
-            logging.info(f"Processing file: {file.filename}")
-            
-            # Validate file type
-            file_extension = file.filename.split('.')[-1].lower()
-            if file_extension not in ['jpg', 'jpeg', 'png']:
-                logging.warning(f"Skipping unsupported file type: {file.filename}")
-                continue
-            
-            try:
-                # Read file content to validate it's a real image
-                content = await file.read()
-                if len(content) == 0:
-                    logging.error(f"Empty file received: {file.filename}")
-                    continue
-                
-                # Reset file position for later use
-                await file.seek(0)
-                
-                # Generate unique filename
-                unique_filename = f"{uuid.uuid4()}.{file_extension}"
-                file_path = UPLOAD_DIR / unique_filename
-                
-                # Save the uploaded file
-                logging.info(f"Saving file to: {file_path}")
-                with file_path.open("wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
-                
-                # Get the file's public URL
-                file_url = f"/static/uploads/{unique_filename}"
-                file_urls.append(file_url)
-                
-                # Analyze the image
-                logging.info(f"Starting analysis for: {file.filename}")
-                analysis = await analyze_image(str(file_path))
-                if analysis:
-                    analyses.append(analysis)
-                    logging.info(f"Successfully analyzed: {file.filename}")
-                else:
-                    logging.error(f"Failed to analyze: {file.filename}")
-            
-            except Exception as e:
-                logging.error(f"Error processing file {file.filename}: {str(e)}")
-                continue
-        
-        if not analyses:
-            logging.error("No valid images were successfully analyzed")
-            return JSONResponse(
-                status_code=400,
-                content={"success": False, "error": "No valid images to analyze. Please ensure you upload supported image files (JPG, JPEG, PNG)."}
-            )
-        
-        # Generate HTML report
-        # logging.info("Generating HTML report")
-        # report_html = generate_html_report(analyses, COMPANY_INFO)
-        
-        return {
-            "success": True,
-            # "report_html": report_html,
-            "response_content": analyses,
-            "file_urls": file_urls
-        }
-    
+        # Uploads are closed once this handler returns, so save them before streaming
+        entries = await save_uploads(files)
+
+        async def events():
+            if per_image:
+                async with aclosing(analyze_uploads(entries, analyze_image)) as analyzed:
+                    async for entry in analyzed:
+                        yield "file", upload_entry(entry, include_analysis=True)
+                analyses = [entry["analysis"] for entry in entries if entry["status"] == "analyzed"]
+            else:
+                # All photos in as few requests as the batch planner allows, merged into one report
+                saved = [entry for entry in entries if entry["status"] == "saved"]
+                analysis = None
+                if saved:
+                    logging.info(f"Starting batched analysis of {len(saved)} images")
+                    analysis = await analyze_image_from_openai([entry["path"] for entry in saved])
+                for entry in saved:
+                    entry["status"] = "analyzed" if analysis else "failed"
+                    yield "file", upload_entry(entry)
+                analyses = [analysis] if analysis else []
+            yield "done", upload_summary(entries, analyses)
+
+        return await respond_to_uploads(events(), stream)
+
     except Exception as e:
         logging.error(f"Error processing files: {str(e)}")
         return JSONResponse(
@@ -618,7 +943,10 @@ async def handle_file_uploads(files: List[UploadFile] = File(...)):
         )
 
 @app.post("/gen_report")
-async def handle_file_uploads(files: List[UploadFile] = File(...)):
+async def handle_file_uploads(
+    files: List[UploadFile] = File(...),
+    stream: bool = Query(False, description="Stream per-file progress as Server-Sent Events")
+):
     try:
         if not files:
             logging.error("No files were uploaded")
@@ -627,74 +955,19 @@ async def handle_file_uploads(files: List[UploadFile] = File(...)):
                 content={"success": False, "error": "No files were uploaded"}
             )
 
-        analysis = []
-        file_urls = []
-        
         logging.info(f"Received {len(files)} files for analysis")
-        
-        for file in files:
-            logging.info(f"Processing file: {file.filename}")
-            
-            # Validate file type
-            file_extension = file.filename.split('.')[-1].lower()
-            if file_extension not in ['jpg', 'jpeg', 'png']:
-                logging.warning(f"Skipping unsupported file type: {file.filename}")
-                continue
-            
-            try:
-                # Read file content to validate it's a real image
-                content = await file.read()
-                if len(content) == 0:
-                    logging.error(f"Empty file received: {file.filename}")
-                    continue
-                
-                # Reset file position for later use
-                await file.seek(0)
-                
-                # Generate unique filename
-                unique_filename = f"{uuid.uuid4()}.{file_extension}"
-                file_path = UPLOAD_DIR / unique_filename
-                
-                # Save the uploaded file
-                logging.info(f"Saving file to: {file_path}")
-                with file_path.open("wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
-                
-                # Get the file's public URL
-                file_url = f"/static/uploads/{unique_filename}"
-                file_urls.append(file_url)
-                
-                # Analyze the image
-                logging.info(f"Starting analysis for: {file.filename}")
-                analysis = await analyze_image_from_x(str(file_path))
-                # if analysis:
-                #     analyses.append(analysis)
-                #     logging.info(f"Successfully analyzed: {file.filename}")
-                # else:
-                #     logging.error(f"Failed to analyze: {file.filename}")
-            
-            except Exception as e:
-                logging.error(f"Error processing file {file.filename}: {str(e)}")
-                continue
-        
-        if not analysis:
-            logging.error("No valid images were successfully analyzed")
-            return JSONResponse(
-                status_code=400,
-                content={"success": False, "error": "No valid images to analyze. Please ensure you upload supported image files (JPG, JPEG, PNG)."}
-            )
-        
-        # Generate HTML report
-        # logging.info("Generating HTML report")
-        # report_html = generate_html_report(analyses, COMPANY_INFO)
-        
-        return {
-            "success": True,
-            # "report_html": report_html,
-            "response_content": analysis,
-            "file_urls": file_urls
-        }
-    
+        entries = await save_uploads(files)
+
+        async def events():
+            async with aclosing(analyze_uploads(entries, analyze_image_from_x)) as analyzed:
+                async for entry in analyzed:
+                    yield "file", upload_entry(entry, include_analysis=True)
+            # Every file's analysis, in upload order
+            yield "done", upload_summary(entries, [entry["analysis"] for entry in entries
+                                                   if entry["status"] == "analyzed"])
+
+        return await respond_to_uploads(events(), stream)
+
     except Exception as e:
         logging.error(f"Error processing files: {str(e)}")
         return JSONResponse(
@@ -702,75 +975,142 @@ async def handle_file_uploads(files: List[UploadFile] = File(...)):
             content={"success": False, "error": f"An error occurred while processing the files: {str(e)}"}
         )
 
-@app.post("/extract_document_info")
-async def extract_document_info(documents: List[UploadFile] = File(...)):
+async def extract_insurance_fields_with_llm(fields: List[str], text_content: str) -> Dict:
+    """Ask gpt-3.5-turbo for the given fields only"""
+    response = await create_chat_completion("openai", openaiClient,
+        prompt=INSURANCE_FIELDS_PROMPT,
+        model="gpt-3.5-turbo",
+        messages=INSURANCE_FIELDS_PROMPT.messages(fields="\n".join(fields), document_text=text_content),
+        temperature=0.3,
+        max_tokens=1000
+    )
+    extracted_info = extract_json(response.choices[0].message.content)
+    return extracted_info if isinstance(extracted_info, dict) else {}
+
+# Documents extracted at once by one /extract_document_info or /extract_document_info/batch request
+DOCUMENT_EXTRACTION_CONCURRENCY = int(os.getenv("DOCUMENT_EXTRACTION_CONCURRENCY", "4"))
+
+async def extract_document(pdf_content: bytes, provider: str = "local", details: bool = False) -> Dict:
+    """
+    Policy fields of one insurance PDF: with the local rules (and the LLM for
+    whatever they miss) or with the Gork Document API
+    """
+    # Readers accept a PDF header anywhere in the first 1024 bytes
+    if b"%PDF-" not in pdf_content[:1024]:
+        raise UploadRejected("not a PDF document")
+    if provider == "gork":
+        return await extract_document_with_gork(pdf_content)
+
+    # Parse the PDF from memory, off the event loop
+    text_content = "\n".join(await extract_pdf_pages(pdf_content))
+    result = await insurance_extractor.extract(
+        text_content,
+        llm=extract_insurance_fields_with_llm if INSURANCE_LLM_FALLBACK else None
+    )
+    extracted_info = dict(result.fields)
+    if details:
+        extracted_info["_extraction"] = result.to_dict()
+    return extracted_info
+
+async def extract_documents(documents: List[Tuple[str, bytes]], provider: str = "local", details: bool = False):
+    """
+    Extract every (filename, content) document, at most
+    DOCUMENT_EXTRACTION_CONCURRENCY at a time, yielding one result per
+    document as it completes. A failed document gets status "error" and
+    its message; it doesn't stop the others.
+    """
+    semaphore = asyncio.Semaphore(DOCUMENT_EXTRACTION_CONCURRENCY)
+
+    async def run(index: int, filename: str, content: bytes) -> Dict:
+        async with semaphore:
+            started = time.perf_counter()
+            entry = {"index": index, "filename": filename}
+            try:
+                entry.update(status="ok", data=await extract_document(content, provider, details))
+            except Exception as e:
+                logging.error(f"Error processing document {filename}: {str(e)}")
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                entry.update(status="error", error=detail if isinstance(detail, str) else json.dumps(detail))
+            entry["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return entry
+
+    tasks = [asyncio.create_task(run(index, filename, content))
+             for index, (filename, content) in enumerate(documents)]
     try:
-        results = []
-        for document in documents:
-            # Read PDF content
-            pdf_content = await document.read()
-            
-            # Create a temporary file to store the PDF
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
-                temp_pdf.write(pdf_content)
-                temp_pdf_path = temp_pdf.name
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # The consumer stopped early (an error, or a streaming client went away)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def read_documents(documents: List[UploadFile]) -> List[Tuple[str, bytes]]:
+    """Read every upload before the handler returns (FastAPI closes them afterwards)"""
+    return [(document.filename, await document.read()) for document in documents]
 
-            try:
-                # Extract text from PDF
-                text_content = ""
-                with open(temp_pdf_path, 'rb') as pdf_file:
-                    pdf_reader = PyPDF2.PdfReader(pdf_file)
-                    for page in pdf_reader.pages:
-                        text_content += page.extract_text()
-
-                # Use GPT-3.5 to extract information
-                prompt = f"""Extract the following information from the insurance document text. Return the information in a JSON format with these exact keys:
-                customer_name
-                customer_contact_number
-                policy_number
-                insurance_company_name
-                type_of_policy
-                start_date_of_policy
-                expiry_date_of_policy
-                registration_number
-                engine_number
-                chassis_number
-                body_type
-                vehicle_make
-                model
-                manufacturing_year
-                total_premium_paid
-                address
-
-                Here's the document text:
-                {text_content}
-
-                Return ONLY the JSON object with the extracted information. If a field is not found, set its value to null.
-                """
-
-                response = await client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that extracts specific information from insurance documents and returns it in JSON format."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.3,
-                    max_tokens=1000
-                )
-
-                # Parse the response
-                extracted_info = json.loads(response.choices[0].message.content)
-                results.append(extracted_info)
-
-            finally:
-                # Clean up temporary file
-                os.unlink(temp_pdf_path)
+@app.post("/extract_document_info")
+async def extract_document_info(documents: List[UploadFile] = File(...),
+                                details: bool = Query(False, description="Add where each field came from under _extraction")):
+    try:
+        results = [None] * len(documents)
+        # Closing the generator on the first failure cancels the documents still being extracted
+        async with aclosing(extract_documents(await read_documents(documents), details=details)) as entries:
+            async for entry in entries:
+                if entry["status"] != "ok":
+                    raise HTTPException(status_code=500, detail=entry["error"])
+                results[entry["index"]] = entry["data"]
 
         return JSONResponse(content=results)
 
     except Exception as e:
         logging.error(f"Error processing documents: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=e.detail if isinstance(e, HTTPException) else str(e))
+
+@app.post("/extract_document_info/batch")
+async def extract_document_info_batch(
+    documents: List[UploadFile] = File(...),
+    provider: str = Query("local", pattern="^(local|gork)$",
+                          description="local: compiled rules, then the LLM for missing fields; gork: Gork Document API"),
+    stream: bool = Query(False, description="Stream one NDJSON line per document as it completes"),
+    details: bool = Query(False, description="Add where each field came from under _extraction")
+):
+    """
+    Extract policy fields from many documents concurrently. Every document
+    gets its own result ({"index", "filename", "status": "ok" | "error",
+    "data" or "error", "elapsed_ms"}), so one bad file doesn't fail the batch.
+    """
+    if not documents:
+        raise HTTPException(status_code=400, detail="No documents were uploaded")
+    contents = await read_documents(documents)
+    logging.info(f"Extracting {len(contents)} documents with {provider}")
+
+    if stream:
+        async def lines():
+            succeeded = 0
+            # Closed with the response, so a client that disconnects cancels the remaining documents
+            async with aclosing(extract_documents(contents, provider, details)) as entries:
+                async for entry in entries:
+                    succeeded += entry["status"] == "ok"
+                    yield json.dumps(entry) + "\n"
+            yield json.dumps({"done": True, "documents": len(contents), "succeeded": succeeded,
+                              "failed": len(contents) - succeeded}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    results = [None] * len(contents)
+    async with aclosing(extract_documents(contents, provider, details)) as entries:
+        async for entry in entries:
+            results[entry["index"]] = entry
+    succeeded = sum(entry["status"] == "ok" for entry in results)
+    return JSONResponse(content={
+        "success": succeeded > 0,
+        "documents": len(contents),
+        "succeeded": succeeded,
+        "failed": len(contents) - succeeded,
+        "results": results
+    })
 
 async def analyze_images_with_gork(image_paths: List[str]) -> List[Dict]:
     """Analyze vehicle images using Gork AI Vision API"""
@@ -782,8 +1122,8 @@ async def analyze_images_with_gork(image_paths: List[str]) -> List[Dict]:
 
     for image_path in image_paths:
         try:
-            with open(image_path, "rb") as image_file:
-                image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
+            with mapped_files([image_path]) as (image,):
+                image_base64 = base64.b64encode(image).decode('utf-8')
 
             payload = {
                 "image": image_base64,
@@ -799,18 +1139,13 @@ async def analyze_images_with_gork(image_paths: List[str]) -> List[Dict]:
                 }
             }
 
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    GORK_IMAGE_API_URL,
-                    headers=headers,
-                    json=payload
-                )
-                
-                if response.status_code == 200:
-                    results.append(response.json())
-                else:
-                    logging.error(f"Error analyzing image: {response.text}")
-                    raise HTTPException(status_code=response.status_code, detail=response.text)
+            response = await post_to_gork(GORK_IMAGE_API_URL, headers, payload)
+            
+            if response.status_code == 200:
+                results.append(response.json())
+            else:
+                logging.error(f"Error analyzing image: {response.text}")
+                raise HTTPException(status_code=response.status_code, detail=response.text)
 
         except Exception as e:
             logging.error(f"Error processing image {image_path}: {str(e)}")
@@ -818,78 +1153,41 @@ async def analyze_images_with_gork(image_paths: List[str]) -> List[Dict]:
 
     return results
 
-async def extract_document_info_with_gork(pdf_paths: List[str]) -> List[Dict]:
-    """Extract information from documents using Gork AI Document API"""
-    results = []
+async def extract_document_with_gork(pdf_data: bytes) -> Dict:
+    """Extract information from one document using the Gork AI Document API"""
     headers = {
         "Authorization": f"Bearer {GORK_API_KEY}",
         "Content-Type": "application/json"
     }
+    payload = {
+        "document": base64.b64encode(pdf_data).decode('utf-8'),
+        "document_type": "insurance_policy",
+        "output_format": "json",
+        "extract_fields": list(INSURANCE_FIELDS)
+    }
 
-    for pdf_path in pdf_paths:
-        try:
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_base64 = base64.b64encode(pdf_file.read()).decode('utf-8')
-
-            payload = {
-                "document": pdf_base64,
-                "document_type": "insurance_policy",
-                "output_format": "json",
-                "extract_fields": [
-                    "customer_name",
-                    "customer_contact_number",
-                    "policy_number",
-                    "insurance_company_name",
-                    "type_of_policy",
-                    "start_date_of_policy",
-                    "expiry_date_of_policy",
-                    "registration_number",
-                    "engine_number",
-                    "chassis_number",
-                    "body_type",
-                    "vehicle_make",
-                    "model",
-                    "manufacturing_year",
-                    "total_premium_paid",
-                    "address"
-                ]
-            }
-
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    GORK_DOCUMENT_API_URL,
-                    headers=headers,
-                    json=payload
-                )
-                
-                if response.status_code == 200:
-                    results.append(response.json())
-                else:
-                    logging.error(f"Error processing document: {response.text}")
-                    raise HTTPException(status_code=response.status_code, detail=response.text)
-
-        except Exception as e:
-            logging.error(f"Error processing document {pdf_path}: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
-
-    return results
+    response = await post_to_gork(GORK_DOCUMENT_API_URL, headers, payload)
+    if response.status_code != 200:
+        logging.error(f"Error processing document: {response.text}")
+        raise HTTPException(status_code=response.status_code, detail=response.text)
+    return response.json()
 
 @app.post("/analyze_images")
-async def analyze_images(files: List[UploadFile] = File(...)):
+async def analyze_images(files: List[UploadFile] = File(...),
+                         structured: bool = Query(OPENAI_STRUCTURED_OUTPUT,
+                                                  description="Answer with the typed damage report schema")):
     """Endpoint to analyze vehicle damage images"""
     try:
         saved_paths = []
-        for file in files:
-            if not file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                raise HTTPException(status_code=400, detail="Only PNG and JPG images are allowed")
-
-            file_path = UPLOAD_DIR / f"{uuid.uuid4()}_{file.filename}"
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            saved_paths.append(str(file_path))
-
         try:
-            results = await analyze_image_from_openai(saved_paths)
+            for file in files:
+                try:
+                    upload = await ingest_upload(file, UPLOAD_DIR, IMAGE_TYPES)
+                except UploadRejected as rejected:
+                    raise HTTPException(status_code=400, detail=f"{file.filename}: {rejected}. Only PNG and JPG images are allowed")
+                saved_paths.append(str(upload.path))
+
+            results = await analyze_image_from_openai(saved_paths, structured=structured)
             return JSONResponse(content=results)
         finally:
             # Clean up uploaded files
@@ -899,27 +1197,32 @@ async def analyze_images(files: List[UploadFile] = File(...)):
                 except Exception as e:
                     logging.error(f"Error deleting file {path}: {str(e)}")
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in analyze_images: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/extract_document_info")
-async def extract_document_info(documents: List[UploadFile] = File(...)):
-    """Endpoint to extract information from insurance documents"""
-    try:
-        saved_paths = []
-        for doc in documents:
-            if not doc.filename.lower().endswith('.pdf'):
-                raise HTTPException(status_code=400, detail="Only PDF documents are allowed")
-
-            file_path = UPLOAD_DIR / f"{uuid.uuid4()}_{doc.filename}"
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(doc.file, buffer)
-            saved_paths.append(str(file_path))
+@app.post("/analyze_images/stream")
+async def analyze_images_stream(files: List[UploadFile] = File(...)):
+    """
+    Like /analyze_images, but streams the report as Server-Sent Events,
+    one section at a time (see stream_image_analysis_from_openai)
+    """
+    saved_paths = []
+    for file in files:
+        try:
+            upload = await ingest_upload(file, UPLOAD_DIR, IMAGE_TYPES)
+        except UploadRejected as rejected:
+            for path in saved_paths:
+                os.unlink(path)
+            raise HTTPException(status_code=400, detail=f"{file.filename}: {rejected}. Only PNG and JPG images are allowed")
+        saved_paths.append(str(upload.path))
 
+    async def events():
         try:
-            results = await extract_document_info_with_gork(saved_paths)
-            return JSONResponse(content=results)
+            async for event in stream_image_analysis_from_openai(saved_paths):
+                yield event
         finally:
             # Clean up uploaded files
             for path in saved_paths:
@@ -928,9 +1231,11 @@ async def extract_document_info(documents: List[UploadFile] = File(...)):
                 except Exception as e:
                     logging.error(f"Error deleting file {path}: {str(e)}")
 
-    except Exception as e:
-        logging.error(f"Error in extract_document_info: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == "__main__":
     import uvicorn